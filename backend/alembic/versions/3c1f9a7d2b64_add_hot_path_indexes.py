@@ -0,0 +1,52 @@
+"""add_hot_path_indexes
+
+Revision ID: 3c1f9a7d2b64
+Revises: fec3d14661a2
+Create Date: 2026-10-19 10:05:12.413207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9a7d2b64'
+down_revision: Union[str, None] = 'fec3d14661a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _partial(column: str) -> dict:
+    # Postgres and SQLite render boolean equality differently; the partial
+    # index predicate must match what SQLAlchemy emits for `col == True`.
+    return {
+        "postgresql_where": sa.text(f"{column} = true"),
+        "sqlite_where": sa.text(f"{column} = 1"),
+    }
+
+
+def upgrade() -> None:
+    # week_progress: upsert / reminders look up (user_id, week_start_date)
+    op.create_index('ix_week_progress_user_week', 'week_progress', ['user_id', 'week_start_date'])
+    # week_progress: all-progress and stats only read completed rows
+    op.create_index(
+        'ix_week_progress_user_completed', 'week_progress', ['user_id', 'week_start_date'],
+        **_partial('is_completed'),
+    )
+    # special_periods: global periods are read by owner (admin)
+    op.create_index('ix_special_periods_user_id', 'special_periods', ['user_id'])
+    # users: admin lookup, active listings, taken emoji
+    op.create_index('ix_users_superuser', 'users', ['id'], **_partial('is_superuser'))
+    op.create_index('ix_users_active', 'users', ['id'], **_partial('is_active'))
+    op.create_index('ix_users_active_emoji', 'users', ['emoji'], **_partial('is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_active_emoji', table_name='users')
+    op.drop_index('ix_users_active', table_name='users')
+    op.drop_index('ix_users_superuser', table_name='users')
+    op.drop_index('ix_special_periods_user_id', table_name='special_periods')
+    op.drop_index('ix_week_progress_user_completed', table_name='week_progress')
+    op.drop_index('ix_week_progress_user_week', table_name='week_progress')
@@ -0,0 +1,40 @@
+"""add_week_progress_archive
+
+Revision ID: 5e2b8c4a91d7
+Revises: 3c1f9a7d2b64
+Create Date: 2026-10-19 12:41:37.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b8c4a91d7'
+down_revision: Union[str, None] = '3c1f9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'week_progress_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('week_start_date', sa.Date(), nullable=False),
+        sa.Column('is_completed', sa.Boolean(), nullable=False),
+        sa.Column('note', sa.String(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_week_progress_archive_user_week', 'week_progress_archive', ['user_id', 'week_start_date']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_week_progress_archive_user_week', table_name='week_progress_archive')
+    op.drop_table('week_progress_archive')
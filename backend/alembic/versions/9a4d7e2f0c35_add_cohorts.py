@@ -0,0 +1,56 @@
+"""add_cohorts
+
+Revision ID: 9a4d7e2f0c35
+Revises: 5e2b8c4a91d7
+Create Date: 2026-10-19 15:18:02.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4d7e2f0c35'
+down_revision: Union[str, None] = '5e2b8c4a91d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cohorts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=True),
+        sa.Column('deadline', sa.Date(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_index('ix_cohorts_id', 'cohorts', ['id'])
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('cohort_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_users_cohort_id', 'cohorts', ['cohort_id'], ['id'])
+    op.create_index('ix_users_cohort_active', 'users', ['cohort_id', 'is_active'])
+
+    with op.batch_alter_table('special_periods') as batch_op:
+        batch_op.add_column(sa.Column('cohort_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_special_periods_cohort_id', 'cohorts', ['cohort_id'], ['id'])
+    op.create_index('ix_special_periods_cohort_start', 'special_periods', ['cohort_id', 'start_date'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_special_periods_cohort_start', table_name='special_periods')
+    with op.batch_alter_table('special_periods') as batch_op:
+        batch_op.drop_constraint('fk_special_periods_cohort_id', type_='foreignkey')
+        batch_op.drop_column('cohort_id')
+
+    op.drop_index('ix_users_cohort_active', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_constraint('fk_users_cohort_id', type_='foreignkey')
+        batch_op.drop_column('cohort_id')
+
+    op.drop_index('ix_cohorts_id', table_name='cohorts')
+    op.drop_table('cohorts')
@@ -0,0 +1,32 @@
+"""add_data_versions
+
+Revision ID: b7c3e1d5a208
+Revises: 9a4d7e2f0c35
+Create Date: 2026-10-19 17:02:44.120581
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c3e1d5a208'
+down_revision: Union[str, None] = '9a4d7e2f0c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'data_versions',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.execute("INSERT INTO data_versions (key, version) VALUES ('grid', 0)")
+
+
+def downgrade() -> None:
+    op.drop_table('data_versions')
@@ -0,0 +1,37 @@
+"""add_progress_changes
+
+Revision ID: d41a6f8e7c19
+Revises: b7c3e1d5a208
+Create Date: 2026-10-19 18:26:51.004417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a6f8e7c19'
+down_revision: Union[str, None] = 'b7c3e1d5a208'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'progress_changes',
+        sa.Column('seq', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('week_start_date', sa.Date(), nullable=True),
+        sa.Column('is_completed', sa.Boolean(), nullable=True),
+        sa.Column('note', sa.String(), nullable=True),
+        sa.Column('emoji', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.PrimaryKeyConstraint('seq'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('progress_changes')
@@ -0,0 +1,59 @@
+"""add_week_progress_history
+
+Revision ID: e6b2d9c4f153
+Revises: d41a6f8e7c19
+Create Date: 2026-10-19 21:04:12.518306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b2d9c4f153'
+down_revision: Union[str, None] = 'd41a6f8e7c19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'week_progress_events',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('week_start_date', sa.Date(), nullable=False),
+        sa.Column('is_completed', sa.Boolean(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_week_progress_events_changed_at', 'week_progress_events', ['changed_at', 'id'])
+    op.create_table(
+        'week_progress_snapshots',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('taken_at', sa.DateTime(), nullable=False),
+        sa.Column('completed_weeks', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_week_progress_snapshots_taken_at'), 'week_progress_snapshots', ['taken_at'])
+
+    # Уже отмеченные недели попадают в историю как отмеченные в начале своей недели
+    if op.get_bind().dialect.name == "sqlite":
+        # SQLite хранит DateTime строкой в формате SQLAlchemy
+        changed_at = "week_start_date || ' 00:00:00.000000'"
+    else:
+        changed_at = "CAST(week_start_date AS TIMESTAMP)"
+    op.execute(
+        "INSERT INTO week_progress_events (user_id, week_start_date, is_completed, changed_at) "
+        f"SELECT user_id, week_start_date, is_completed, {changed_at} FROM week_progress "
+        "WHERE is_completed = true ORDER BY week_start_date, id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_week_progress_snapshots_taken_at'), table_name='week_progress_snapshots')
+    op.drop_table('week_progress_snapshots')
+    op.drop_index('ix_week_progress_events_changed_at', table_name='week_progress_events')
+    op.drop_table('week_progress_events')
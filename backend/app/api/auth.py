@@ -1,12 +1,17 @@
 from datetime import timedelta
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app import schemas, models
 from app.api import deps
-from app.core import security
+from app.core import changelog, ratelimit, security
+from app.core.cohorts import invalidate_scope
+from app.core.cache import invalidate_tags
+from app.core.versioning import bump_data_version
 from app.core.config import settings
 
 router = APIRouter()
@@ -50,45 +55,65 @@ def assign_free_emoji(db: Session, preferred: str = None) -> str:
     return f"🎓{user_count}"
 
 
+def find_login_account(request: Request, db: Session, username: str):
+    """(email, password hash, is_active) of the account, or None; the transaction is ended."""
+    ratelimit.check_rate(request, "login", account=username)
+    user = db.query(models.user.User).filter(models.user.User.email == username).first()
+    if not user:
+        return None
+    account = user.email, user.hashed_password, user.is_active
+    # Проверка пароля долгая: не держим транзакцию (на SQLite — блокировку записи)
+    db.rollback()
+    return account
+
+
 @router.post("/login", response_model=schemas.user.Token)
-def login_access_token(
-    db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()
+async def login_access_token(
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = db.query(models.user.User).filter(models.user.User.email == form_data.username).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    # БД и лимиты — в пуле потоков; очередь к Argon2 ждёт в цикле событий, не занимая поток
+    account = await run_in_threadpool(find_login_account, request, db, form_data.username)
+    if account is None:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
-    elif not user.is_active:
+    email, hashed_password, is_active = account
+    password_ok = await ratelimit.run_hashing(security.verify_password, form_data.password, hashed_password)
+    if not password_ok:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    elif not is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
         "access_token": security.create_access_token(
-            user.email, expires_delta=access_token_expires
+            email, expires_delta=access_token_expires
         ),
         "token_type": "bearer",
     }
 
 
-@router.post("/register", response_model=schemas.user.UserOut)
-def register_user(
-    *,
-    db: Session = Depends(deps.get_db),
-    user_in: schemas.user.UserCreate,
-) -> Any:
-    """
-    Create new user. Auto-assigns a free emoji if preferred is taken.
-    """
+def email_taken() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail="Пользователь с таким email уже существует",
+    )
+
+
+def check_registration(request: Request, db: Session, user_in: schemas.user.UserCreate) -> None:
+    ratelimit.check_rate(request, "register", account=user_in.email)
     # Проверяем дубликат email
     existing = db.query(models.user.User).filter(models.user.User.email == user_in.email).first()
     if existing:
-        raise HTTPException(
-            status_code=400,
-            detail="Пользователь с таким email уже существует",
-        )
+        raise email_taken()
+    # Пока хэшируется пароль, транзакция (на SQLite — блокировка записи) не держится
+    db.rollback()
+
 
+def create_user(db: Session, user_in: schemas.user.UserCreate, hashed_password: str) -> models.user.User:
     # Автоназначаем свободный эмоджи (если preferred занят — возьмем следующий)
     emoji = assign_free_emoji(db, preferred=user_in.emoji)
 
@@ -98,7 +123,7 @@ def register_user(
 
     db_user = models.user.User(
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=hashed_password,
         full_name=user_in.full_name,
         start_date=user_in.start_date,
         deadline=user_in.deadline,
@@ -106,12 +131,40 @@ def register_user(
         is_superuser=is_superuser,
     )
     db.add(db_user)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Параллельная регистрация с тем же email успела вставить строку между проверкой и вставкой
+        db.rollback()
+        if db.query(models.user.User).filter(models.user.User.email == user_in.email).first():
+            raise email_taken()
+        raise
+    changelog.record_user(db, db_user)
+    bump_data_version(db)
     db.commit()
+    invalidate_tags("users", "progress")
     db.refresh(db_user)
+    if is_superuser:
+        invalidate_scope(None)
     return db_user
 
 
-@router.get("/me", response_model=schemas.user.UserOut)
+@router.post("/register", response_model=schemas.user.UserOut)
+async def register_user(
+    *,
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    user_in: schemas.user.UserCreate,
+) -> Any:
+    """
+    Create new user. Auto-assigns a free emoji if preferred is taken.
+    """
+    await run_in_threadpool(check_registration, request, db, user_in)
+    hashed_password = await ratelimit.run_hashing(security.get_password_hash, user_in.password)
+    return await run_in_threadpool(create_user, db, user_in, hashed_password)
+
+
+@router.get("/me", response_model=schemas.user.UserOut, dependencies=[Depends(deps.read_only)])
 def read_user_me(
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
@@ -151,8 +204,14 @@ def login_telegram(
             is_superuser=is_superuser,
         )
         db.add(user)
+        db.flush()
+        changelog.record_user(db, user)
+        bump_data_version(db)
         db.commit()
+        invalidate_tags("users", "progress")
         db.refresh(user)
+        if is_superuser:
+            invalidate_scope(None)
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     token_subject = user.email if user.email else f"tg_{user.telegram_id}"
@@ -165,7 +224,7 @@ def login_telegram(
     }
 
 
-@router.get("/config", response_model=schemas.config.ConfigResponse)
+@router.get("/config", response_model=schemas.config.ConfigResponse, dependencies=[Depends(deps.cache_headers("config"))])
 def get_config() -> Any:
     """
     Get public configuration.
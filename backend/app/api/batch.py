@@ -0,0 +1,137 @@
+"""
+POST /batch — several whitelisted read operations in one call.
+
+The caller is authenticated once, the scope is resolved once and every
+operation runs on the same DB session; results come back in request order
+with a per-item HTTP status.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, TypeAdapter, ValidationError, create_model
+from sqlalchemy.orm import Session
+
+from app import schemas, models
+from app.api import cohort, deps, grid, user
+from app.core.cohorts import GridScope
+
+router = APIRouter()
+
+
+@dataclass
+class BatchContext:
+    db: Session
+    scope: GridScope
+    user: models.user.User
+
+
+@dataclass
+class BatchOperationSpec:
+    call: Callable[..., Any]
+    response: TypeAdapter
+    params: type
+
+
+def _spec(call, response, **params) -> BatchOperationSpec:
+    return BatchOperationSpec(
+        call=call,
+        response=TypeAdapter(response),
+        params=create_model("Params", **params),
+    )
+
+
+# Только чтение: операции, которые безопасно выполнять пачкой на одной сессии
+OPERATIONS: Dict[str, BatchOperationSpec] = {
+    "users.list": _spec(
+        lambda ctx: user.get_users(response=None, fields=None, db=ctx.db),
+        List[schemas.user.UserPublic],
+    ),
+    "users.get": _spec(
+        lambda ctx, user_id: user.get_user_by_id(user_id=user_id, db=ctx.db),
+        schemas.user.UserPublicProfile,
+        user_id=(int, ...),
+    ),
+    "users.me": _spec(
+        lambda ctx: ctx.user,
+        schemas.user.UserOut,
+    ),
+    "cohorts.list": _spec(
+        lambda ctx: cohort.get_cohorts(db=ctx.db, current_user=ctx.user),
+        List[schemas.cohort.CohortOut],
+    ),
+    "grid.config": _spec(
+        lambda ctx: grid.get_grid_config(scope=ctx.scope, current_user=ctx.user),
+        schemas.week_progress.GridConfig,
+    ),
+    "grid.calendar": _spec(
+        lambda ctx: grid.get_grid_calendar(db=ctx.db, scope=ctx.scope, current_user=ctx.user),
+        schemas.week_progress.GridCalendar,
+    ),
+    "grid.all_progress": _spec(
+        lambda ctx, since: grid.get_all_progress(response=None, since=since, fields=None, as_of=None, db=ctx.db, scope=ctx.scope, current_user=ctx.user),
+        Union[List[schemas.week_progress.UserWeekProgress], schemas.week_progress.ProgressDelta],
+        since=(Optional[int], None),
+    ),
+    "grid.dashboard": _spec(
+        lambda ctx, user_id: grid.get_dashboard(user_id=user_id, db=ctx.db, scope=ctx.scope, current_user=ctx.user),
+        schemas.week_progress.GridDashboard,
+        user_id=(Optional[int], None),
+    ),
+    "grid.weeks": _spec(
+        lambda ctx, user_id: grid.get_user_weeks(user_id=user_id, response=None, fields=None, db=ctx.db, scope=ctx.scope, current_user=ctx.user),
+        List[schemas.week_progress.WeekProgressOut],
+        user_id=(int, ...),
+    ),
+    "grid.history": _spec(
+        lambda ctx, user_id: grid.get_user_history(user_id=user_id, db=ctx.db, scope=ctx.scope, current_user=ctx.user),
+        List[schemas.week_progress.WeekHistoryEntry],
+        user_id=(int, ...),
+    ),
+    "grid.stats": _spec(
+        lambda ctx, user_id: grid.get_user_stats(user_id=user_id, db=ctx.db, scope=ctx.scope, current_user=ctx.user),
+        schemas.week_progress.GridStats,
+        user_id=(int, ...),
+    ),
+    "grid.special_periods": _spec(
+        lambda ctx: grid.get_special_periods(db=ctx.db, scope=ctx.scope, current_user=ctx.user),
+        List[schemas.special_period.SpecialPeriodOut],
+    ),
+}
+
+
+def run_operation(ctx: BatchContext, operation: schemas.batch.BatchOperation) -> dict:
+    spec = OPERATIONS.get(operation.op)
+    if spec is None:
+        return {"status": 400, "body": {"detail": f"Unknown operation: {operation.op}"}}
+    try:
+        params: BaseModel = spec.params(**operation.params)
+    except ValidationError as e:
+        return {"status": 422, "body": {"detail": e.errors(include_url=False, include_context=False)}}
+    try:
+        result = spec.call(ctx, **params.model_dump())
+    except HTTPException as e:
+        return {"status": e.status_code, "body": {"detail": e.detail}}
+    body = spec.response.dump_python(
+        spec.response.validate_python(result, from_attributes=True), mode="json"
+    )
+    return {"status": 200, "body": body}
+
+
+# POST только ради тела запроса: пачка читает и не ждёт писателей
+@router.post("", response_model=schemas.batch.BatchResponse, dependencies=[Depends(deps.read_only)])
+def run_batch(
+    request: Request,
+    batch_in: schemas.batch.BatchRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Execute several read operations in one call. Operations run in order on one DB session
+    (a Session can't be shared between threads); each result carries its own status.
+    """
+    if batch_in.cohort_id is not None:
+        deps.bind_cohort(request, batch_in.cohort_id)
+    scope = deps.get_grid_scope(request, db=db, current_user=current_user)
+    ctx = BatchContext(db=db, scope=scope, user=current_user)
+    return {"results": [run_operation(ctx, op) for op in batch_in.operations]}
@@ -0,0 +1,89 @@
+from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app import schemas, models
+from app.api import deps
+from app.core import changelog
+from app.core.cohorts import invalidate_scope
+from app.core.cache import invalidate_tags
+from app.core.versioning import bump_data_version
+
+router = APIRouter()
+
+@router.get("/", response_model=List[schemas.cohort.CohortOut], dependencies=[Depends(deps.read_only)])
+def get_cohorts(
+    db: Session = Depends(deps.get_db),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Get all cohorts.
+    """
+    return db.query(models.cohort.Cohort).order_by(models.cohort.Cohort.id).all()
+
+@router.post("/", response_model=schemas.cohort.CohortOut)
+def create_cohort(
+    *,
+    db: Session = Depends(deps.get_db),
+    cohort_in: schemas.cohort.CohortCreate,
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Create cohort. Only for admin.
+    """
+    existing = db.query(models.cohort.Cohort).filter(models.cohort.Cohort.name == cohort_in.name).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Когорта с таким названием уже существует")
+    cohort = models.cohort.Cohort(**cohort_in.model_dump())
+    db.add(cohort)
+    db.commit()
+    db.refresh(cohort)
+    return cohort
+
+@router.put("/{cohort_id}", response_model=schemas.cohort.CohortOut)
+def update_cohort(
+    cohort_id: int,
+    *,
+    db: Session = Depends(deps.get_db),
+    cohort_in: schemas.cohort.CohortUpdate,
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Update cohort name and dates. Only for admin.
+    """
+    cohort = db.get(models.cohort.Cohort, cohort_id)
+    if not cohort:
+        raise HTTPException(status_code=404, detail="Cohort not found")
+    for field, value in cohort_in.model_dump(exclude_unset=True).items():
+        setattr(cohort, field, value)
+    db.add(cohort)
+    bump_data_version(db)
+    db.commit()
+    db.refresh(cohort)
+    invalidate_scope(cohort_id)
+    return cohort
+
+@router.put("/{cohort_id}/members/{user_id}", response_model=schemas.user.UserOut)
+def add_cohort_member(
+    cohort_id: int,
+    user_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Move a user into the cohort. Only for admin.
+    """
+    if not db.get(models.cohort.Cohort, cohort_id):
+        raise HTTPException(status_code=404, detail="Cohort not found")
+    user = db.get(models.user.User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.cohort_id = cohort_id
+    db.add(user)
+    # Пользователь переходит между когортами — точечно это не применить
+    changelog.record_reset(db)
+    bump_data_version(db)
+    db.commit()
+    invalidate_tags("progress", "users", f"user:{user.id}")
+    db.refresh(user)
+    return user
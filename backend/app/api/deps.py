@@ -1,18 +1,41 @@
 from typing import Generator
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core import security
+from app.core import coalescing, repository, security
+from app.core.cohorts import GridScope, resolve_scope
+from app.core.replicas import read_source
+from app.core.http_cache import PRIVATE, etag_matches, make_etag, public_policy, surrogate_headers
+from app.core.versioning import get_data_version
+from app import database
 from app.database import SessionLocal, get_db
 from app.models.user import User
 from app.schemas.user import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+async def read_only(request: Request) -> None:
+    """
+    Marks a read-only route: its session reads from a replica when one is
+    configured, healthy and caught up, unless the caller has just written,
+    and on SQLite doesn't take the writer lock even for a POST (/batch).
+    Must come first in the route's dependencies, before anything opens the session.
+    """
+    request.state.read_only = True
+    router = database.replica_router
+    if not router.enabled:
+        return
+    subject = security.token_subject(request.headers.get("authorization"))
+    # Проверка лага ходит в БД — не в цикле событий
+    bind, source = await run_in_threadpool(router.route, subject)
+    request.state.read_bind = bind
+    read_source.set(source)
+
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> User:
@@ -28,9 +51,9 @@ def get_current_user(
         )
     if token_data.sub.startswith("tg_"):
         tg_id = int(token_data.sub.replace("tg_", ""))
-        user = db.query(User).filter(User.telegram_id == tg_id).first()
+        user = repository.user_by_telegram_id(db, tg_id)
     else:
-        user = db.query(User).filter(User.email == token_data.sub).first()
+        user = repository.user_by_email(db, token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
@@ -44,4 +67,69 @@ def get_current_active_superuser(
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+def bind_cohort(request: Request, cohort_id: int) -> None:
+    """
+    Router-level dependency for /cohorts/{cohort_id}/grid: remembers the
+    cohort so that get_grid_scope resolves the cohort scope.
+    """
+    request.state.cohort_id = cohort_id
+
+def get_grid_scope(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> GridScope:
+    cohort_id = getattr(request.state, "cohort_id", None)
+    scope = resolve_scope(db, cohort_id)
+    if scope is None:
+        raise HTTPException(status_code=404, detail="Cohort not found")
+    if cohort_id is not None and not current_user.is_superuser and current_user.cohort_id != cohort_id:
+        raise HTTPException(status_code=403, detail="You are not a member of this cohort")
+    return scope
+
+def cache_headers(*keys: str):
+    """
+    Dependency for public reads: shared-cacheable Cache-Control plus surrogate
+    keys. Keys are formatted with the path parameters ("user:{user_id}").
+    Requests with a query string (?fields=...) are answered as private.
+    """
+    def dependency(request: Request, response: Response) -> None:
+        if request.url.query:
+            # Прокси хранит ответы по $request_uri, а очистка знает только пути без параметров
+            response.headers["Cache-Control"] = PRIVATE.header()
+            return
+        response.headers["Cache-Control"] = public_policy().header()
+        response.headers.update(surrogate_headers(k.format(**request.path_params) for k in keys))
+    return dependency
+
+def grid_revalidation(*keys: str):
+    """
+    Dependency for authenticated grid reads: private responses revalidated by
+    an ETag of (data version, scope, user, toggles not yet written). A matching If-None-Match answers
+    304 before the endpoint runs. Keys may use path parameters and {me}.
+    Runs after the user and scope are loaded and returns the connection once
+    for all of them.
+    """
+    def dependency(
+        request: Request,
+        response: Response,
+        db: Session = Depends(get_db),
+        scope: GridScope = Depends(get_grid_scope),
+        current_user: User = Depends(get_current_user),
+    ) -> None:
+        etag = make_etag(get_data_version(db), scope.cache_key(), current_user.id, coalescing.writes.pending_tag())
+        # Пользователь, область и версия прочитаны одним соединением — отдаём его один раз:
+        # 304 и ответ из кэша обходятся без второго, эндпоинт возьмёт его, только если пойдёт в БД
+        database.release(db)
+        headers = {
+            "Cache-Control": PRIVATE.header(),
+            "ETag": etag,
+            "Vary": "Authorization",
+            **surrogate_headers(k.format(me=current_user.id, **request.path_params) for k in keys),
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return dependency
@@ -1,171 +1,504 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Callable, List, Optional, Tuple, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate
 
 from app import schemas, models
 from app.api import deps
+from app.core import analytics, changelog, coalescing, export, grid_image, history, projection, repository, weeks
+from app.core.calendar import PERIODS_VERSION_KEY, calendar_payload, get_calendar
+from app.core.config import settings
+from app.core.cache import LRUCache, cached, invalidate_tags
+from app.core.cohorts import GridScope, get_admin_user
+from app.core.http_cache import PRIVATE, etag_matches
+from app.core.grid_snapshot import all_progress_payload, load_progress_rows, load_snapshot
+from app.core.versioning import bump_data_version, get_data_version
 
 router = APIRouter()
 
-def get_admin_user(db: Session):
-    admin = db.query(models.user.User).filter(models.user.User.is_superuser == True).first()
-    if not admin:
-        # Fallback to first user if no superuser exists yet
-        admin = db.query(models.user.User).first()
-    return admin
+# Готовые ответы /dashboard по ключу (версия данных, область, пользователь)
+_dashboard_cache = LRUCache(maxsize=512)
 
-@router.get("/config", response_model=schemas.week_progress.GridConfig)
+def ensure_user_in_scope(db: Session, scope: GridScope, user_id: int) -> None:
+    """Only users of the scope are visible: the cohort's members or, globally, users outside cohorts."""
+    user = db.get(models.user.User, user_id)
+    if not user or not scope.includes(user):
+        raise HTTPException(status_code=404, detail="User not found")
+
+def get_scope_special_periods(db: Session, scope: GridScope):
+    return db.query(models.special_period.SpecialPeriod).filter(
+        scope.special_period_filter()
+    ).all()
+
+@router.get(
+    "/config",
+    response_model=schemas.week_progress.GridConfig,
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope"))],
+)
 def get_grid_config(
-    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
-    Get global grid configuration (start date and deadline).
+    Get grid configuration (start date and deadline) of the global scope or the cohort.
     """
-    admin = get_admin_user(db)
-    if not admin:
-        return {"start_date": None, "deadline": None}
     return {
-        "start_date": admin.start_date,
-        "deadline": admin.deadline
+        "start_date": scope.start_date,
+        "deadline": scope.deadline
     }
 
-@router.get("/all-progress", response_model=List[schemas.week_progress.UserWeekProgress])
+@router.get(
+    "/calendar",
+    response_model=schemas.week_progress.GridCalendar,
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope", "periods"))],
+)
+def get_grid_calendar(
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Get the week slots of the grid: index, start date, Monday and the special period covering each slot.
+    """
+    return calendar_payload(get_calendar(db, scope))
+
+@router.get(
+    "/all-progress",
+    response_model=Union[List[schemas.week_progress.UserWeekProgress], schemas.week_progress.ProgressDelta],
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope", "progress"))],
+)
 def get_all_progress(
+    response: Response,
+    since: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = Query(None, description="Sparse fieldset, e.g. user_id,emoji,completions.date"),
+    as_of: Optional[datetime] = Query(None, description="Completed weeks as they were at this UTC time; notes are not versioned"),
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Get progress for all active users of the scope.
+    With ?since=<cursor> returns only changes after the cursor (since=0 — full snapshot plus a cursor).
+    With ?fields= returns only the listed fields; unselected columns aren't read.
+    With ?as_of= rebuilds the state at that time from the progress history.
+    """
+    tree = projection.parse_fields(fields, projection.PROGRESS_FIELDS)
+    if as_of is not None:
+        if since is not None:
+            raise HTTPException(status_code=400, detail="as_of and since can't be combined")
+        payload = progress_as_of(db, scope, as_of)
+        if tree is None:
+            return payload
+        return projection.projected_response(projection.project(payload, tree), response)
+    with_weeks = projection.wants(tree, "completions")
+    with_notes = projection.wants(tree, "completions", "note")
+
+    def full_progress():
+        payload = all_progress_payload(load_progress_rows(db, scope, with_weeks, with_notes), with_notes)
+        return payload if tree is None else projection.project(payload, tree)
+
+    if since is None:
+        if tree is None:
+            return cached(
+                f"all-progress:{scope.cache_key()}",
+                ["progress"],
+                full_progress,
+                List[schemas.week_progress.UserWeekProgress],
+            )
+        return projection.projected_response(cached(
+            f"all-progress:{scope.cache_key()}:{projection.cache_suffix(tree)}",
+            ["progress"],
+            lambda: jsonable_encoder(full_progress()),
+        ), response)
+
+    # Курсор берём до чтения снимка: изменения между ними придут повторно, это безопасно
+    cursor = changelog.latest_seq(db)
+    changes = None
+    if since <= cursor:
+        changes = changelog.changes_since(db, scope, since, settings.PROGRESS_DELTA_MAX)
+    if changes is None:
+        delta = {"cursor": cursor, "full": True, "progress": full_progress(), "changes": []}
+    else:
+        if changes:
+            cursor = max(cursor, changes[-1].seq)
+        delta = {"cursor": cursor, "full": False, "changes": changes}
+    if tree is None:
+        return delta
+    exclude = set() if with_notes else {"note"}
+    delta["changes"] = [
+        schemas.week_progress.ProgressChangeOut.model_validate(c).model_dump(exclude=exclude)
+        for c in delta["changes"]
+    ]
+    return projection.projected_response(delta, response)
+
+def progress_as_of(db: Session, scope: GridScope, as_of: datetime) -> List[dict]:
+    """UserWeekProgress dicts of the scope's current active users at ``as_of``."""
+    if as_of.tzinfo is not None:
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    state = history.state_as_of(db, as_of)
+    return [
+        {
+            "user_id": u.user_id,
+            "emoji": u.emoji or "🎓",
+            "completions": [
+                {"date": date.fromordinal(week), "note": None}
+                for week in sorted(state.get(u.user_id, ()))
+            ],
+        }
+        for u in load_progress_rows(db, scope, with_weeks=False).values()
+    ]
+
+@router.get(
+    "/burndown",
+    response_model=schemas.week_progress.Burndown,
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope", "progress", "periods"))],
+)
+def get_burndown(
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Remaining weeks of the whole scope (cohort) at the end of every past week slot, with the ideal line.
+    """
+    calendar = get_calendar(db, scope)
+    member_ids = list(load_progress_rows(db, scope, with_weeks=False))
+    budget = calendar.effective_weeks * len(member_ids)
+    now = history.utcnow()
+
+    slots = [s for s in calendar.slots if datetime.combine(s.week_start_date, datetime.min.time()) <= now]
+    points = [min(now, datetime.combine(s.week_start_date + timedelta(weeks=1), datetime.min.time())) for s in slots]
+    # План и факт — только по рабочим слотам: недели вне сетки и в особых периодах не считаются
+    working = [s.week_start_date for s in calendar.slots if not s.is_special]
+    counts = history.completed_counts_at(db, points, member_ids, weeks=working)
+    # Рабочих слотов пройдено к концу каждой точки; в особые недели идеальная линия стоит
+    passed = list(accumulate(0 if s.is_special else 1 for s in slots))
+    return {
+        "start_date": calendar.start_date,
+        "deadline": calendar.deadline,
+        "members": len(member_ids),
+        "effective_weeks": calendar.effective_weeks,
+        "points": [
+            {
+                "index": slot.index,
+                "week_start_date": slot.week_start_date,
+                "completed": completed,
+                "remaining": max(0, budget - completed),
+                "ideal": round(budget * (1 - done / calendar.effective_weeks), 2) if calendar.effective_weeks else 0.0,
+            }
+            for slot, completed, done in zip(slots, counts, passed)
+        ],
+    }
+
+@router.get(
+    "/analytics",
+    response_model=schemas.week_progress.GridAnalytics,
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope", "progress", "periods"))],
+)
+def get_analytics(
+    window: int = Query(4, ge=1, le=52, description="Working weeks in the rolling completion rate"),
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Current and longest streaks, weekly completion rate of the scope and projected finish dates against the deadline.
+    """
+    return analytics.get_analytics(db, scope, window)
+
+@router.get(
+    "/dashboard",
+    response_model=schemas.week_progress.GridDashboard,
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope", "progress", "weeks", "periods"))],
+)
+def get_dashboard(
+    user_id: Optional[int] = None,
     db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
-    Get progress for all active users.
+    Config, all-progress, weeks, stats and special periods for a user (default: current) in one response.
     """
-    users = db.query(models.user.User).filter(models.user.User.is_active == True).all()
-    results = []
-    for user in users:
-        completions = db.query(
-            models.week_progress.WeekProgress.week_start_date,
-            models.week_progress.WeekProgress.note
-        ).filter(
-            models.week_progress.WeekProgress.user_id == user.id,
-            models.week_progress.WeekProgress.is_completed == True
-        ).all()
-        
-        completion_data = [{"date": c[0], "note": c[1]} for c in completions]
-        results.append({
-            "user_id": user.id,
-            "emoji": user.emoji or "🎓",
-            "completions": completion_data
-        })
-    return results
+    target_id = user_id or current_user.id
+    version = get_data_version(db)
+    # scope входит в ключ: смена дат в другом воркере меняет scope раньше, чем версию;
+    # незаписанные отметки меняют ответ без смены версии
+    key = (version, scope, target_id, coalescing.writes.pending_tag())
+    cached = _dashboard_cache.get(key)
+    if cached is not None:
+        return cached
 
-@router.get("/weeks", response_model=List[schemas.week_progress.WeekProgressOut])
+    snapshot = load_snapshot(db, scope)
+    calendar = get_calendar(db, scope, snapshot.special_periods)
+    weeks = snapshot.weeks_of(target_id)
+    if weeks is None:
+        # Неактивный пользователь не попадает в снимок — читаем его недели отдельно
+        target = db.get(models.user.User, target_id)
+        if not target or not scope.includes(target):
+            raise HTTPException(status_code=404, detail="User not found")
+        weeks = repository.week_rows(db, target_id)
+    weeks = with_pending(weeks, target_id)
+    completed_weeks = sum(1 for w in weeks if w["is_completed"])
+
+    dashboard = schemas.week_progress.GridDashboard.model_validate({
+        "data_version": version,
+        "config": {"start_date": scope.start_date, "deadline": scope.deadline},
+        "all_progress": snapshot.all_progress(),
+        "weeks": weeks,
+        "stats": calendar.stats(completed_weeks),
+        "special_periods": snapshot.special_periods,
+        "calendar": calendar_payload(calendar),
+    }, from_attributes=True)
+    _dashboard_cache.set(key, dashboard)
+    return dashboard
+
+@router.get(
+    "/weeks",
+    response_model=List[schemas.week_progress.WeekProgressOut],
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("weeks:{me}"))],
+)
 def get_weeks(
+    response: Response,
+    fields: Optional[str] = Query(None, description="Sparse fieldset, e.g. week_start_date,is_completed"),
     db: Session = Depends(deps.get_db),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get all week progress for current user.
     """
-    return db.query(models.week_progress.WeekProgress).filter(
-        models.week_progress.WeekProgress.user_id == current_user.id
-    ).all()
+    tree = projection.parse_fields(fields, projection.WEEK_FIELDS)
+    if tree is not None:
+        rows = query_week_fields(db, current_user.id, tree)
+        return projection.projected_response(project_weeks(rows, current_user.id, tree), response)
+    return with_pending(repository.week_rows(db, current_user.id), current_user.id)
+
+def with_pending(rows: List[dict], user_id: int) -> List[dict]:
+    """A user's week rows with toggles accepted but not yet written; the rows themselves aren't changed."""
+    pending = coalescing.writes.pending_of(user_id)
+    if not pending:
+        return rows
+    # Строки из кэша — JSON, неделя в них строкой
+    by_week = {week.isoformat(): state for week, state in pending.items()}
+    overlaid = []
+    for row in rows:
+        state = by_week.get(str(row.get("week_start_date")))
+        if state is not None:
+            row = {**row, **{name: getattr(state, name) for name in ("is_completed", "note") if name in row}}
+        overlaid.append(row)
+    return overlaid
 
-@router.get("/weeks/{user_id}", response_model=List[schemas.week_progress.WeekProgressOut])
+def project_weeks(rows: List[dict], user_id: int, tree) -> List[dict]:
+    """Selected fields of week rows, unwritten toggles applied."""
+    return projection.project(with_pending(rows, user_id), tree)
+
+def query_week_fields(db: Session, user_id: int, tree) -> List[dict]:
+    """Week rows of a user with only the selected columns loaded (and the week, to apply unwritten toggles)."""
+    columns = [getattr(models.week_progress.WeekProgress, name) for name in {**tree, "week_start_date": None}]
+    rows = db.query(*columns).filter(
+        models.week_progress.WeekProgress.user_id == user_id
+    ).order_by(models.week_progress.WeekProgress.week_start_date)
+    return [row._asdict() for row in rows]
+
+@router.get(
+    "/weeks/{user_id}",
+    response_model=List[schemas.week_progress.WeekProgressOut],
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("weeks:{user_id}"))],
+)
 def get_user_weeks(
     user_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Sparse fieldset, e.g. week_start_date,is_completed"),
     db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get all week progress for a specific user.
     """
-    return db.query(models.week_progress.WeekProgress).filter(
+    ensure_user_in_scope(db, scope, user_id)
+    tree = projection.parse_fields(fields, projection.WEEK_FIELDS)
+    if tree is not None:
+        return projection.projected_response(project_weeks(cached(
+            f"weeks:{user_id}:{projection.cache_suffix(tree)}",
+            ["weeks", f"weeks:{user_id}"],
+            lambda: jsonable_encoder(query_week_fields(db, user_id, tree)),
+        ), user_id, tree), response)
+    return with_pending(cached(
+        f"weeks:{user_id}",
+        ["weeks", f"weeks:{user_id}"],
+        lambda: repository.week_rows(db, user_id),
+        List[schemas.week_progress.WeekProgressOut],
+    ), user_id)
+
+@router.get(
+    "/history/{user_id}",
+    response_model=List[schemas.week_progress.WeekHistoryEntry],
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("weeks:{user_id}"))],
+)
+def get_user_history(
+    user_id: int,
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Get full week history for a user: archived weeks of past periods plus current ones. Read-only.
+    """
+    ensure_user_in_scope(db, scope, user_id)
+    archived = db.query(models.week_progress_archive.WeekProgressArchive).filter(
+        models.week_progress_archive.WeekProgressArchive.user_id == user_id
+    ).all()
+    current = db.query(models.week_progress.WeekProgress).filter(
         models.week_progress.WeekProgress.user_id == user_id
     ).all()
+    history = [
+        {"week_start_date": w.week_start_date, "is_completed": w.is_completed, "note": w.note, "archived": True}
+        for w in archived
+    ] + [
+        {"week_start_date": w.week_start_date, "is_completed": w.is_completed, "note": w.note, "archived": False}
+        for w in current
+    ]
+    return sorted(history, key=lambda h: h["week_start_date"])
+
+@router.get(
+    "/notes/{week}",
+    response_model=List[schemas.week_progress.WeekNote],
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope", "progress"))],
+)
+def get_week_notes(
+    week: date,
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Notes of all users of the scope for one week, for payloads requested without notes.
+    """
+    rows = db.execute(
+        select(models.week_progress.WeekProgress.user_id, models.week_progress.WeekProgress.note)
+        .join(models.user.User, models.user.User.id == models.week_progress.WeekProgress.user_id)
+        .where(
+            models.week_progress.WeekProgress.week_start_date == week,
+            models.week_progress.WeekProgress.note.isnot(None),
+            models.user.User.is_active == True,
+            scope.user_filter(),
+        )
+        .order_by(models.week_progress.WeekProgress.user_id)
+    ).all()
+    return [{"user_id": user_id, "week_start_date": week, "note": note} for user_id, note in rows]
+
+@router.get(
+    "/notes/{user_id}/{week}",
+    response_model=schemas.week_progress.WeekNote,
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("weeks:{user_id}"))],
+)
+def get_week_note(
+    user_id: int,
+    week: date,
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Get the note of one week of a user, for payloads requested without notes.
+    """
+    ensure_user_in_scope(db, scope, user_id)
+    row = repository.week_note(db, user_id, week)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Week not found")
+    return {"user_id": user_id, "week_start_date": week, "note": row.note}
 
 @router.post("/weeks", response_model=schemas.week_progress.WeekProgressOut)
 def update_or_create_week(
     *,
     db: Session = Depends(deps.get_db),
     week_in: schemas.week_progress.WeekProgressCreate,
+    scope: GridScope = Depends(deps.get_grid_scope),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Update or create week progress. Only current week can be modified.
     """
-    today = date.today()
-    current_week_start = today - timedelta(days=today.weekday())
-    
-    if week_in.week_start_date != current_week_start:
-        raise HTTPException(
-            status_code=403,
-            detail="You can only modify the current week."
-        )
+    if not scope.includes(current_user):
+        raise HTTPException(status_code=403, detail="You are not a member of this cohort")
 
-    week = db.query(models.week_progress.WeekProgress).filter(
-        models.week_progress.WeekProgress.user_id == current_user.id,
-        models.week_progress.WeekProgress.week_start_date == week_in.week_start_date
-    ).first()
-    
-    if week:
-        week.is_completed = week_in.is_completed
-        week.note = week_in.note
-    else:
-        week = models.week_progress.WeekProgress(
-            **week_in.model_dump(),
-            user_id=current_user.id
+    if coalescing.writes.enabled:
+        weeks.ensure_current_week(week_in.week_start_date)
+        # Повторные клики в пределах окна — одна запись; новая неделя пишется сразу
+        accepted = coalescing.writes.submit(
+            db, current_user.id, week_in.week_start_date, week_in.is_completed, week_in.note
         )
-    
-    db.add(week)
-    db.commit()
-    db.refresh(week)
-    return week
+        if accepted is not None:
+            return accepted
+    return weeks.upsert_week(
+        db, current_user.id, week_in.week_start_date, week_in.is_completed, week_in.note
+    )
 
-@router.get("/special-periods", response_model=List[schemas.special_period.SpecialPeriodOut])
+@router.get(
+    "/special-periods",
+    response_model=List[schemas.special_period.SpecialPeriodOut],
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope", "periods"))],
+)
 def get_special_periods(
     db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
-    Get all special periods. Now global, so returning admin's periods.
+    Get all special periods of the scope: admin's global periods or the cohort's.
     """
-    admin = get_admin_user(db)
-    if not admin:
-        return []
-    return db.query(models.special_period.SpecialPeriod).filter(
-        models.special_period.SpecialPeriod.user_id == admin.id
-    ).all()
+    return cached(
+        f"special-periods:{scope.cache_key()}",
+        ["periods"],
+        lambda: get_scope_special_periods(db, scope),
+        List[schemas.special_period.SpecialPeriodOut],
+    )
 
-@router.get("/special-periods/{user_id}", response_model=List[schemas.special_period.SpecialPeriodOut])
+@router.get(
+    "/special-periods/{user_id}",
+    response_model=List[schemas.special_period.SpecialPeriodOut],
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope", "periods"))],
+)
 def get_user_special_periods(
     user_id: int,
     db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
-    Get all special periods for a specific user. Actually returns global ones.
+    Get all special periods for a specific user. Actually returns the scope's ones.
     """
-    return get_special_periods(db, current_user)
+    return get_scope_special_periods(db, scope)
 
 @router.post("/special-periods", response_model=schemas.special_period.SpecialPeriodOut)
 def create_special_period(
     *,
     db: Session = Depends(deps.get_db),
     period_in: schemas.special_period.SpecialPeriodCreate,
+    scope: GridScope = Depends(deps.get_grid_scope),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
-    Create special period. Only for admin.
+    Create special period in the scope. Only for admin.
     """
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Only admins can manage special periods")
     
     period = models.special_period.SpecialPeriod(
         **period_in.model_dump(),
-        user_id=current_user.id
+        user_id=current_user.id,
+        cohort_id=scope.cohort_id
     )
     db.add(period)
+    bump_data_version(db)
+    bump_data_version(db, PERIODS_VERSION_KEY)
     db.commit()
+    invalidate_tags("periods")
     db.refresh(period)
     return period
 
@@ -173,82 +506,170 @@ def create_special_period(
 def delete_special_period(
     period_id: int,
     db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
-    Delete special period. Only for admin.
+    Delete special period of the scope. Only for admin.
     """
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Only admins can manage special periods")
     
     period = db.query(models.special_period.SpecialPeriod).filter(
-        models.special_period.SpecialPeriod.id == period_id
+        models.special_period.SpecialPeriod.id == period_id,
+        models.special_period.SpecialPeriod.cohort_id == scope.cohort_id
+        if scope.cohort_id is not None else
+        models.special_period.SpecialPeriod.cohort_id.is_(None)
     ).first()
     
     if not period:
         raise HTTPException(status_code=404, detail="Period not found")
     
     db.delete(period)
+    bump_data_version(db)
+    bump_data_version(db, PERIODS_VERSION_KEY)
     db.commit()
+    invalidate_tags("periods")
     return {"status": "ok"}
 
-@router.get("/stats/{user_id}", response_model=schemas.week_progress.GridStats)
+@router.get(
+    "/stats/{user_id}",
+    response_model=schemas.week_progress.GridStats,
+    dependencies=[Depends(deps.read_only), Depends(deps.grid_revalidation("scope", "periods", "weeks:{user_id}"))],
+)
 def get_user_stats(
     user_id: int,
     db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
     """
-    Get grid statistics for user. Uses global settings from admin.
+    Get grid statistics for user. Uses the scope settings (admin's or the cohort's).
     """
-    target_user = db.query(models.user.User).filter(models.user.User.id == user_id).first()
-    if not target_user:
+    target_user = db.get(models.user.User, user_id)
+    if not target_user or not scope.includes(target_user):
         raise HTTPException(status_code=404, detail="User not found")
     
-    admin = get_admin_user(db)
-    if not admin or not admin.start_date or not admin.deadline:
-        return {
-            "total_weeks": 0,
-            "special_weeks": 0,
-            "effective_weeks": 0,
-            "completed_weeks": 0,
-            "remaining_weeks": 0
-        }
-    
-    # Use admin's dates as global settings
-    global_start = admin.start_date
-    global_deadline = admin.deadline
-    
-    total_days = (global_deadline - global_start).days
-    total_weeks = (total_days // 7) + 1
-    
-    # Use admin's special periods as global settings
-    special_periods = db.query(models.special_period.SpecialPeriod).filter(
-        models.special_period.SpecialPeriod.user_id == admin.id
-    ).all()
-    
-    special_days = 0
-    for p in special_periods:
-        p_start = max(p.start_date, global_start)
-        p_end = min(p.end_date, global_deadline)
-        if p_start <= p_end:
-            special_days += (p_end - p_start).days + 1
-            
-    special_weeks = special_days // 7
-    effective_weeks = max(0, total_weeks - special_weeks)
-    
-    # Completed weeks are still per-user
-    completed_weeks = db.query(models.week_progress.WeekProgress).filter(
-        models.week_progress.WeekProgress.user_id == target_user.id,
-        models.week_progress.WeekProgress.is_completed == True
-    ).count()
-    
-    remaining_weeks = max(0, effective_weeks - completed_weeks)
-    
-    return {
-        "total_weeks": total_weeks,
-        "special_weeks": special_weeks,
-        "effective_weeks": effective_weeks,
-        "completed_weeks": completed_weeks,
-        "remaining_weeks": remaining_weeks
-    }
\ No newline at end of file
+    pending = coalescing.writes.pending_of(user_id)
+
+    def completed_weeks() -> int:
+        if not pending:
+            return repository.completed_weeks(db, target_user.id)
+        return sum(1 for w in with_pending(repository.week_rows(db, user_id), user_id) if w["is_completed"])
+
+    def produce():
+        calendar = get_calendar(db, scope)
+        if not calendar.slots:
+            return calendar.stats(0)
+
+        # Completed weeks are still per-user
+        return calendar.stats(completed_weeks())
+
+    if pending:
+        # Незаписанные отметки — только в этом процессе, в общий кэш не кладём
+        return produce()
+    return cached(
+        f"stats:{scope.cache_key()}:{user_id}",
+        ["periods", "weeks", f"weeks:{user_id}"],
+        produce,
+    )
+
+@router.get("/export", dependencies=[Depends(deps.read_only)])
+def export_progress(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|parquet)$"),
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Stream all users of the scope with their weeks, special periods and stats as CSV or Parquet.
+    """
+    if export_format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    special_periods = get_scope_special_periods(db, scope)
+    calendar = get_calendar(db, scope, special_periods)
+
+    # Сессия запроса закрывается до начала стриминга, поэтому курсор живёт в своей
+    bind = db.get_bind()
+
+    def batches():
+        session = Session(bind=bind)
+        try:
+            yield from export.iter_export_batches(
+                session, special_periods, calendar.effective_weeks, user_filter=scope.user_filter()
+            )
+        finally:
+            session.close()
+
+    if export_format == "parquet":
+        return StreamingResponse(
+            export.stream_parquet(batches()),
+            media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": 'attachment; filename="progress.parquet"'},
+        )
+    return StreamingResponse(
+        export.stream_csv(batches()),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="progress.csv"'},
+    )
+
+IMAGE_RESPONSES = {200: {"content": {media: {} for media in grid_image.MEDIA_TYPES.values()}}}
+
+def render_or_busy(render: Callable[[], Tuple[str, bytes]]) -> Tuple[str, bytes]:
+    """An image from the render pool; one not rendered within GRID_IMAGE_TIMEOUT answers 503."""
+    try:
+        return render()
+    except TimeoutError:
+        # Пул картинок перегружен — не 500, клиент повторит
+        raise HTTPException(status_code=503, detail="Image rendering is busy, try again later",
+                            headers={"Retry-After": "1"})
+
+def image_response(request: Request, digest: str, data: bytes, image_format: str) -> Response:
+    # ETag — хэш содержимого картинки: совпадает, пока сетка выглядит так же
+    headers = {"Cache-Control": PRIVATE.header(), "ETag": f'"{digest}"', "Vary": "Authorization"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=grid_image.MEDIA_TYPES[image_format], headers=headers)
+
+@router.get(
+    "/image",
+    responses=IMAGE_RESPONSES,
+    response_class=Response,
+    dependencies=[Depends(deps.read_only)],
+)
+def get_grid_image(
+    request: Request,
+    image_format: str = Query("svg", alias="format", pattern="^(svg|png)$"),
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Render the scope's grid as SVG or PNG: each week is shaded by the share of users who completed it.
+    """
+    digest, data = render_or_busy(lambda: grid_image.cohort_image(db, scope, image_format))
+    return image_response(request, digest, data, image_format)
+
+@router.get(
+    "/image/{user_id}",
+    responses=IMAGE_RESPONSES,
+    response_class=Response,
+    dependencies=[Depends(deps.read_only)],
+)
+def get_user_grid_image(
+    user_id: int,
+    request: Request,
+    image_format: str = Query("svg", alias="format", pattern="^(svg|png)$"),
+    db: Session = Depends(deps.get_db),
+    scope: GridScope = Depends(deps.get_grid_scope),
+    current_user: models.user.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Render a user's grid as SVG or PNG, as shown in the web UI.
+    """
+    target_user = db.get(models.user.User, user_id)
+    if not target_user or not target_user.is_active or not scope.includes(target_user):
+        raise HTTPException(status_code=404, detail="User not found")
+    digest, data = render_or_busy(lambda: grid_image.user_image(db, scope, target_user, image_format))
+    return image_response(request, digest, data, image_format)
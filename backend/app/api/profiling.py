@@ -0,0 +1,87 @@
+import os
+from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from app import schemas, models
+from app.api import deps
+from app.core import profiling
+
+router = APIRouter()
+
+@router.get("/workers", response_model=schemas.profiling.ProfilingWorkers)
+def get_workers(
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Live workers on this host. Only for admin.
+    """
+    return {"current": os.getpid(), "workers": profiling.workers()}
+
+@router.post("/sessions", response_model=schemas.profiling.ProfilingSessionOut)
+def create_session(
+    *,
+    session_in: schemas.profiling.ProfilingSessionCreate,
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Start profiling the given workers (by default the one serving this request). Only for admin.
+    """
+    if session_in.kind == "worker" and session_in.profiler != "sample":
+        # cProfile видит только свой поток — для всего воркера только сэмплер
+        raise HTTPException(status_code=400, detail="Whole-worker profiling supports only the sampling profiler")
+    targets = session_in.workers or [os.getpid()]
+    unknown = set(targets) - set(profiling.workers()) - {os.getpid()}
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown workers: {sorted(unknown)}")
+    spec = session_in.model_dump(exclude={"workers"})
+    session_id = profiling.start_session(spec, targets)
+    return profiling.describe(session_id)
+
+@router.get("/sessions", response_model=List[schemas.profiling.ProfilingSessionOut])
+def get_sessions(
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Profiling sessions with their result files, newest first. Only for admin.
+    """
+    return profiling.sessions()
+
+@router.get("/sessions/{session_id}", response_model=schemas.profiling.ProfilingSessionOut)
+def get_session(
+    session_id: str,
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    One profiling session. Only for admin.
+    """
+    try:
+        return profiling.describe(session_id)
+    except (KeyError, OSError):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+@router.get("/sessions/{session_id}/files/{name}")
+def get_session_file(
+    session_id: str,
+    name: str,
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Download a result: .pstats for pstats/snakeviz, .collapsed for flamegraph.pl/speedscope. Only for admin.
+    """
+    path = profiling.result_path(session_id, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
+
+@router.delete("/sessions/{session_id}")
+def delete_session(
+    session_id: str,
+    current_user: models.user.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Stop a session in this worker and remove its results. Only for admin.
+    """
+    if not profiling.delete_session(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "ok"}
@@ -0,0 +1,35 @@
+import secrets
+from typing import Any, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from app.core import telegram_bot
+from app.core.config import settings
+
+router = APIRouter()
+
+@router.post("/webhook")
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None),
+) -> Any:
+    """
+    Telegram webhook. Checks the secret token set with setWebhook and queues the update;
+    processing (replies, ticking the week) happens after the response.
+    """
+    if not settings.TELEGRAM_WEBHOOK_SECRET:
+        raise HTTPException(status_code=404, detail="Webhook is disabled")
+    if not secrets.compare_digest(
+        (x_telegram_bot_api_secret_token or "").encode(), settings.TELEGRAM_WEBHOOK_SECRET.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    try:
+        update = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid update")
+    if not isinstance(update, dict):
+        raise HTTPException(status_code=400, detail="Invalid update")
+    # Очередь переполнена — не 200: Telegram повторит доставку позже
+    if not telegram_bot.updates.submit(update):
+        raise HTTPException(status_code=503, detail="Update queue is full", headers={"Retry-After": "1"})
+    return {"ok": True}
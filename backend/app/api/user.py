@@ -1,23 +1,47 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app import schemas, models
 from app.api import deps
-from app.core import security
+from app.core import changelog, projection, ratelimit, security
+from app.core.cache import cached, invalidate_tags
+from app.core.cohorts import invalidate_scope
+from app.core.versioning import bump_data_version
+from app.database import release
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.user.UserPublic])
+@router.get("/", response_model=List[schemas.user.UserPublic], dependencies=[Depends(deps.read_only), Depends(deps.cache_headers("users"))])
 def get_users(
+    response: Response,
+    fields: Optional[str] = Query(None, description="Sparse fieldset, e.g. id,emoji"),
     db: Session = Depends(deps.get_db),
 ) -> Any:
     """
     Get all active users.
     """
-    return db.query(models.user.User).filter(models.user.User.is_active == True).all()
+    tree = projection.parse_fields(fields, projection.USER_PUBLIC_FIELDS)
+    if tree is not None:
+        columns = [getattr(models.user.User, name) for name in tree]
+        return projection.projected_response(cached(
+            f"users:{projection.cache_suffix(tree)}",
+            ["users"],
+            lambda: jsonable_encoder([
+                row._asdict()
+                for row in db.query(*columns).filter(models.user.User.is_active == True)
+            ]),
+        ), response)
+    return cached(
+        "users",
+        ["users"],
+        lambda: db.query(models.user.User).filter(models.user.User.is_active == True).all(),
+        List[schemas.user.UserPublic],
+    )
 
-@router.get("/me", response_model=schemas.user.UserOut)
+@router.get("/me", response_model=schemas.user.UserOut, dependencies=[Depends(deps.read_only)])
 def get_user_me(
     current_user: models.user.User = Depends(deps.get_current_user),
 ) -> Any:
@@ -26,7 +50,11 @@ def get_user_me(
     """
     return current_user
 
-@router.get("/{user_id}", response_model=schemas.user.UserPublicProfile)
+@router.get(
+    "/{user_id}",
+    response_model=schemas.user.UserPublicProfile,
+    dependencies=[Depends(deps.read_only), Depends(deps.cache_headers("user:{user_id}"))],
+)
 def get_user_by_id(
     user_id: int,
     db: Session = Depends(deps.get_db),
@@ -34,13 +62,16 @@ def get_user_by_id(
     """
     Get public profile of a user.
     """
-    user = db.query(models.user.User).filter(models.user.User.id == user_id, models.user.User.is_active == True).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    def produce():
+        user = db.query(models.user.User).filter(models.user.User.id == user_id, models.user.User.is_active == True).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    return cached(f"user:{user_id}", [f"user:{user_id}"], produce, schemas.user.UserPublicProfile)
 
 @router.put("/me", response_model=schemas.user.UserOut)
-def update_user_me(
+async def update_user_me(
     *,
     db: Session = Depends(deps.get_db),
     user_in: schemas.user.UserUpdate,
@@ -49,8 +80,21 @@ def update_user_me(
     """
     Update own user.
     """
+    hashed_password = None
     if user_in.password is not None:
-        current_user.hashed_password = security.get_password_hash(user_in.password)
+        # Очередь к Argon2 ждёт в цикле событий; транзакцию на это время не держим
+        await run_in_threadpool(release, db)
+        hashed_password = await ratelimit.run_hashing(security.get_password_hash, user_in.password)
+    return await run_in_threadpool(apply_user_update, db, user_in, current_user, hashed_password)
+
+def apply_user_update(
+    db: Session,
+    user_in: schemas.user.UserUpdate,
+    current_user: models.user.User,
+    hashed_password: Optional[str],
+) -> models.user.User:
+    if hashed_password is not None:
+        current_user.hashed_password = hashed_password
     
     if user_in.full_name is not None:
         current_user.full_name = user_in.full_name
@@ -76,8 +120,14 @@ def update_user_me(
         if existing_user:
             raise HTTPException(status_code=400, detail="Этот эмодзи уже занят другим участником")
         current_user.emoji = user_in.emoji
+        changelog.record_user(db, current_user)
     
     db.add(current_user)
+    bump_data_version(db)
     db.commit()
+    invalidate_tags("users", f"user:{current_user.id}", "progress")
     db.refresh(current_user)
+    if current_user.is_superuser:
+        # Даты админа — настройки глобальной когорты
+        invalidate_scope(None)
     return current_user
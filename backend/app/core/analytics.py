@@ -0,0 +1,212 @@
+"""
+Cohort analytics: streaks, completion rates and finish forecasts.
+
+Completed weeks of every active member are loaded once and laid out as a
+boolean matrix, one row per user and one column per calendar slot. All
+figures are then whole-matrix NumPy operations, with no loop over users:
+
+- streaks count consecutive completed weeks, skipping special slots. The
+  current week doesn't break a streak while it's still in progress;
+- the weekly rate is the share of members who completed a slot. The
+  rolling rate is its mean over the last ``window`` working weeks;
+- the pace is the least-squares slope of a user's cumulative completions
+  over the finished working weeks. The projected finish is the week in
+  which ``remaining / pace`` more working weeks run out. Past the deadline
+  it is extrapolated at one week per 7 days.
+
+Results are cached per (data version, scope, window, day).
+"""
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.calendar import WeekCalendar, get_calendar
+from app.core.cohorts import GridScope
+from app.core.grid_snapshot import load_progress_rows
+from app.core.versioning import get_data_version
+from app.database import release
+from app.models.user import User
+from app.models.week_progress import WeekProgress
+
+_analytics = LRUCache(maxsize=256)
+
+
+def completion_matrix(db: Session, scope: GridScope, calendar: WeekCalendar):
+    """``(user ids, emojis, users × slots bool matrix)`` of the scope's active members."""
+    members = load_progress_rows(db, scope, with_weeks=False)
+    user_ids = np.fromiter(members, dtype=np.int64, count=len(members))
+    emojis = [u.emoji for u in members.values()]
+    done = np.zeros((len(user_ids), calendar.total_weeks), dtype=bool)
+    if not len(user_ids) or not calendar.slots:
+        return user_ids, emojis, done
+
+    rows = db.execute(
+        select(WeekProgress.user_id, WeekProgress.week_start_date)
+        .join(User, User.id == WeekProgress.user_id)
+        .where(WeekProgress.is_completed == True, User.is_active == True, scope.user_filter())
+    ).all()
+    if rows:
+        owners = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        days = np.fromiter((r[1].toordinal() for r in rows), dtype=np.int64, count=len(rows))
+        # Слот — по арифметике календаря, как index_of
+        slots = (days - calendar.start_date.toordinal()) // 7
+        inside = (slots >= 0) & (slots < calendar.total_weeks)
+        done[np.searchsorted(user_ids, owners[inside]), slots[inside]] = True
+    return user_ids, emojis, done
+
+
+def run_lengths(done: np.ndarray) -> np.ndarray:
+    """Length of the run of True ending at each column, per row."""
+    total = np.cumsum(done, axis=1)
+    # Счётчик на последнем пропуске — база, от которой отсчитывается текущая серия
+    base = np.maximum.accumulate(np.where(done, 0, total), axis=1)
+    return total - base
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(0, ends - window)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+
+def trend(cumulative: np.ndarray) -> np.ndarray:
+    """Least-squares slope of every row against 1..n."""
+    n = cumulative.shape[1]
+    if n == 0:
+        return np.zeros(cumulative.shape[0])
+    if n == 1:
+        return cumulative[:, 0].astype(float)
+    x = np.arange(1, n + 1, dtype=float)
+    x -= x.mean()
+    centered = cumulative - cumulative.mean(axis=1, keepdims=True)
+    return centered @ x / (x @ x)
+
+
+def forecast(completed: np.ndarray, pace: np.ndarray, ahead: np.ndarray, last_slot: int,
+             effective_weeks: int, now: int) -> np.ndarray:
+    """
+    Ordinal of the week start in which each user finishes ``effective_weeks``
+    at ``pace`` per working week (``now`` if already done, -1 if never), given
+    ``completed`` weeks and the week-start ordinals of the working slots ``ahead``.
+    """
+    remaining = np.maximum(0, effective_weeks - completed)
+    safe_pace = np.where(pace > 0, pace, 1.0)
+    needed = np.where(pace > 0, np.ceil(remaining / safe_pace), -1).astype(np.int64)
+    finish = np.full(len(completed), -1, dtype=np.int64)
+    if len(ahead):
+        within = (needed > 0) & (needed <= len(ahead))
+        finish = np.where(within, ahead[np.clip(needed - 1, 0, len(ahead) - 1)], finish)
+    # Не успевает до конца сетки — продолжаем её по неделе на 7 дней
+    beyond = needed > len(ahead)
+    finish = np.where(beyond, last_slot + 7 * (needed - len(ahead)), finish)
+    return np.where(remaining == 0, now, finish)
+
+
+def _finish(ordinal: int) -> Optional[date]:
+    return date.fromordinal(ordinal) if ordinal > 0 else None
+
+
+def compute(calendar: WeekCalendar, user_ids: np.ndarray, emojis, done: np.ndarray, window: int, today: date) -> Dict:
+    special = np.array([s.is_special for s in calendar.slots], dtype=bool)
+    working = np.flatnonzero(~special)
+    # Слоты, начавшиеся к сегодняшнему дню; последний из них может ещё идти
+    started = 0
+    if calendar.slots:
+        started = int(np.clip((today - calendar.start_date).days // 7 + 1, 0, calendar.total_weeks))
+    in_progress = 0 < started and calendar.index_of(today) == started - 1
+    past = working[working < started]
+    finished = past[:-1] if in_progress and len(past) and past[-1] == started - 1 else past
+
+    members = len(user_ids)
+    worked = done[:, past]
+    runs = run_lengths(worked)
+    if len(past):
+        longest = runs.max(axis=1)
+        current = runs[:, -1]
+        if len(finished) < len(past):
+            # Текущая неделя ещё не отмечена — серия не прервана, считаем по прошлой
+            previous = runs[:, -2] if len(past) > 1 else np.zeros(members, dtype=np.int64)
+            current = np.where(worked[:, -1], current, previous)
+    else:
+        longest = current = np.zeros(members, dtype=np.int64)
+
+    completed = done[:, working].sum(axis=1)
+    cumulative = np.cumsum(done[:, finished], axis=1)
+    pace = np.clip(trend(cumulative), 0.0, 1.0)
+    # finished — начало working: впереди всё, что ещё не закончилось
+    ahead = np.array([calendar.slots[i].week_start_date.toordinal() for i in working[len(finished):]], dtype=np.int64)
+    last_slot = calendar.slots[-1].week_start_date.toordinal() if calendar.slots else 0
+    now = today.toordinal()
+    finish = forecast(completed, pace, ahead, last_slot, len(working), now)
+
+    cohort_pace = np.clip(trend(cumulative.mean(axis=0, keepdims=True)), 0.0, 1.0) if members else np.zeros(1)
+    cohort_done = completed.mean(keepdims=True) if members else np.zeros(1)
+    cohort_finish = forecast(cohort_done, cohort_pace, ahead, last_slot, len(working), now)
+
+    rates = done[:, past].mean(axis=0) if members else np.zeros(len(past))
+    rolling = rolling_mean(rates, window)
+    deadline = calendar.deadline.toordinal() if calendar.deadline else 0
+
+    def on_track(ordinal: int) -> bool:
+        return 0 < ordinal <= max(deadline, now)
+
+    return {
+        "start_date": calendar.start_date,
+        "deadline": calendar.deadline,
+        "members": members,
+        "effective_weeks": len(working),
+        "elapsed_weeks": len(finished),
+        "window": window,
+        "weeks": [
+            {
+                "index": int(index),
+                "week_start_date": calendar.slots[index].week_start_date,
+                "rate": round(float(rate), 4),
+                "rolling_rate": round(float(mean), 4),
+            }
+            for index, rate, mean in zip(past.tolist(), rates, rolling)
+        ],
+        "users": [
+            {
+                "user_id": user_id,
+                "emoji": emoji or "🎓",
+                "completed_weeks": done_weeks,
+                "current_streak": streak,
+                "longest_streak": best,
+                "pace": round(user_pace, 3),
+                "projected_finish": _finish(ordinal),
+                "on_track": on_track(ordinal),
+            }
+            for user_id, emoji, done_weeks, streak, best, user_pace, ordinal in zip(
+                user_ids.tolist(), emojis, completed.tolist(), current.tolist(), longest.tolist(),
+                pace.tolist(), finish.tolist(),
+            )
+        ],
+        "cohort": {
+            "completed_weeks": round(float(cohort_done[0]), 2),
+            "mean_current_streak": round(float(current.mean()), 2) if members else 0.0,
+            "pace": round(float(cohort_pace[0]), 3),
+            "projected_finish": _finish(int(cohort_finish[0])),
+            "on_track": on_track(int(cohort_finish[0])),
+        },
+    }
+
+
+def get_analytics(db: Session, scope: GridScope, window: int, today: Optional[date] = None) -> Dict:
+    today = today or date.today()
+    # scope в ключе: смена дат в другом воркере меняет scope раньше, чем версию
+    key = (get_data_version(db), scope, window, today)
+    result = _analytics.get(key)
+    if result is None:
+        calendar = get_calendar(db, scope)
+        user_ids, emojis, done = completion_matrix(db, scope, calendar)
+        # Данные прочитаны — считаем, не держа соединение с БД
+        release(db)
+        result = compute(calendar, user_ids, emojis, done, window, today)
+        _analytics.set(key, result)
+    return result
@@ -0,0 +1,138 @@
+"""
+Move job for week_progress: rows of inactive users and of weeks before the
+current academic period go to week_progress_archive, so the hot table only
+holds the active cohort.
+
+Admin command:
+
+    python -m app.core.archive --inactive                 # inactive users
+    python -m app.core.archive --before-start             # weeks before the global start_date
+    python -m app.core.archive --before 2025-09-01 --user-id 7 --dry-run
+"""
+import argparse
+from datetime import date
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.core import changelog
+from app.core.cohorts import get_admin_user
+from app.core.cache import invalidate_tags
+from app.core.versioning import bump_data_version
+from app.models.user import User
+from app.models.week_progress import WeekProgress
+from app.models.week_progress_archive import WeekProgressArchive
+
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def archive_criteria(
+    inactive: bool = False,
+    before: Optional[date] = None,
+    user_ids: Optional[Iterable[int]] = None,
+):
+    """
+    WHERE clause selecting week_progress rows to archive.
+
+    ``inactive`` and ``user_ids`` pick whole users; ``before`` narrows the
+    selection to weeks starting earlier than that date (or, on its own,
+    archives those weeks for everyone).
+    """
+    user_filters = []
+    if inactive:
+        user_filters.append(
+            WeekProgress.user_id.in_(select(User.id).where(User.is_active == False))
+        )
+    if user_ids:
+        user_filters.append(WeekProgress.user_id.in_(list(user_ids)))
+
+    clauses = []
+    if user_filters:
+        clauses.append(or_(*user_filters))
+    if before is not None:
+        clauses.append(WeekProgress.week_start_date < before)
+    if not clauses:
+        raise ValueError("Nothing to archive: pass inactive, before or user_ids")
+    return and_(*clauses)
+
+
+def count_archivable(db: Session, criteria) -> int:
+    return db.scalar(select(func.count()).select_from(WeekProgress).where(criteria))
+
+
+def archive_week_progress(db: Session, criteria, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Copy matching rows to the archive and delete them from week_progress,
+    one committed batch at a time. Returns the number of rows moved.
+    """
+    moved = 0
+    while True:
+        ids = db.scalars(
+            select(WeekProgress.id).where(criteria).order_by(WeekProgress.id).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        db.execute(
+            insert(WeekProgressArchive).from_select(
+                ["id", "user_id", "week_start_date", "is_completed", "note"],
+                select(
+                    WeekProgress.id,
+                    WeekProgress.user_id,
+                    WeekProgress.week_start_date,
+                    WeekProgress.is_completed,
+                    WeekProgress.note,
+                ).where(WeekProgress.id.in_(ids)),
+            )
+        )
+        db.execute(
+            delete(WeekProgress)
+            .where(WeekProgress.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        changelog.record_reset(db)
+        bump_data_version(db)
+        db.commit()
+        invalidate_tags("progress", "weeks")
+        moved += len(ids)
+    return moved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old week_progress rows")
+    parser.add_argument("--inactive", action="store_true", help="archive rows of inactive users")
+    parser.add_argument("--before", type=date.fromisoformat, help="archive weeks starting before this date")
+    parser.add_argument("--before-start", action="store_true",
+                        help="archive weeks before the global start_date (previous academic period)")
+    parser.add_argument("--user-id", type=int, action="append", help="archive rows of this user; may be repeated")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count matching rows")
+    args = parser.parse_args(argv)
+
+    from app.core.embedded import for_writes
+    from app.database import SessionLocal
+
+    db = for_writes(SessionLocal())
+    try:
+        before = args.before
+        if args.before_start:
+            admin = get_admin_user(db)
+            if not admin or not admin.start_date:
+                parser.error("--before-start needs the admin's start_date to be set")
+            before = admin.start_date
+        try:
+            criteria = archive_criteria(inactive=args.inactive, before=before, user_ids=args.user_id)
+        except ValueError as e:
+            parser.error(str(e))
+
+        if args.dry_run:
+            print(f"{count_archivable(db, criteria)} rows would be archived")
+            return
+        moved = archive_week_progress(db, criteria, batch_size=args.batch_size)
+        print(f"Archived {moved} rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
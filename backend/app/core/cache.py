@@ -0,0 +1,389 @@
+"""
+Caches.
+
+- ``LRUCache`` — small in-process mapping for per-worker memoization.
+- Response/object cache tier: ``TaggedCache`` over a pluggable backend
+  selected by ``CACHE_BACKEND``:
+
+  * ``memory`` — in-process LRU (per worker, lost on restart)
+  * ``file``   — SQLite file shared by all workers on one host
+  * ``redis``  — any Redis-protocol server, shared by all hosts
+
+Invalidation is tag based: every tag has a version counter stored in the
+backend, entries remember the tag versions they were built under, and
+``invalidate_tags`` bumps the counters, which makes all dependent entries
+stale at once on every worker that shares the backend.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence
+
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.core.replicas import PINNED, REPLICA, read_source
+from app.core.resp import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+# Недоступный общий кэш не должен ронять запросы — работаем мимо него
+BACKEND_ERRORS = (OSError, ConnectionError, RespError, sqlite3.Error)
+
+# Все созданные кэши — чтобы их можно было сбросить разом (тесты, смена БД)
+_registry: "weakref.WeakSet" = weakref.WeakSet()
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with a fixed number of entries."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        _registry.add(self)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# --- backends ---------------------------------------------------------------
+
+class CacheBackend(ABC):
+    """Byte-oriented key/value store with TTLs and atomic counters."""
+
+    @abstractmethod
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class MemoryBackend(CacheBackend):
+    """
+    In-process LRU of ``maxsize`` entries. Counters are kept apart and never
+    evicted: a tag counter dropped by the LRU would read as 0 again and
+    revive entries stored before the first invalidation.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for key in keys:
+                counter = self._counters.get(key)
+                if counter is not None:
+                    out.append(str(counter).encode())
+                    continue
+                item = self._data.get(key)
+                if item is None or (item[0] is not None and item[0] <= now):
+                    out.append(None)
+                    continue
+                self._data.move_to_end(key)
+                out.append(item[1])
+        return out
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._counters.pop(key, None)
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counters.get(key)
+            if value is None:
+                item = self._data.pop(key, None)
+                value = int(item[1]) if item else 0
+            value += 1
+            self._counters[key] = value
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._counters.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+
+class FileBackend(CacheBackend):
+    """
+    SQLite file in WAL mode; every worker on the host opens the same file.
+    Expired rows are skipped on read and pruned every ``prune_every`` writes.
+    """
+
+    def __init__(self, path: str, maxsize: int = 100_000, prune_every: int = 500):
+        self.path = path
+        self.maxsize = maxsize
+        self.prune_every = prune_every
+        self._writes = 0
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn().execute(
+            f"SELECT key, value, expires FROM kv WHERE key IN ({placeholders})", list(keys)
+        ).fetchall()
+        now = time.time()
+        found = {k: v for k, v, exp in rows if exp is None or exp > now}
+        return [found.get(k) for k in keys]
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)", (key, value, expires))
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self._prune(conn)
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM kv WHERE expires IS NOT NULL AND rowid IN "
+            "(SELECT rowid FROM kv WHERE expires IS NOT NULL ORDER BY expires LIMIT "
+            "max(0, (SELECT count(*) FROM kv) - ?))",
+            (self.maxsize,),
+        )
+
+    def incr(self, key):
+        return self._conn().execute(
+            "INSERT INTO kv (key, value, expires) VALUES (?, 1, NULL) "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1 "
+            "RETURNING value",
+            (key,),
+        ).fetchone()[0]
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM kv")
+
+
+class RedisBackend(CacheBackend):
+    def __init__(self, client: RespClient, prefix: str = "dm:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get_many(self, keys):
+        return self.client.mget([self.prefix + k for k in keys])
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, px=int(ttl * 1000) if ttl else None)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + "*"))
+        for i in range(0, len(keys), 500):
+            self.client.delete(*keys[i:i + 500])
+
+
+def create_backend(kind: str, url: str = "") -> CacheBackend:
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "file":
+        return FileBackend(url or "/tmp/diplom-monitor-cache.sqlite3")
+    if kind == "redis":
+        return RedisBackend(RespClient(url or "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+
+
+# --- tagged cache -----------------------------------------------------------
+
+MISS = object()
+
+
+class TaggedCache:
+    def __init__(self, backend: CacheBackend, default_ttl: float = 60.0):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        # Хуки вызываются после инвалидации (например, purge во внешнем кэше)
+        self.invalidation_hooks: List[Callable[[List[str]], None]] = []
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"tag:{tag}"
+
+    def lookup(self, key: str, tags: Sequence[str]):
+        """
+        Returns ``(value, tag_versions)``; value is ``MISS`` when absent or stale.
+        The versions are read *before* the caller produces a fresh value, so a
+        concurrent invalidation can't be hidden by a late ``store``.
+        """
+        raw = self.backend.get_many([f"v:{key}"] + [self._tag_key(t) for t in tags])
+        entry, versions = raw[0], [int(v) if v is not None else 0 for v in raw[1:]]
+        if entry is None:
+            return MISS, versions
+        payload = json.loads(entry)
+        if payload["t"] != versions:
+            return MISS, versions
+        return payload["v"], versions
+
+    def store(self, key: str, value: Any, versions: Sequence[int], ttl: Optional[float] = None) -> None:
+        data = json.dumps({"v": value, "t": list(versions)}, ensure_ascii=False, separators=(",", ":"))
+        self.backend.set(f"v:{key}", data.encode(), ttl or self.default_ttl)
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        tags = list(dict.fromkeys(tags))
+        try:
+            for tag in tags:
+                self.backend.incr(self._tag_key(tag))
+        finally:
+            for hook in self.invalidation_hooks:
+                hook(tags)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+_response_cache: Optional[TaggedCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> TaggedCache:
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = TaggedCache(
+                    create_backend(settings.CACHE_BACKEND, settings.CACHE_URL),
+                    default_ttl=settings.CACHE_TTL,
+                )
+    return _response_cache
+
+
+def set_response_cache(cache: Optional[TaggedCache]) -> None:
+    global _response_cache
+    _response_cache = cache
+
+
+def cached(
+    key: str,
+    tags: Sequence[str],
+    producer: Callable[[], Any],
+    response_type: Any = None,
+    ttl: Optional[float] = None,
+) -> Any:
+    """
+    Return the cached JSON-ready value for ``key`` or build it with ``producer``.
+
+    ``response_type`` (the endpoint's response model) turns ORM objects into
+    plain JSON data before storing; the same data is returned on hits.
+    Requests served by a read replica keep what they build only for the
+    allowed replication lag; requests pinned to the primary skip hits.
+    """
+    cache = get_response_cache()
+    source = read_source.get()
+    try:
+        value, versions = cache.lookup(key, tags)
+    except BACKEND_ERRORS as exc:
+        logger.warning("cache lookup failed: %s", exc)
+        value, versions = MISS, None
+    # Только что писавший читает с primary мимо кэша: запись могла быть собрана с отстающей реплики
+    if value is not MISS and source != PINNED:
+        return value
+    if source == REPLICA:
+        # Данные реплики могут отставать на допустимый лаг — дольше их не держим
+        ttl = min(ttl or cache.default_ttl, settings.REPLICA_MAX_LAG)
+        if ttl <= 0:
+            versions = None
+    produced = producer()
+    if response_type is not None:
+        adapter = TypeAdapter(response_type)
+        value = adapter.dump_python(adapter.validate_python(produced, from_attributes=True), mode="json")
+    else:
+        value = produced
+    if versions is not None:
+        try:
+            cache.store(key, value, versions, ttl)
+        except BACKEND_ERRORS as exc:
+            logger.warning("cache store failed: %s", exc)
+    return value
+
+
+def invalidate_tags(*tags: str) -> None:
+    try:
+        get_response_cache().invalidate(tags)
+    except BACKEND_ERRORS as exc:
+        # Записи устареют по TTL
+        logger.warning("cache invalidation failed: %s", exc)
+
+
+def clear_all_caches() -> None:
+    for cache in list(_registry):
+        cache.clear()
+    if _response_cache is not None:
+        _response_cache.clear()
@@ -0,0 +1,138 @@
+"""
+Week calendar of a grid scope.
+
+The grid is a list of 7-day slots starting at the scope's start_date and
+ending at the last slot that starts on or before the deadline — the same
+slots WeekGrid.vue draws. A slot is special when its start date falls into
+a special period. Calendars are built once per (scope, special-period
+version) and shared; any date maps to its slot by arithmetic, no search.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.cohorts import GridScope
+from app.core.versioning import get_data_version
+from app.models.special_period import SpecialPeriod
+
+# Версия набора особых периодов: календарь не зависит от отметок недель
+PERIODS_VERSION_KEY = "periods"
+
+
+@dataclass(frozen=True)
+class WeekSlot:
+    index: int
+    # Начало слота, как его рисует сетка (start_date + 7 * index)
+    week_start_date: date
+    monday: date
+    is_special: bool = False
+    period_id: Optional[int] = None
+    period_type: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class WeekCalendar:
+    start_date: Optional[date]
+    deadline: Optional[date]
+    slots: Tuple[WeekSlot, ...]
+    special_weeks: int
+
+    @property
+    def total_weeks(self) -> int:
+        return len(self.slots)
+
+    @property
+    def effective_weeks(self) -> int:
+        return self.total_weeks - self.special_weeks
+
+    def index_of(self, day: date) -> Optional[int]:
+        """Index of the slot containing ``day``, or None outside the grid."""
+        if not self.slots:
+            return None
+        index = (day - self.start_date).days // 7
+        return index if 0 <= index < len(self.slots) else None
+
+    def slot_for(self, day: date) -> Optional[WeekSlot]:
+        index = self.index_of(day)
+        return self.slots[index] if index is not None else None
+
+    def stats(self, completed_weeks: int) -> dict:
+        return {
+            "total_weeks": self.total_weeks,
+            "special_weeks": self.special_weeks,
+            "effective_weeks": self.effective_weeks,
+            "completed_weeks": completed_weeks,
+            "remaining_weeks": max(0, self.effective_weeks - completed_weeks),
+        }
+
+
+EMPTY_CALENDAR = WeekCalendar(start_date=None, deadline=None, slots=(), special_weeks=0)
+
+
+def build_calendar(start_date: Optional[date], deadline: Optional[date],
+                   special_periods: Iterable[SpecialPeriod]) -> WeekCalendar:
+    if not start_date or not deadline or deadline < start_date:
+        return EMPTY_CALENDAR
+
+    count = (deadline - start_date).days // 7 + 1
+    covering: List[Optional[SpecialPeriod]] = [None] * count
+    # Слот особый, если его первый день внутри периода; при пересечении побеждает ранний период
+    for period in sorted(special_periods, key=lambda p: (p.start_date, p.id or 0)):
+        first = max(0, -(-(period.start_date - start_date).days // 7))
+        last = min(count - 1, (period.end_date - start_date).days // 7)
+        for index in range(first, last + 1):
+            if covering[index] is None:
+                covering[index] = period
+
+    slots = []
+    for index, period in enumerate(covering):
+        day = start_date + timedelta(weeks=index)
+        slots.append(WeekSlot(
+            index=index,
+            week_start_date=day,
+            monday=day - timedelta(days=day.weekday()),
+            is_special=period is not None,
+            period_id=period.id if period is not None else None,
+            period_type=period.period_type if period is not None else None,
+        ))
+    return WeekCalendar(
+        start_date=start_date,
+        deadline=deadline,
+        slots=tuple(slots),
+        special_weeks=sum(1 for p in covering if p is not None),
+    )
+
+
+_calendars = LRUCache(maxsize=256)
+
+
+def get_calendar(db: Session, scope: GridScope,
+                 special_periods: Optional[Sequence[SpecialPeriod]] = None) -> WeekCalendar:
+    """
+    Calendar of the scope. ``special_periods`` may be passed when the caller
+    has already loaded them; otherwise they're read only on a cache miss.
+    """
+    if not scope.start_date or not scope.deadline:
+        return EMPTY_CALENDAR
+    key = (scope.cache_key(), get_data_version(db, PERIODS_VERSION_KEY))
+    calendar = _calendars.get(key)
+    if calendar is None:
+        if special_periods is None:
+            special_periods = db.query(SpecialPeriod).filter(scope.special_period_filter()).all()
+        calendar = build_calendar(scope.start_date, scope.deadline, special_periods)
+        _calendars.set(key, calendar)
+    return calendar
+
+
+def calendar_payload(calendar: WeekCalendar) -> Dict:
+    return {
+        "start_date": calendar.start_date,
+        "deadline": calendar.deadline,
+        "total_weeks": calendar.total_weeks,
+        "special_weeks": calendar.special_weeks,
+        "effective_weeks": calendar.effective_weeks,
+        "slots": calendar.slots,
+    }
@@ -0,0 +1,93 @@
+"""
+Change log for delta sync of /grid/all-progress.
+
+Writers append entries in their own transaction via ``record_*``; readers
+ask for everything after a cursor with ``changes_since``. Compaction deletes
+old entries and remembers the highest deleted seq as the log floor: a cursor
+below the floor can no longer be served incrementally.
+"""
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.cohorts import GridScope
+from app.models.data_version import DataVersion
+from app.models.progress_change import ProgressChange
+from app.models.user import User
+
+LOG_FLOOR_KEY = "progress_log_floor"
+
+# Sequence numbers are assigned at insert, not at commit: a slow transaction
+# can make seq N visible after N+1 was already served. Re-delivering the last
+# few entries closes that gap; applying them again is idempotent.
+DELTA_OVERLAP = 50
+
+
+def record_week(db: Session, user_id: int, week_start_date: date, is_completed: bool, note: Optional[str],
+                at: Optional[datetime] = None) -> None:
+    # at — когда пользователь отметил неделю (для отложенной записи — раньше коммита)
+    db.add(ProgressChange(
+        kind="week",
+        user_id=user_id,
+        week_start_date=week_start_date,
+        is_completed=is_completed,
+        note=note,
+        created_at=at,
+    ))
+
+
+def record_user(db: Session, user: User) -> None:
+    db.add(ProgressChange(kind="user", user_id=user.id, emoji=user.emoji))
+
+
+def record_reset(db: Session) -> None:
+    db.add(ProgressChange(kind="reset"))
+
+
+def latest_seq(db: Session) -> int:
+    return db.scalar(select(func.max(ProgressChange.seq))) or 0
+
+
+def log_floor(db: Session) -> int:
+    floor = db.scalar(select(DataVersion.version).where(DataVersion.key == LOG_FLOOR_KEY))
+    return floor or 0
+
+
+def changes_since(db: Session, scope: GridScope, since: int, limit: int) -> Optional[List[ProgressChange]]:
+    """
+    Entries after ``since`` visible in the scope, or None when the caller
+    must take a full snapshot instead (cursor compacted away, a reset in
+    between, or more than ``limit`` changes).
+    """
+    start = max(0, since - DELTA_OVERLAP)
+    if since <= 0 or start < log_floor(db):
+        return None
+    stmt = (
+        select(ProgressChange)
+        .outerjoin(User, User.id == ProgressChange.user_id)
+        .where(ProgressChange.seq > start)
+        .order_by(ProgressChange.seq)
+        .limit(limit + 1)
+    )
+    stmt = stmt.where((ProgressChange.kind == "reset") | scope.user_filter())
+    changes = db.scalars(stmt).all()
+    if len(changes) > limit or any(c.kind == "reset" for c in changes):
+        return None
+    return changes
+
+
+def compact_change_log(db: Session, keep: int) -> int:
+    """Delete all but the newest ``keep`` entries; returns the number deleted."""
+    cutoff = latest_seq(db) - keep
+    if cutoff <= log_floor(db):
+        return 0
+    result = db.execute(delete(ProgressChange).where(ProgressChange.seq <= cutoff))
+    floor = db.get(DataVersion, LOG_FLOOR_KEY)
+    if floor is None:
+        db.add(DataVersion(key=LOG_FLOOR_KEY, version=cutoff))
+    else:
+        floor.version = cutoff
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,351 @@
+"""
+Write-behind coalescing of week toggles.
+
+A student clicking a week cell several times in a row used to cost a
+select, a write and a commit per click. With ``WEEK_WRITE_WINDOW`` > 0
+``POST /grid/weeks`` on a week that already has a row only records the
+wanted state here and answers with it; a flusher applies everything
+collected during the window — all users, the last state per (user, week) —
+in one transaction. A week without a row is written at once, so the answer
+always carries the row id.
+
+Durability: an accepted toggle is lost only if the process dies before the
+next flush, i.e. at most one window. With ``WEEK_WRITE_JOURNAL`` set every
+accepted toggle is also appended to a per-process journal file (without
+fsync), so a crashed process loses nothing short of a power failure: on
+startup journals of dead processes are replayed.
+
+Each write carries the time of the click. A pending state older than the
+last change already recorded for that week (a later click that reached
+another worker, or the bot) is dropped instead of overwriting it.
+
+Until the flush the accepted states live only in this process: its reads of
+the user's weeks, stats and dashboard overlay them, and ``pending_tag`` is
+folded into the grid ETag so a revalidation doesn't answer 304 with the old
+state. Other workers of the preforking runner don't see them until the flush,
+which is why the window is off by default and meant for a single worker.
+"""
+import fcntl
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from app import database
+from app.core import history, repository
+from app.core.cache import invalidate_tags
+from app.core.config import settings
+from app.core.embedded import for_writes
+from app.core.versioning import bump_data_version
+from app.core.weeks import KEEP_NOTE, write_week
+from app.models.progress_change import ProgressChange
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[int, date]
+
+
+@dataclass
+class PendingWeek:
+    id: int
+    user_id: int
+    week_start_date: date
+    is_completed: bool
+    note: Optional[str]
+    # Заметку не меняли — при записи не трогаем
+    keep_note: bool
+    accepted_at: datetime
+
+    def out(self) -> dict:
+        """WeekProgressOut-shaped acknowledgement."""
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "week_start_date": self.week_start_date,
+            "is_completed": self.is_completed,
+            "note": self.note,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "id": self.id,
+            "user_id": self.user_id,
+            "week": self.week_start_date.isoformat(),
+            "is_completed": self.is_completed,
+            "note": self.note,
+            "keep_note": self.keep_note,
+            "at": self.accepted_at.isoformat(),
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str) -> "PendingWeek":
+        data = json.loads(line)
+        return cls(
+            id=data["id"],
+            user_id=data["user_id"],
+            week_start_date=date.fromisoformat(data["week"]),
+            is_completed=data["is_completed"],
+            note=data["note"],
+            keep_note=data["keep_note"],
+            accepted_at=datetime.fromisoformat(data["at"]),
+        )
+
+
+class Journal:
+    """
+    Append-only file of accepted toggles, one per process and generation.
+    The file is locked while its process lives; an unlocked journal belongs
+    to a dead process and is replayed by the next one to start.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.generation = 0
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"weeks-{os.getpid()}-{generation}.jsonl")
+
+    def _open(self) -> None:
+        self._file = open(self._path(self.generation), "a", encoding="utf-8")
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def append(self, pending: PendingWeek) -> None:
+        # Без fsync: запись в ОС переживает падение процесса, не питания
+        self._file.write(pending.to_json() + "\n")
+        self._file.flush()
+
+    def rotate(self):
+        """Start a new file for the next window; the old one is ``discard``-ed once its toggles are committed."""
+        old = self._file
+        self.generation += 1
+        self._open()
+        return old
+
+    @staticmethod
+    def discard(old) -> None:
+        os.remove(old.name)
+        old.close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.discard(self._file)
+            self._file = None
+
+    @staticmethod
+    def orphans(directory: str) -> Tuple[List[PendingWeek], List[str]]:
+        """Toggles from journals of dead processes, oldest first, and the files to remove once applied."""
+        entries: List[PendingWeek] = []
+        paths: List[str] = []
+        for path in sorted(glob.glob(os.path.join(directory, "weeks-*.jsonl"))):
+            with open(path, "r", encoding="utf-8") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Журнал живого процесса
+                    continue
+                for line in f:
+                    try:
+                        entries.append(PendingWeek.from_json(line))
+                    except (ValueError, KeyError):
+                        # Недописанная при падении строка
+                        logger.warning("coalescing: skipping a broken journal line in %s", path)
+            paths.append(path)
+        entries.sort(key=lambda p: p.accepted_at)
+        return entries, paths
+
+
+class WeekCoalescer:
+    def __init__(self, window: float, journal_dir: str = "", session_factory: Optional[Callable[[], Session]] = None):
+        self.window = window
+        self.journal_dir = journal_dir
+        self.session_factory = session_factory
+        self._pending: Dict[Key, PendingWeek] = {}
+        self._lock = threading.Lock()
+        # Один сброс за раз: поток окна и остановка не пишут параллельно
+        self._flush_lock = threading.Lock()
+        self._journal: Optional[Journal] = None
+        # Журналы окон, чья запись не удалась: удаляются после следующей удачной
+        self._unwritten: List = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def _session(self) -> Session:
+        if self.session_factory is not None:
+            return self.session_factory()
+        return for_writes(database.SessionLocal())
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        if self.journal_dir:
+            orphans, paths = Journal.orphans(self.journal_dir)
+            if orphans:
+                logger.info("coalescing: replaying %d toggles from a previous run", len(orphans))
+                self.apply(orphans)
+            for path in paths:
+                # Параллельно стартовавший воркер мог применить и удалить его раньше
+                if os.path.exists(path):
+                    os.remove(path)
+            self._journal = Journal(self.journal_dir)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="week-coalescer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        # Принятое за последнее окно — записать до выхода
+        try:
+            self.flush()
+        except Exception:
+            # Журнал остаётся на диске и будет применён при следующем старте
+            logger.exception("coalescing: final flush failed")
+            self._journal = None
+            return
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.window):
+            try:
+                self.flush()
+            except Exception:
+                # Отметки остаются в журнале/очереди до следующего окна
+                logger.exception("coalescing: flush failed")
+
+    # --- приём ---
+
+    def submit(self, db: Session, user_id: int, week_start_date: date, is_completed: bool,
+               note=KEEP_NOTE) -> Optional[dict]:
+        """
+        Accept a toggle of an existing week and return the acknowledged state,
+        or None when the week has no row yet and must be written directly.
+        """
+        key = (user_id, week_start_date)
+        with self._lock:
+            known = self._pending.get(key)
+        if known is None:
+            row = repository.user_week(db, user_id, week_start_date)
+            if row is None:
+                return None
+            known = PendingWeek(row.id, user_id, week_start_date, row.is_completed, row.note, True, history.utcnow())
+
+        keep_note = note is KEEP_NOTE
+        pending = PendingWeek(
+            id=known.id,
+            user_id=user_id,
+            week_start_date=week_start_date,
+            is_completed=is_completed,
+            note=known.note if keep_note else note,
+            # Заметку, изменённую раньше в этом окне, тоже надо записать
+            keep_note=keep_note and known.keep_note,
+            accepted_at=history.utcnow(),
+        )
+        with self._lock:
+            self._pending[key] = pending
+            if self._journal is not None:
+                self._journal.append(pending)
+        return pending.out()
+
+    def pending_of(self, user_id: int) -> Dict[date, PendingWeek]:
+        """Accepted but not yet written states of a user's weeks."""
+        with self._lock:
+            return {week: p for (uid, week), p in self._pending.items() if uid == user_id}
+
+    def pending_tag(self) -> str:
+        """Digest of the accepted but not yet written states, '' when there are none."""
+        with self._lock:
+            states = sorted(
+                (uid, week.isoformat(), p.is_completed, p.note) for (uid, week), p in self._pending.items()
+            )
+        if not states:
+            return ""
+        return hashlib.sha1(repr(states).encode()).hexdigest()[:12]
+
+    # --- запись ---
+
+    def flush(self) -> int:
+        """Write everything accepted so far in one transaction; returns the number of weeks written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = list(self._pending.values()), {}
+                old_journal = self._journal.rotate() if self._journal is not None and batch else None
+            if not batch:
+                return 0
+            if old_journal is not None:
+                self._unwritten.append(old_journal)
+            try:
+                written = self.apply(batch)
+            except Exception:
+                # Вернуть невыполненное, не затирая принятое за это время
+                with self._lock:
+                    for pending in batch:
+                        self._pending.setdefault((pending.user_id, pending.week_start_date), pending)
+                raise
+            for journal in self._unwritten:
+                Journal.discard(journal)
+            self._unwritten = []
+            return written
+
+    def apply(self, batch: Iterable[PendingWeek]) -> int:
+        latest: Dict[Key, PendingWeek] = {}
+        for pending in batch:
+            key = (pending.user_id, pending.week_start_date)
+            if key not in latest or latest[key].accepted_at <= pending.accepted_at:
+                latest[key] = pending
+        if not latest:
+            return 0
+
+        db = self._session()
+        try:
+            recorded = dict(
+                ((user_id, week), at) for user_id, week, at in db.execute(
+                    select(ProgressChange.user_id, ProgressChange.week_start_date, func.max(ProgressChange.created_at))
+                    .where(
+                        ProgressChange.kind == "week",
+                        tuple_(ProgressChange.user_id, ProgressChange.week_start_date).in_(list(latest)),
+                    )
+                    .group_by(ProgressChange.user_id, ProgressChange.week_start_date)
+                )
+            )
+            written = []
+            for key, pending in latest.items():
+                if recorded.get(key) is not None and recorded[key] > pending.accepted_at:
+                    # Более поздняя отметка уже записана (другой воркер, бот)
+                    continue
+                write_week(
+                    db, pending.user_id, pending.week_start_date, pending.is_completed,
+                    KEEP_NOTE if pending.keep_note else pending.note,
+                    at=pending.accepted_at,
+                )
+                written.append(pending.user_id)
+            if not written:
+                db.rollback()
+                return 0
+            bump_data_version(db)
+            db.commit()
+        finally:
+            db.close()
+        invalidate_tags("progress", *{f"weeks:{user_id}" for user_id in written})
+        return len(written)
+
+
+writes = WeekCoalescer(settings.WEEK_WRITE_WINDOW, settings.WEEK_WRITE_JOURNAL)
@@ -0,0 +1,103 @@
+"""
+Grid scope resolution.
+
+Every /grid/* endpoint works inside a scope: either the legacy global one,
+configured by "the admin user" (dates from the admin's profile, special
+periods owned by the admin) and covering the users outside any cohort, or a
+cohort (dates and special periods stored on the Cohort, its members only). Resolved scopes are cached per cohort under the grid data
+version: every write that changes a scope bumps it, so all workers of the
+preforking runner reload the scope on their next request. The write paths
+also drop the scope explicitly in their own process.
+"""
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import false
+from sqlalchemy.orm import Session
+
+from app.core import repository
+from app.core.versioning import get_data_version
+from app.models.cohort import Cohort
+from app.models.special_period import SpecialPeriod
+from app.models.user import User
+
+_ALL = object()
+# cohort_id -> (версия данных, при которой область прочитана, область)
+_scope_cache: Dict[Optional[int], Tuple[int, "GridScope"]] = {}
+_scope_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class GridScope:
+    cohort_id: Optional[int]
+    start_date: Optional[date]
+    deadline: Optional[date]
+    # Legacy scope: the admin whose special periods are global
+    owner_id: Optional[int] = None
+
+    def user_filter(self):
+        # Глобальная область — только пользователи вне когорт, срезы кафедр не смешиваются
+        if self.cohort_id is None:
+            return User.cohort_id.is_(None)
+        return User.cohort_id == self.cohort_id
+
+    def special_period_filter(self):
+        if self.cohort_id is not None:
+            return SpecialPeriod.cohort_id == self.cohort_id
+        if self.owner_id is None:
+            return false()
+        return (SpecialPeriod.user_id == self.owner_id) & SpecialPeriod.cohort_id.is_(None)
+
+    def includes(self, user: User) -> bool:
+        return user.cohort_id == self.cohort_id
+
+    def cache_key(self) -> str:
+        """Stable string for shared cache keys; changes whenever the scope settings do."""
+        return f"{self.cohort_id}:{self.start_date}:{self.deadline}:{self.owner_id}"
+
+
+def get_admin_user(db: Session) -> Optional[User]:
+    # Fallback to first user if no superuser exists yet
+    return repository.admin_user(db)
+
+
+def _load_scope(db: Session, cohort_id: Optional[int]) -> Optional[GridScope]:
+    if cohort_id is None:
+        admin = repository.admin_scope_row(db)
+        if not admin:
+            return GridScope(cohort_id=None, start_date=None, deadline=None)
+        return GridScope(
+            cohort_id=None,
+            start_date=admin.start_date,
+            deadline=admin.deadline,
+            owner_id=admin.id,
+        )
+    cohort = db.get(Cohort, cohort_id)
+    if not cohort:
+        return None
+    return GridScope(cohort_id=cohort.id, start_date=cohort.start_date, deadline=cohort.deadline)
+
+
+def resolve_scope(db: Session, cohort_id: Optional[int] = None) -> Optional[GridScope]:
+    """Scope for a cohort (or the legacy global scope for None); None if the cohort doesn't exist."""
+    # Версия читается до области: запись между ними оставит новую область под старой версией — не наоборот
+    version = get_data_version(db)
+    cached = _scope_cache.get(cohort_id)
+    if cached and cached[0] == version:
+        return cached[1]
+    scope = _load_scope(db, cohort_id)
+    if scope is not None:
+        with _scope_lock:
+            _scope_cache[cohort_id] = (version, scope)
+    return scope
+
+
+def invalidate_scope(cohort_id=_ALL) -> None:
+    """Drop the cached scope of one cohort (None = legacy scope) or of all cohorts."""
+    with _scope_lock:
+        if cohort_id is _ALL:
+            _scope_cache.clear()
+        else:
+            _scope_cache.pop(cohort_id, None)
@@ -8,6 +8,97 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 100  #  days
     TELEGRAM_BOT_TOKEN: str = "SET_YOUR_BOT_TOKEN"
     TELEGRAM_BOT_NAME: str = "weeks_until_diploma_bot"
+    TELEGRAM_API_URL: str = "https://api.telegram.org/bot"
+    # Connections of the shared bot client per worker
+    TELEGRAM_POOL_SIZE: int = 8
+    # Webhook mode: secret passed to setWebhook (empty disables /telegram/webhook),
+    # queued updates per worker and tasks processing them
+    TELEGRAM_WEBHOOK_SECRET: str = ""
+    TELEGRAM_WEBHOOK_QUEUE: int = 1000
+    TELEGRAM_WEBHOOK_WORKERS: int = 2
+
+    # Delta sync: how many change-log entries survive compaction,
+    # and how many changes a ?since= response may carry before falling back to a full snapshot
+    PROGRESS_LOG_KEEP: int = 10000
+    PROGRESS_DELTA_MAX: int = 1000
+    # Progress history: snapshot once this many toggles accumulated since the last snapshot
+    HISTORY_SNAPSHOT_EVERY: int = 500
+    # Grid images: render threads per worker, render deadline (s) and how long renders stay cached
+    GRID_IMAGE_WORKERS: int = 2
+    GRID_IMAGE_TIMEOUT: float = 10.0
+    GRID_IMAGE_TTL: float = 86400.0
+
+    # Read replicas (READ_DATABASE_URLS, comma separated): replication lag allowed for reads (s),
+    # how often lag and health are rechecked (s), and how long a writer's reads stay on the primary (s)
+    REPLICA_MAX_LAG: float = 5.0
+    REPLICA_CHECK_INTERVAL: float = 5.0
+    READ_PIN_SECONDS: float = 10.0
+
+    # Write-behind of week toggles (POST /grid/weeks): repeated toggles within the window (s) become
+    # one write, all users' toggles share one commit; 0 writes every toggle at once.
+    # Unwritten toggles are visible only in the worker that accepted them — single worker only.
+    # A journal directory makes accepted toggles survive a crash of the process
+    WEEK_WRITE_WINDOW: float = 0.0
+    WEEK_WRITE_JOURNAL: str = ""
+
+    # Workers of the preforking runner (python -m app.server); 0 — one per CPU
+    WEB_WORKERS: int = 0
+
+    # Connection pool of the primary and each replica: kept connections, extra ones under load,
+    # wait for a free connection (s), reconnect after (s, -1 — never), ping before reuse
+    # (off: a round trip per checkout; pool_recycle retires connections before the server does).
+    # Grid reads return the connection once their dependencies are done (database.release)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+
+    # Latency budget of a request's queries (s, from arrival): Postgres statement_timeout,
+    # SQLite interrupt; exceeded — 503. Per-path overrides "pattern=seconds,..." (fnmatch,
+    # first match wins); 0 — no budget. Reads are also cancelled when the client disconnects
+    REQUEST_DB_BUDGET: float = 10.0
+    REQUEST_DB_BUDGETS: str = "*/grid/export=300"
+
+    # On-demand profiler (/profiling, admin only): sessions, results and the worker registry.
+    # Shared by the workers of one host; empty — $XDG_CACHE_HOME (~/.cache)/diplom-monitor/profiles
+    PROFILE_DIR: str = ""
+
+    # Embedded mode (sqlite:/// DATABASE_URL): pragmas of every connection.
+    # synchronous NORMAL is durable in WAL except for the last commits on power loss;
+    # mmap_size in bytes, cache_size in pages or, negative, in KiB; busy_timeout in ms
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64 * 1024
+    SQLITE_BUSY_TIMEOUT: int = 5000
+
+    # Shared response cache: memory | file | redis.
+    # CACHE_URL is the SQLite file path for "file" and redis://host:port/db for "redis"
+    CACHE_BACKEND: str = "memory"
+    CACHE_URL: str = ""
+    CACHE_TTL: float = 60.0
+
+    # HTTP caching of public reads by a reverse proxy (seconds), and where to send purges:
+    # e.g. http://127.0.0.1/api for the nginx example; empty disables purging
+    HTTP_CACHE_MAX_AGE: int = 10
+    HTTP_CACHE_STALE_WHILE_REVALIDATE: int = 60
+    HTTP_PURGE_URL: str = ""
+    HTTP_PURGE_METHOD: str = "PURGE"
+
+    # Rate limiting of /auth/login and /auth/register: token buckets per IP and per account
+    # (requests per minute and burst); backend memory | file | redis, URL as for CACHE_URL
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_URL: str = ""
+    AUTH_RATE_PER_IP: float = 30
+    AUTH_BURST_PER_IP: int = 30
+    AUTH_RATE_PER_ACCOUNT: float = 5
+    AUTH_BURST_PER_ACCOUNT: int = 10
+    # Concurrent Argon2 operations per worker (0 — number of CPUs), waiting queue length and deadline.
+    # The queue waits on the event loop, so it doesn't take threads from the request pool
+    PASSWORD_HASH_CONCURRENCY: int = 0
+    PASSWORD_HASH_MAX_WAITING: int = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 5.0
 
     class Config:
         env_file = ".env"
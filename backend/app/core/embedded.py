@@ -0,0 +1,150 @@
+"""
+Embedded single-node mode on SQLite, selected by a ``sqlite:///`` DATABASE_URL.
+
+Every connection gets WAL and the ``SQLITE_*`` pragmas from the settings:
+readers never block the writer, ``synchronous=NORMAL`` syncs only at
+checkpoints, and the page cache and mmap keep a small department's data in
+memory.
+
+SQLite has a single writer. Transactions that will write start with
+``BEGIN IMMEDIATE`` (``writer_engine``/``for_writes``), taking the write
+lock up front: a deferred transaction that read first and then tries to
+write fails with SQLITE_BUSY as soon as another writer committed in between,
+and ``busy_timeout`` doesn't help there. Inside a process writers also queue
+on a lock, so they hand over without SQLite's sleep-and-retry; across
+processes ``busy_timeout`` does the waiting. Reads keep a plain ``BEGIN``
+and run concurrently with the writer.
+
+``migrate`` brings the schema up on startup: a new database is created from
+the models and stamped with the Alembic head, an existing one is upgraded.
+"""
+import logging
+import os
+import threading
+from functools import lru_cache
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BEGIN_OPTION = "sqlite_begin"
+IMMEDIATE = "IMMEDIATE"
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini")
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def engine_options(url: str) -> dict:
+    """Extra ``create_engine`` arguments for the URL."""
+    if not is_sqlite(url):
+        return {}
+    # Соединения пула переходят между потоками threadpool
+    return {"connect_args": {"check_same_thread": False}}
+
+
+def pragmas() -> list:
+    return [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}",
+    ]
+
+
+def configure(engine: Engine) -> None:
+    """Install the pragmas and the BEGIN handling on a SQLite engine."""
+    write_lock = threading.Lock()
+    lock_timeout = settings.SQLITE_BUSY_TIMEOUT / 1000
+    # Соединение, держащее блокировку записи процесса (она одна — хватает одной ячейки)
+    holder = []
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        # Транзакциями управляет SQLAlchemy (см. begin), а не модуль sqlite3
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def begin(conn):
+        if conn.get_execution_options().get(BEGIN_OPTION) == IMMEDIATE:
+            # Не дождались — дальше ждёт busy_timeout самой SQLite
+            if write_lock.acquire(timeout=lock_timeout):
+                holder.append(conn.connection.dbapi_connection)
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            conn.exec_driver_sql("BEGIN")
+
+    # Отпускаем после COMMIT/ROLLBACK, а не до (события commit/rollback приходят раньше):
+    # иначе следующий писатель упрётся в ещё не снятую блокировку SQLite и уснёт
+    # в busy-обработчике. do_rollback вызывает и пул при возврате соединения.
+    dialect = engine.dialect
+    do_commit, do_rollback = dialect.do_commit, dialect.do_rollback
+
+    def release(connection) -> None:
+        if holder and holder[0] is connection.dbapi_connection:
+            holder.clear()
+            write_lock.release()
+
+    def commit(connection) -> None:
+        try:
+            do_commit(connection)
+        finally:
+            release(connection)
+
+    def rollback(connection) -> None:
+        try:
+            do_rollback(connection)
+        finally:
+            release(connection)
+
+    dialect.do_commit = commit
+    dialect.do_rollback = rollback
+
+
+@lru_cache(maxsize=None)
+def writer_engine(engine: Engine) -> Engine:
+    """The same engine and pool, with transactions started as BEGIN IMMEDIATE on SQLite."""
+    if engine.dialect.name != "sqlite":
+        return engine
+    return engine.execution_options(**{BEGIN_OPTION: IMMEDIATE})
+
+
+def for_writes(db: Session) -> Session:
+    """Make a not yet used session start its transactions as a writer."""
+    if isinstance(db.bind, Engine):
+        db.bind = writer_engine(db.bind)
+    return db
+
+
+def migrate(engine: Engine) -> None:
+    """Create (and stamp) a new SQLite database or upgrade an existing one to the Alembic head."""
+    from alembic import command
+    from alembic.config import Config
+
+    from app.models import Base
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    # Под блокировкой записи: воркеры, стартующие одновременно, мигрируют по очереди
+    with writer_engine(engine).begin() as connection:
+        config.attributes["connection"] = connection
+        tables = set(inspect(connection).get_table_names())
+        if "alembic_version" in tables:
+            command.upgrade(config, "head")
+            return
+        if tables:
+            logger.warning("SQLite database without alembic_version: assuming the current schema")
+        # Цепочка миграций не начинается с пустой базы — создаём схему по моделям
+        Base.metadata.create_all(bind=connection)
+        command.stamp(config, "head")
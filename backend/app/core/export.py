@@ -0,0 +1,189 @@
+"""
+Streaming export of all progress (users × weeks) for admins.
+
+Rows come from a single ``users LEFT JOIN week_progress`` query executed with
+``yield_per`` (a server-side cursor on Postgres) and are written one partition
+at a time, so memory stays bounded by ``EXPORT_BATCH_SIZE`` rows regardless of
+how many years of data are exported.
+"""
+import csv
+import io
+from typing import Iterator, List, Optional
+
+from sqlalchemy import case, func, select, true
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.week_progress import WeekProgress
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    "user_id",
+    "email",
+    "full_name",
+    "emoji",
+    "is_active",
+    "week_start_date",
+    "is_completed",
+    "note",
+    "special_period_type",
+    "completed_weeks",
+    "effective_weeks",
+    "remaining_weeks",
+]
+
+
+def export_statement(user_filter=None):
+    completed_weeks = func.sum(
+        case((WeekProgress.is_completed == True, 1), else_=0)
+    ).over(partition_by=User.id)
+    return (
+        select(
+            User.id,
+            User.email,
+            User.full_name,
+            User.emoji,
+            User.is_active,
+            WeekProgress.week_start_date,
+            WeekProgress.is_completed,
+            WeekProgress.note,
+            completed_weeks.label("completed_weeks"),
+        )
+        .outerjoin(WeekProgress, WeekProgress.user_id == User.id)
+        .where(user_filter if user_filter is not None else true())
+        .order_by(User.id, WeekProgress.week_start_date)
+    )
+
+
+def _special_period_type(week_start, special_periods) -> Optional[str]:
+    if week_start is None:
+        return None
+    for p in special_periods:
+        if p.start_date <= week_start <= p.end_date:
+            return p.period_type
+    return None
+
+
+def iter_export_batches(
+    db: Session,
+    special_periods,
+    effective_weeks: int,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    user_filter=None,
+) -> Iterator[List[tuple]]:
+    """Yield lists of export rows, one list per fetched partition."""
+    result = db.execute(export_statement(user_filter).execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        rows = []
+        for (user_id, email, full_name, emoji, is_active,
+             week_start, is_completed, note, completed) in partition:
+            completed = int(completed or 0)
+            rows.append((
+                user_id,
+                email,
+                full_name,
+                emoji,
+                is_active,
+                week_start,
+                is_completed,
+                note,
+                _special_period_type(week_start, special_periods),
+                completed,
+                effective_weeks,
+                max(0, effective_weeks - completed),
+            ))
+        yield rows
+
+
+def stream_csv(batches: Iterator[List[tuple]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    tail = buffer.getvalue()
+    if tail:
+        yield tail
+
+
+class _ChunkSink:
+    """Minimal writable file that hands out whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_parquet(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """One Parquet row group per fetched partition."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("user_id", pa.int64()),
+        ("email", pa.string()),
+        ("full_name", pa.string()),
+        ("emoji", pa.string()),
+        ("is_active", pa.bool_()),
+        ("week_start_date", pa.date32()),
+        ("is_completed", pa.bool_()),
+        ("note", pa.string()),
+        ("special_period_type", pa.string()),
+        ("completed_weeks", pa.int64()),
+        ("effective_weeks", pa.int64()),
+        ("remaining_weeks", pa.int64()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in batches:
+            if not rows:
+                continue
+            columns = list(zip(*rows))
+            table = pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_table(table)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
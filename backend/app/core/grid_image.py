@@ -0,0 +1,337 @@
+"""
+Grid images for sharing and Telegram reminders.
+
+A ``GridPicture`` is everything that ends up on the image: the title and one
+cell per calendar slot (share of completions, special, past, current). Its
+content hash names the image — renders are stored under that hash in the
+response-cache backend, and the hash of a (scope, subject, current week) is
+itself cached under the data tags. A repeated view with unchanged data costs
+two cache reads; a changed grid that looks the same reuses the old render.
+
+Rendering runs on a small worker pool, so a burst of image requests can't
+occupy every request thread, and concurrent requests for the same image
+share one render. SVG is drawn as markup; PNG is rasterized with NumPy and
+encoded with zlib, no imaging library needed.
+"""
+import hashlib
+import json
+import logging
+import struct
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.cache import BACKEND_ERRORS, cached, get_response_cache
+from app.core.calendar import WeekCalendar, get_calendar
+from app.core.cohorts import GridScope
+from app.core.config import settings
+from app.core.grid_snapshot import load_progress_rows
+from app.database import release
+from app.models.user import User
+from app.models.week_progress import WeekProgress
+
+logger = logging.getLogger(__name__)
+
+# Меняется вместе с отрисовкой: старые картинки в кэше перестают совпадать по хэшу
+RENDER_VERSION = 1
+
+COLUMNS = 12
+CELL = 24
+GAP = 4
+PADDING = 12
+BORDER = 2
+HEADER = 36
+
+MEDIA_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+
+# Цвета WeekCell.vue (Tailwind): (заливка, рамка)
+BACKGROUND = "#f9fafb"
+DONE = ("#22c55e", "#16a34a")
+MISSED = ("#1e293b", "#0f172a")
+SPECIAL = ("#fef3c7", "#fcd34d")
+CURRENT = ("#eff6ff", "#93c5fd")
+FUTURE = ("#ffffff", "#e5e7eb")
+
+
+@dataclass(frozen=True)
+class Cell:
+    # Доля участников, отметивших неделю (для одного пользователя — 0 или 1)
+    share: float
+    is_special: bool = False
+    is_past: bool = False
+    is_current: bool = False
+
+
+@dataclass(frozen=True)
+class GridPicture:
+    title: str
+    subtitle: str
+    cells: Tuple[Cell, ...]
+
+    def digest(self) -> str:
+        data = json.dumps([RENDER_VERSION, asdict(self)], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(data.encode()).hexdigest()[:32]
+
+
+def _hex(color: str) -> np.ndarray:
+    return np.array([int(color[i:i + 2], 16) for i in (1, 3, 5)], dtype=np.float64)
+
+
+def _mix(a: str, b: str, t: float) -> str:
+    r, g, bl = (_hex(a) * (1 - t) + _hex(b) * t).round().astype(int)
+    return f"#{r:02x}{g:02x}{bl:02x}"
+
+
+def cell_colors(cell: Cell) -> Tuple[str, str]:
+    """Fill and border, following WeekCell.vue; partial cohort weeks are blended towards green."""
+    if cell.share >= 1:
+        return DONE
+    if cell.is_past:
+        base = MISSED
+    elif cell.is_special:
+        base = SPECIAL
+    elif cell.is_current:
+        base = CURRENT
+    else:
+        base = FUTURE
+    if cell.share <= 0:
+        return base
+    return _mix(base[0], DONE[0], cell.share), _mix(base[1], DONE[1], cell.share)
+
+
+def _layout(picture: GridPicture) -> Tuple[int, int, int]:
+    rows = max(1, -(-len(picture.cells) // COLUMNS))
+    width = 2 * PADDING + COLUMNS * CELL + (COLUMNS - 1) * GAP
+    height = 2 * PADDING + HEADER + rows * CELL + (rows - 1) * GAP
+    return width, height, rows
+
+
+def _origin(index: int) -> Tuple[int, int]:
+    row, column = divmod(index, COLUMNS)
+    return PADDING + column * (CELL + GAP), PADDING + HEADER + row * (CELL + GAP)
+
+
+def render_svg(picture: GridPicture) -> bytes:
+    width, height, _ = _layout(picture)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif">',
+        f'<rect width="{width}" height="{height}" fill="{BACKGROUND}"/>',
+        f'<text x="{PADDING}" y="{PADDING + 14}" font-size="14" font-weight="700" '
+        f'fill="#0f172a">{escape(picture.title)}</text>',
+        f'<text x="{PADDING}" y="{PADDING + 30}" font-size="11" fill="#64748b">{escape(picture.subtitle)}</text>',
+    ]
+    half = BORDER / 2
+    for index, cell in enumerate(picture.cells):
+        x, y = _origin(index)
+        fill, stroke = cell_colors(cell)
+        parts.append(
+            f'<rect x="{x + half}" y="{y + half}" width="{CELL - BORDER}" height="{CELL - BORDER}" '
+            f'rx="5" fill="{fill}" stroke="{stroke}" stroke-width="{BORDER}"/>'
+        )
+        if cell.is_current:
+            parts.append(f'<rect x="{x}" y="{y}" width="{CELL}" height="3" rx="1.5" fill="#3b82f6"/>')
+        if cell.is_special:
+            parts.append(f'<circle cx="{x + CELL - 3}" cy="{y + 3}" r="3" fill="#f59e0b"/>')
+    parts.append("</svg>")
+    return "".join(parts).encode()
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    """8-bit RGB PNG from an (height, width, 3) uint8 array."""
+    height, width, _ = pixels.shape
+    # Каждой строке — байт фильтра 0 (None)
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(height, width * 3)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+
+def render_png(picture: GridPicture, scale: int = 2) -> bytes:
+    """Cells only: there are no fonts to draw the title with, Telegram puts it in the caption."""
+    width, height, _ = _layout(picture)
+    pixels = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+    pixels[:] = _hex(BACKGROUND)
+    cell, border = CELL * scale, BORDER * scale
+    for index, item in enumerate(picture.cells):
+        x, y = (v * scale for v in _origin(index))
+        fill, stroke = cell_colors(item)
+        pixels[y:y + cell, x:x + cell] = _hex(stroke)
+        pixels[y + border:y + cell - border, x + border:x + cell - border] = _hex(fill)
+        # Скруглённые углы: угловой пиксель рамки — цвет фона
+        for cy in (y, y + cell - scale):
+            for cx in (x, x + cell - scale):
+                pixels[cy:cy + scale, cx:cx + scale] = _hex(BACKGROUND)
+        if item.is_current:
+            pixels[y:y + 3 * scale, x:x + cell] = _hex("#3b82f6")
+        if item.is_special:
+            pixels[y:y + 4 * scale, x + cell - 4 * scale:x + cell] = _hex("#f59e0b")
+    return encode_png(pixels)
+
+
+RENDERERS: Dict[str, Callable[[GridPicture], bytes]] = {"svg": render_svg, "png": render_png}
+
+_pool: Optional[ThreadPoolExecutor] = None
+_inflight: Dict[str, Future] = {}
+# RLock: колбэк уже завершённого future вызывается сразу, под этой же блокировкой
+_lock = threading.RLock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.GRID_IMAGE_WORKERS, thread_name_prefix="grid-image")
+        return _pool
+
+
+def render(picture: GridPicture, image_format: str) -> bytes:
+    """Render on the worker pool; concurrent calls for the same picture wait for one render."""
+    key = f"{picture.digest()}.{image_format}"
+    with _lock:
+        future = _inflight.get(key)
+        if future is None:
+            future = _get_pool().submit(RENDERERS[image_format], picture)
+            _inflight[key] = future
+            future.add_done_callback(lambda _: _discard(key))
+    return future.result(timeout=settings.GRID_IMAGE_TIMEOUT)
+
+
+def _discard(key: str) -> None:
+    with _lock:
+        _inflight.pop(key, None)
+
+
+def _cells(calendar: WeekCalendar, shares: Dict[int, float], today: date) -> Tuple[Cell, ...]:
+    monday = today - timedelta(days=today.weekday())
+    current = calendar.index_of(today)
+    return tuple(
+        Cell(
+            share=round(shares.get(slot.index, 0.0), 2),
+            is_special=slot.is_special,
+            is_past=slot.week_start_date < monday,
+            is_current=slot.index == current,
+        )
+        for slot in calendar.slots
+    )
+
+
+def user_picture(db: Session, scope: GridScope, user: User, today: Optional[date] = None) -> GridPicture:
+    calendar = get_calendar(db, scope)
+    completed = db.scalars(
+        select(WeekProgress.week_start_date).where(
+            WeekProgress.user_id == user.id, WeekProgress.is_completed == True
+        )
+    ).all()
+    shares = {}
+    for day in completed:
+        index = calendar.index_of(day)
+        if index is not None:
+            shares[index] = 1.0
+    name = user.full_name or user.email
+    return GridPicture(
+        title=f"{user.emoji or '🎓'} {name}",
+        subtitle=f"Выполнено недель: {len(shares)} из {calendar.effective_weeks}",
+        cells=_cells(calendar, shares, today or date.today()),
+    )
+
+
+def cohort_picture(db: Session, scope: GridScope, today: Optional[date] = None) -> GridPicture:
+    calendar = get_calendar(db, scope)
+    users = load_progress_rows(db, scope, with_weeks=True, with_notes=False)
+    counts: Dict[int, int] = {}
+    for rows in users.values():
+        indexes = {calendar.index_of(w["week_start_date"]) for w in rows.weeks if w["is_completed"]}
+        for index in indexes - {None}:
+            counts[index] = counts.get(index, 0) + 1
+    members = len(users)
+    shares = {index: count / members for index, count in counts.items()} if members else {}
+    return GridPicture(
+        title="Прогресс группы",
+        subtitle=f"Участников: {members}, недель: {calendar.effective_weeks}",
+        cells=_cells(calendar, shares, today or date.today()),
+    )
+
+
+def _load_blob(key: str) -> Optional[bytes]:
+    try:
+        return get_response_cache().backend.get_many([key])[0]
+    except BACKEND_ERRORS as exc:
+        logger.warning("grid image lookup failed: %s", exc)
+        return None
+
+
+def _store_blob(key: str, data: bytes) -> None:
+    try:
+        get_response_cache().backend.set(key, data, settings.GRID_IMAGE_TTL)
+    except BACKEND_ERRORS as exc:
+        logger.warning("grid image store failed: %s", exc)
+
+
+def cached_image(key: str, tags, build: Callable[[], GridPicture], image_format: str) -> Tuple[str, bytes]:
+    """
+    Returns ``(content hash, image bytes)``. ``build`` reads the data and
+    runs only when the hash for ``key`` is stale or the render was evicted.
+    """
+    picture: Optional[GridPicture] = None
+
+    def produce_digest() -> str:
+        nonlocal picture
+        picture = build()
+        return picture.digest()
+
+    digest = cached(key, tags, produce_digest)
+    blob_key = f"grid-image:{digest}.{image_format}"
+    data = _load_blob(blob_key)
+    if data is None:
+        if picture is None:
+            picture = build()
+            digest = picture.digest()
+            blob_key = f"grid-image:{digest}.{image_format}"
+        data = render(picture, image_format)
+        _store_blob(blob_key, data)
+    return digest, data
+
+
+def _released(db: Session, picture: GridPicture) -> GridPicture:
+    # Данные прочитаны — рисуем, не держа соединение с БД
+    release(db)
+    return picture
+
+
+def user_image(db: Session, scope: GridScope, user: User, image_format: str = "png") -> Tuple[str, bytes]:
+    today = date.today()
+    monday = today - timedelta(days=today.weekday())
+    return cached_image(
+        f"grid-image:{scope.cache_key()}:user:{user.id}:{monday}",
+        ["periods", f"weeks:{user.id}", f"user:{user.id}"],
+        lambda: _released(db, user_picture(db, scope, user, today)),
+        image_format,
+    )
+
+
+def cohort_image(db: Session, scope: GridScope, image_format: str = "png") -> Tuple[str, bytes]:
+    today = date.today()
+    monday = today - timedelta(days=today.weekday())
+    return cached_image(
+        f"grid-image:{scope.cache_key()}:cohort:{monday}",
+        ["periods", "progress", "users"],
+        lambda: _released(db, cohort_picture(db, scope, today)),
+        image_format,
+    )
@@ -0,0 +1,114 @@
+"""
+Per-request snapshot of the grid.
+
+One query loads every active user of the scope together with all their
+week rows; all-progress, a user's weeks and a user's stats are then derived
+from the same rows instead of one query per user/endpoint.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy import null, select
+from sqlalchemy.orm import Session
+
+from app.core.cohorts import GridScope
+from app.models.special_period import SpecialPeriod
+from app.models.user import User
+from app.models.week_progress import WeekProgress
+
+
+@dataclass
+class UserRows:
+    user_id: int
+    emoji: Optional[str]
+    weeks: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class GridSnapshot:
+    scope: GridScope
+    users: Dict[int, UserRows]
+    special_periods: List[SpecialPeriod]
+
+    def all_progress(self) -> List[dict]:
+        return all_progress_payload(self.users)
+
+    def weeks_of(self, user_id: int) -> Optional[List[dict]]:
+        """Week rows of an active user of the scope; None if the user isn't in the snapshot."""
+        rows = self.users.get(user_id)
+        return rows.weeks if rows else None
+
+
+def all_progress_payload(users: Dict[int, UserRows], with_notes: bool = True) -> List[dict]:
+    """UserWeekProgress dicts: completed weeks with notes per active user."""
+    return [
+        {
+            "user_id": u.user_id,
+            "emoji": u.emoji or "🎓",
+            "completions": [
+                {"date": w["week_start_date"], "note": w["note"]} if with_notes
+                else {"date": w["week_start_date"]}
+                for w in u.weeks if w["is_completed"]
+            ],
+        }
+        for u in users.values()
+    ]
+
+
+def load_progress_rows(
+    db: Session,
+    scope: GridScope,
+    with_weeks: bool = True,
+    with_notes: bool = True,
+) -> Dict[int, UserRows]:
+    """
+    Active users of the scope with their week rows. ``with_weeks=False``
+    skips the join, ``with_notes=False`` leaves the note column unread.
+    """
+    users: Dict[int, UserRows] = {}
+    if not with_weeks:
+        stmt = (
+            select(User.id, User.emoji)
+            .where(User.is_active == True, scope.user_filter())
+            .order_by(User.id)
+        )
+        for user_id, emoji in db.execute(stmt):
+            users[user_id] = UserRows(user_id=user_id, emoji=emoji)
+        return users
+
+    note_column = WeekProgress.note if with_notes else null().label("note")
+    stmt = (
+        select(
+            User.id,
+            User.emoji,
+            WeekProgress.id,
+            WeekProgress.week_start_date,
+            WeekProgress.is_completed,
+            note_column,
+        )
+        .outerjoin(WeekProgress, WeekProgress.user_id == User.id)
+        .where(User.is_active == True, scope.user_filter())
+        .order_by(User.id, WeekProgress.week_start_date)
+    )
+    for user_id, emoji, week_id, week_start, is_completed, note in db.execute(stmt):
+        rows = users.get(user_id)
+        if rows is None:
+            rows = users[user_id] = UserRows(user_id=user_id, emoji=emoji)
+        if week_id is not None:
+            rows.weeks.append({
+                "id": week_id,
+                "user_id": user_id,
+                "week_start_date": week_start,
+                "is_completed": is_completed,
+                "note": note,
+            })
+    return users
+
+
+def load_snapshot(db: Session, scope: GridScope) -> GridSnapshot:
+    special_periods = db.query(SpecialPeriod).filter(scope.special_period_filter()).all()
+    return GridSnapshot(
+        scope=scope,
+        users=load_progress_rows(db, scope),
+        special_periods=special_periods,
+    )
@@ -0,0 +1,170 @@
+"""
+Point-in-time history of week progress.
+
+Every completion toggle appends a ``WeekProgressEvent``. Periodically
+``take_snapshot`` folds the events into a ``WeekProgressSnapshot`` — the set
+of completed weeks per user, delta-encoded and compressed. The state at any
+moment is the nearest snapshot at or before it plus the events after the
+snapshot, so a historical query costs O(changes since that snapshot).
+
+Snapshots cover events older than ``SNAPSHOT_LAG``: event ids and
+timestamps are assigned before commit, and the lag keeps a slow transaction
+from committing an event into a period that is already snapshotted.
+"""
+import json
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.week_progress_event import WeekProgressEvent
+from app.models.week_progress_snapshot import WeekProgressSnapshot
+
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+# user_id -> ординалы понедельников отмеченных недель
+State = Dict[int, Set[int]]
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def record_week_event(db: Session, user_id: int, week_start_date: date, is_completed: bool,
+                      at: Optional[datetime] = None) -> None:
+    """Append a toggle; the caller commits."""
+    db.add(WeekProgressEvent(
+        user_id=user_id,
+        week_start_date=week_start_date,
+        is_completed=is_completed,
+        changed_at=at or utcnow(),
+    ))
+
+
+def encode_state(state: State) -> bytes:
+    # Отсортированные ординалы хранятся разностями: соседние недели — это «7»
+    payload = {}
+    for user_id, weeks in state.items():
+        if not weeks:
+            continue
+        ordered = sorted(weeks)
+        payload[str(user_id)] = [ordered[0]] + [b - a for a, b in zip(ordered, ordered[1:])]
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode(), 6)
+
+
+def decode_state(data: bytes) -> State:
+    state: State = {}
+    for user_id, deltas in json.loads(zlib.decompress(data)).items():
+        weeks, current = set(), 0
+        for delta in deltas:
+            current += delta
+            weeks.add(current)
+        state[int(user_id)] = weeks
+    return state
+
+
+def apply_event(state: State, user_id: int, week_start_date: date, is_completed: bool) -> None:
+    weeks = state.setdefault(user_id, set())
+    if is_completed:
+        weeks.add(week_start_date.toordinal())
+    else:
+        weeks.discard(week_start_date.toordinal())
+
+
+def nearest_snapshot(db: Session, at: datetime) -> Optional[WeekProgressSnapshot]:
+    return db.scalars(
+        select(WeekProgressSnapshot)
+        .where(WeekProgressSnapshot.taken_at <= at)
+        .order_by(WeekProgressSnapshot.taken_at.desc())
+        .limit(1)
+    ).first()
+
+
+def iter_events(db: Session, after: Optional[datetime], until: datetime) -> Iterator[Tuple[int, date, bool, datetime]]:
+    stmt = (
+        select(
+            WeekProgressEvent.user_id,
+            WeekProgressEvent.week_start_date,
+            WeekProgressEvent.is_completed,
+            WeekProgressEvent.changed_at,
+        )
+        .where(WeekProgressEvent.changed_at <= until)
+        .order_by(WeekProgressEvent.changed_at, WeekProgressEvent.id)
+    )
+    if after is not None:
+        stmt = stmt.where(WeekProgressEvent.changed_at > after)
+    yield from db.execute(stmt.execution_options(yield_per=1000))
+
+
+def state_as_of(db: Session, at: datetime) -> State:
+    snapshot = nearest_snapshot(db, at)
+    state = decode_state(snapshot.data) if snapshot else {}
+    for user_id, week_start_date, is_completed, _ in iter_events(db, snapshot.taken_at if snapshot else None, at):
+        apply_event(state, user_id, week_start_date, is_completed)
+    return state
+
+
+def take_snapshot(db: Session, at: Optional[datetime] = None) -> WeekProgressSnapshot:
+    """Fold events up to ``at`` (default: now minus SNAPSHOT_LAG) into a new snapshot and commit."""
+    at = at or utcnow() - SNAPSHOT_LAG
+    state = state_as_of(db, at)
+    snapshot = WeekProgressSnapshot(
+        taken_at=at,
+        completed_weeks=sum(len(w) for w in state.values()),
+        data=encode_state(state),
+    )
+    db.add(snapshot)
+    db.commit()
+    return snapshot
+
+
+def snapshot_if_due(db: Session, every: int) -> Optional[WeekProgressSnapshot]:
+    """Take a snapshot when at least ``every`` events arrived since the last one."""
+    at = utcnow() - SNAPSHOT_LAG
+    last = nearest_snapshot(db, at)
+    stmt = select(func.count()).select_from(WeekProgressEvent).where(WeekProgressEvent.changed_at <= at)
+    if last is not None:
+        stmt = stmt.where(WeekProgressEvent.changed_at > last.taken_at)
+    if db.scalar(stmt) < every:
+        return None
+    return take_snapshot(db, at)
+
+
+def completed_counts_at(
+    db: Session, points: List[datetime], user_ids: Iterable[int], weeks: Optional[Iterable[date]] = None,
+) -> List[int]:
+    """
+    Total completed weeks of ``user_ids`` at each of the ascending ``points``,
+    in one pass: the snapshot before the first point plus the events up to
+    the last one. ``weeks`` limits the count to those week starts.
+    """
+    if not points:
+        return []
+    members = set(user_ids)
+    counted = None if weeks is None else {w.toordinal() for w in weeks}
+    snapshot = nearest_snapshot(db, points[0])
+    state = decode_state(snapshot.data) if snapshot else {}
+    total = sum(
+        len(done) if counted is None else len(done & counted)
+        for user_id, done in state.items() if user_id in members
+    )
+
+    counts = []
+    index = 0
+    for user_id, week_start_date, is_completed, changed_at in iter_events(
+        db, snapshot.taken_at if snapshot else None, points[-1]
+    ):
+        while index < len(points) and changed_at > points[index]:
+            counts.append(total)
+            index += 1
+        if user_id not in members:
+            continue
+        done = state.setdefault(user_id, set())
+        before = len(done)
+        apply_event(state, user_id, week_start_date, is_completed)
+        if counted is None or week_start_date.toordinal() in counted:
+            total += len(done) - before
+    counts.extend([total] * (len(points) - index))
+    return counts
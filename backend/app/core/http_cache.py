@@ -0,0 +1,144 @@
+"""
+HTTP caching: Cache-Control policies, surrogate keys and proxy purges.
+
+Public reads (user list, public profiles, auth config) are cacheable by a
+shared proxy (nginx ``proxy_cache``) for a short ``max-age`` and may be
+served stale while the proxy revalidates. Authenticated grid reads are
+``private`` and revalidated with an ETag derived from the data version.
+
+Every response carries ``Surrogate-Key``/``Cache-Tag`` with the same tag
+vocabulary the response cache uses ("users", "user:5", "progress", ...),
+and ``invalidate_tags`` forwards the tags to ``Purger`` so the proxy can
+drop public entries right after a write instead of waiting for max-age.
+"""
+import hashlib
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    public: bool
+    max_age: int = 0
+    stale_while_revalidate: int = 0
+
+    def header(self) -> str:
+        if not self.public:
+            # Браузер хранит ответ, но каждый раз сверяет ETag
+            return "private, no-cache"
+        parts = ["public", f"max-age={self.max_age}"]
+        if self.stale_while_revalidate:
+            parts.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        return ", ".join(parts)
+
+
+def public_policy() -> CachePolicy:
+    return CachePolicy(
+        public=True,
+        max_age=settings.HTTP_CACHE_MAX_AGE,
+        stale_while_revalidate=settings.HTTP_CACHE_STALE_WHILE_REVALIDATE,
+    )
+
+
+PRIVATE = CachePolicy(public=False)
+
+
+def surrogate_headers(keys: Iterable[str]) -> Dict[str, str]:
+    value = " ".join(dict.fromkeys(keys))
+    return {"Surrogate-Key": value, "Cache-Tag": value.replace(" ", ",")}
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Сравнение слабое: префикс W/ не учитываем
+    candidates = {c.strip().removeprefix("W/") for c in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+# --- purge ------------------------------------------------------------------
+
+def _user_paths(tag: str) -> List[str]:
+    user_id = tag.split(":", 1)[1]
+    return [f"/users/{user_id}"]
+
+
+# Какие публично кэшируемые URL зависят от тега; приватные ответы прокси не хранит
+PURGE_PATHS: Dict[str, Callable[[str], List[str]]] = {
+    "users": lambda tag: ["/users/"],
+    "user:": _user_paths,
+}
+
+
+def paths_for_tags(tags: Iterable[str]) -> List[str]:
+    paths: List[str] = []
+    for tag in tags:
+        for prefix, resolve in PURGE_PATHS.items():
+            if tag == prefix or (prefix.endswith(":") and tag.startswith(prefix)):
+                paths.extend(resolve(tag))
+    return list(dict.fromkeys(paths))
+
+
+class Purger:
+    """
+    Sends ``<method> <base_url><path>`` with a ``Surrogate-Key`` header for
+    every public URL affected by the invalidated tags. Requests go out from a
+    background thread through a bounded queue, so write requests never wait
+    for the proxy; if the queue overflows, entries simply expire by max-age.
+    """
+
+    def __init__(self, base_url: str, method: str = "PURGE", client: Optional[httpx.Client] = None,
+                 maxsize: int = 1000):
+        self.base_url = base_url.rstrip("/")
+        self.method = method
+        self.client = client or httpx.Client(timeout=2.0)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, tags: List[str]) -> None:
+        paths = paths_for_tags(tags)
+        if not paths:
+            return
+        try:
+            self._queue.put_nowait((paths, " ".join(tags)))
+        except queue.Full:
+            return
+        self._ensure_thread()
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="http-purge", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            paths, keys = self._queue.get()
+            try:
+                self.send(paths, keys)
+            finally:
+                self._queue.task_done()
+
+    def send(self, paths: List[str], keys: str) -> None:
+        for path in paths:
+            try:
+                self.client.request(self.method, self.base_url + path, headers={"Surrogate-Key": keys})
+            except httpx.HTTPError:
+                pass
+
+    def join(self) -> None:
+        self._queue.join()
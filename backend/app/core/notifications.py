@@ -1,18 +1,23 @@
 import asyncio
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from telegram import Bot
 from app.core.config import settings
 from app.models.user import User
 from app.models.week_progress import WeekProgress
 from app.database import SessionLocal
+from app.core.embedded import for_writes
+from app.core.changelog import compact_change_log
+from app.core.history import snapshot_if_due
+from app.core.cohorts import resolve_scope
+from app.core import grid_image
+from app.core.telegram_bot import bot_enabled, get_bot, week_keyboard
 
 async def send_reminders():
-    if settings.TELEGRAM_BOT_TOKEN == 'SET_YOUR_BOT_TOKEN':
+    if not bot_enabled():
         print('Telegram Bot Token not set, skipping reminders')
         return
 
-    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
+    bot = get_bot()
     db = SessionLocal()
     try:
         # Calculate current week start date (Monday)
@@ -31,17 +36,53 @@ async def send_reminders():
             
             if not progress or not progress.is_completed:
                 message = '👋 Привет! Не забудь отметить прогресс за эту неделю в DiplomMonitor!'
+                image = await reminder_image(db, user)
                 try:
-                    await bot.send_message(chat_id=user.telegram_id, text=message)
+                    # Кнопки отмечают неделю прямо из чата (webhook /telegram/webhook)
+                    keyboard = week_keyboard(current_week_start)
+                    if image:
+                        await bot.send_photo(chat_id=user.telegram_id, photo=image, caption=message,
+                                             reply_markup=keyboard)
+                    else:
+                        await bot.send_message(chat_id=user.telegram_id, text=message, reply_markup=keyboard)
                 except Exception as e:
                     print(f'Failed to send message to {user.telegram_id}: {e}')
     finally:
         db.close()
 
+async def reminder_image(db: Session, user: User):
+    """PNG of the user's grid for the reminder, or None to send plain text."""
+    scope = resolve_scope(db, user.cohort_id)
+    if scope is None or not scope.start_date or not scope.deadline:
+        return None
+    try:
+        # Рендер ждёт пул картинок — не блокируем цикл событий планировщика
+        _, image = await asyncio.to_thread(grid_image.user_image, db, scope, user, 'png')
+        return image
+    except Exception as e:
+        print(f'Failed to render grid image for user {user.id}: {e}')
+        return None
+
+def compact_progress_log():
+    db = for_writes(SessionLocal())
+    try:
+        compact_change_log(db, keep=settings.PROGRESS_LOG_KEEP)
+    finally:
+        db.close()
+
+def snapshot_progress_history():
+    db = for_writes(SessionLocal())
+    try:
+        snapshot_if_due(db, every=settings.HISTORY_SNAPSHOT_EVERY)
+    finally:
+        db.close()
+
 def start_scheduler():
     from apscheduler.schedulers.asyncio import AsyncIOScheduler
     scheduler = AsyncIOScheduler()
     # Every Sunday at 18:00
     scheduler.add_job(send_reminders, 'cron', day_of_week='sun', hour=18)
+    scheduler.add_job(compact_progress_log, 'interval', hours=1)
+    scheduler.add_job(snapshot_progress_history, 'interval', hours=1)
     scheduler.start()
     return scheduler
@@ -0,0 +1,447 @@
+"""
+On-demand profiling of live workers.
+
+An admin starts a session through ``/profiling``, choosing the mode and the
+target workers:
+
+- ``requests``: the next ``count`` requests whose path matches ``route``
+  (fnmatch) are profiled one by one. ``cprofile`` gives a pstats file per
+  request, and ``sample`` gives collapsed stacks of the threads running the
+  request. What is measured is the work done in the thread pool: sync
+  endpoints and dependencies, response validation, DB access. The event
+  loop thread serves other requests at the same time, so it is left out.
+- ``worker``: every thread of the worker is sampled for ``seconds``, giving
+  collapsed stacks. Nothing runs inside requests.
+
+Results are files in ``PROFILE_DIR``/<session>/. Any worker on the host
+lists and serves them, so a download doesn't need to reach the profiled
+worker.
+
+Workers that listen for SIGUSR2 register themselves in ``PROFILE_DIR``/workers.
+The registry file holds the process identity (boot id and start time), and it
+is checked again right before signalling, so a pid reused by an unrelated
+process is never signalled. A session aimed at another worker is left in that
+worker's inbox, and the worker is woken with SIGUSR2. Nothing polls.
+
+When no session is armed, the only cost is one global check per request in
+the middleware. The thread-pool hook and the sampler thread exist only while
+a session runs.
+"""
+import cProfile
+import fnmatch
+import json
+import logging
+import os
+import pstats
+import re
+import shutil
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional
+
+import anyio.to_thread
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WAKE_SIGNAL = signal.SIGUSR2
+# Имена файлов результатов: без путей и «..»
+RESULT_NAME = re.compile(r"^[\w.-]+\.(pstats|collapsed)$")
+SESSION_ID = re.compile(r"^[0-9a-f]{12}$")
+
+
+def profile_dir() -> str:
+    if settings.PROFILE_DIR:
+        return settings.PROFILE_DIR
+    # Каталог пользователя сервиса, а не общий /tmp: по реестру отсюда шлются сигналы
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "diplom-monitor", "profiles")
+
+
+def _path(*parts: str) -> str:
+    return os.path.join(profile_dir(), *parts)
+
+
+# --- сэмплер ----------------------------------------------------------------
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    # «;» разделяет кадры в collapsed-формате
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def write_collapsed(path: str, samples: Counter) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class Sampler:
+    """Thread that passes the frames of all other threads to ``collect`` every ``interval`` seconds."""
+
+    def __init__(self, interval: float, collect: Callable[[Dict[int, object]], None]):
+        self.interval = interval
+        self.collect = collect
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            frames.pop(own, None)
+            self.collect(frames)
+
+
+def sample_worker(session_id: str, seconds: float, interval: float) -> None:
+    """Sample all threads of this worker for ``seconds`` and write the collapsed stacks."""
+    samples: Counter = Counter()
+
+    def collect(frames: Dict[int, object]) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in frames.items():
+            samples[f"{names.get(ident, ident)};{collapse(frame)}"] += 1
+
+    def run() -> None:
+        sampler = Sampler(interval, collect).start()
+        time.sleep(seconds)
+        sampler.stop()
+        write_collapsed(_path(session_id, f"worker-{os.getpid()}.collapsed"), samples)
+        _mark_done(session_id)
+
+    threading.Thread(target=run, name="profiler-worker", daemon=True).start()
+
+
+# --- профиль запросов -------------------------------------------------------
+
+class RequestProfile:
+    def __init__(self, session: "RequestSession", method: str, path: str):
+        self.session = session
+        self.method = method
+        self.path = path
+        self.profiles: List[cProfile.Profile] = []
+        # Потоки пула, выполняющие сейчас части этого запроса (для сэмплера)
+        self.threads: set = set()
+        self.samples: Counter = Counter()
+
+    def wrap(self, func):
+        if self.session.profiler == "cprofile":
+            def profiled(*args):
+                # Профиль на каждый переход в пул: один объект cProfile нельзя делить между потоками
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    return func(*args)
+                finally:
+                    profile.disable()
+                    self.profiles.append(profile)
+            return profiled
+
+        def sampled(*args):
+            ident = threading.get_ident()
+            self.threads.add(ident)
+            try:
+                return func(*args)
+            finally:
+                self.threads.discard(ident)
+        return sampled
+
+    def write(self, directory: str, seq: int, elapsed_ms: float) -> None:
+        slug = re.sub(r"[^\w]+", "_", self.path).strip("_") or "root"
+        name = f"{seq:03d}-{os.getpid()}-{self.method}-{slug}-{elapsed_ms:.0f}ms"
+        if self.session.profiler == "cprofile":
+            if self.profiles:
+                pstats.Stats(*self.profiles).dump_stats(os.path.join(directory, f"{name}.pstats"))
+        elif self.samples:
+            write_collapsed(os.path.join(directory, f"{name}.collapsed"), self.samples)
+
+
+request_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+class RequestSession:
+    def __init__(self, session_id: str, route: str, count: int, profiler: str, interval: float):
+        self.id = session_id
+        self.route = route
+        self.remaining = count
+        self.profiler = profiler
+        self.interval = interval
+        self.seq = 0
+        self.active: List[RequestProfile] = []
+        self._lock = threading.Lock()
+        self.sampler: Optional[Sampler] = None
+
+    def claim(self, method: str, path: str) -> Optional[RequestProfile]:
+        if not fnmatch.fnmatchcase(path, self.route):
+            return None
+        with self._lock:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            profile = RequestProfile(self, method, path)
+            self.active.append(profile)
+            return profile
+
+    def collect(self, frames: Dict[int, object]) -> None:
+        with self._lock:
+            for profile in self.active:
+                for ident in list(profile.threads):
+                    if ident in frames:
+                        profile.samples[collapse(frames[ident])] += 1
+
+    def finish(self, profile: RequestProfile, elapsed_ms: float) -> None:
+        with self._lock:
+            self.active.remove(profile)
+            self.seq += 1
+            seq = self.seq
+            done = self.remaining <= 0 and not self.active
+        try:
+            profile.write(_path(self.id), seq, elapsed_ms)
+        except OSError as error:
+            logger.warning("profiling: can't write results of %s: %s", self.id, error)
+        if done:
+            disarm(self)
+
+
+# Сессия профилирования запросов этого воркера; None — выключено
+armed: Optional[RequestSession] = None
+_run_sync = anyio.to_thread.run_sync
+
+
+async def _profiled_run_sync(func, *args, **kwargs):
+    profile = request_profile.get()
+    if profile is not None:
+        func = profile.wrap(func)
+    return await _run_sync(func, *args, **kwargs)
+
+
+def arm(session: RequestSession) -> None:
+    global armed
+    if armed is not None:
+        disarm(armed)
+    if session.profiler == "sample":
+        session.sampler = Sampler(session.interval, session.collect).start()
+    # Starlette берёт anyio.to_thread.run_sync при каждом вызове — подменяем только на время сессии
+    anyio.to_thread.run_sync = _profiled_run_sync
+    armed = session
+
+
+def disarm(session: RequestSession) -> None:
+    global armed
+    if armed is not session:
+        return
+    armed = None
+    anyio.to_thread.run_sync = _run_sync
+    if session.sampler is not None:
+        session.sampler.stop()
+    _mark_done(session.id)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = armed
+        if session is None or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profile = session.claim(scope["method"], scope["path"])
+        if profile is None:
+            return await self.app(scope, receive, send)
+        token = request_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_profile.reset(token)
+            session.finish(profile, (time.perf_counter() - started) * 1000)
+
+
+# --- сессии и воркеры -------------------------------------------------------
+
+def _mark_done(session_id: str) -> None:
+    try:
+        open(_path(session_id, f"done-{os.getpid()}"), "w").close()
+    except OSError:
+        pass
+
+
+def _ensure_dir() -> None:
+    os.makedirs(profile_dir(), mode=0o700, exist_ok=True)
+
+
+def identity(pid: int) -> Optional[str]:
+    """Boot id and start time of a live process; None if it's gone or /proc is unavailable."""
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            boot_id = f.read().strip()
+        with open(f"/proc/{pid}/stat") as f:
+            # Имя процесса в скобках может содержать пробелы; starttime — 22-е поле
+            start_time = f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+    return f"{boot_id}:{start_time}"
+
+
+def _registered(pid: int) -> bool:
+    """The registry file of ``pid`` was written by the process that has this pid now."""
+    try:
+        with open(_path("workers", str(pid))) as f:
+            token = f.read().strip()
+    except OSError:
+        return False
+    return bool(token) and token == identity(pid)
+
+
+def register_worker(loop=None) -> bool:
+    """
+    Listen for wake-ups on the event loop of the main thread and announce this
+    worker. A worker that can't be woken or identified isn't registered.
+    """
+    token = identity(os.getpid())
+    if loop is None or threading.current_thread() is not threading.main_thread() or token is None:
+        return False
+    try:
+        loop.add_signal_handler(WAKE_SIGNAL, check_inbox)
+    except (NotImplementedError, RuntimeError, ValueError) as error:
+        logger.warning("profiling: can't listen for %s, worker not registered: %s", WAKE_SIGNAL.name, error)
+        return False
+    _ensure_dir()
+    os.makedirs(_path("workers"), exist_ok=True)
+    os.makedirs(_path("inbox", str(os.getpid())), exist_ok=True)
+    with open(_path("workers", str(os.getpid())), "w") as f:
+        f.write(token)
+    return True
+
+
+def unregister_worker() -> None:
+    for path in (_path("workers", str(os.getpid())), _path("inbox", str(os.getpid()))):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def workers() -> List[int]:
+    """Live registered workers on this host; files of dead ones are removed."""
+    directory = _path("workers")
+    pids = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else ():
+        if not name.isdigit():
+            continue
+        pid = int(name)
+        if _registered(pid):
+            pids.append(pid)
+        else:
+            os.remove(os.path.join(directory, name))
+            shutil.rmtree(_path("inbox", name), ignore_errors=True)
+    return sorted(pids)
+
+
+def start_session(spec: dict, targets: Iterable[int]) -> str:
+    session_id = uuid.uuid4().hex[:12]
+    targets = list(targets)
+    _ensure_dir()
+    os.makedirs(_path(session_id))
+    with open(_path(session_id, "session.json"), "w") as f:
+        json.dump({**spec, "id": session_id, "workers": targets, "created_at": time.time()}, f)
+    for pid in targets:
+        if pid == os.getpid():
+            apply(session_id)
+            continue
+        # Проверка прямо перед сигналом: pid мог освободиться и достаться другому процессу
+        if not _registered(pid):
+            logger.warning("profiling: worker %d is gone, session %s not sent", pid, session_id)
+            continue
+        open(_path("inbox", str(pid), session_id), "w").close()
+        os.kill(pid, WAKE_SIGNAL)
+    return session_id
+
+
+def check_inbox() -> None:
+    inbox = _path("inbox", str(os.getpid()))
+    for session_id in sorted(os.listdir(inbox)) if os.path.isdir(inbox) else ():
+        os.remove(os.path.join(inbox, session_id))
+        try:
+            apply(session_id)
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning("profiling: can't start session %s: %s", session_id, error)
+
+
+def apply(session_id: str) -> None:
+    spec = read_session(session_id)
+    interval = spec["interval_ms"] / 1000
+    if spec["kind"] == "worker":
+        sample_worker(session_id, spec["seconds"], interval)
+    else:
+        arm(RequestSession(session_id, spec["route"], spec["count"], spec["profiler"], interval))
+    logger.info("profiling: session %s started (%s)", session_id, spec["kind"])
+
+
+def read_session(session_id: str) -> dict:
+    if not SESSION_ID.match(session_id):
+        raise KeyError(session_id)
+    with open(_path(session_id, "session.json")) as f:
+        return json.load(f)
+
+
+def describe(session_id: str) -> dict:
+    spec = read_session(session_id)
+    names = sorted(os.listdir(_path(session_id)))
+    return {
+        **spec,
+        "done": sorted(int(n[5:]) for n in names if n.startswith("done-")),
+        "files": [n for n in names if RESULT_NAME.match(n)],
+    }
+
+
+def sessions() -> List[dict]:
+    directory = profile_dir()
+    found = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else ():
+        if SESSION_ID.match(name) and os.path.exists(_path(name, "session.json")):
+            found.append(describe(name))
+    return sorted(found, key=lambda s: s["created_at"], reverse=True)
+
+
+def result_path(session_id: str, name: str) -> Optional[str]:
+    if not SESSION_ID.match(session_id) or not RESULT_NAME.match(name):
+        return None
+    path = _path(session_id, name)
+    return path if os.path.isfile(path) else None
+
+
+def delete_session(session_id: str) -> bool:
+    if not SESSION_ID.match(session_id) or not os.path.isdir(_path(session_id)):
+        return False
+    if armed is not None and armed.id == session_id:
+        disarm(armed)
+    shutil.rmtree(_path(session_id), ignore_errors=True)
+    return True
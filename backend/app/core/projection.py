@@ -0,0 +1,83 @@
+"""
+Sparse fieldsets: ``?fields=user_id,emoji,completions.date``.
+
+A fieldset is parsed against the fields an endpoint allows into a small
+tree (``{"completions": {"date"}}``); endpoints use it both to pick the SQL
+columns they load and to trim the payload. Dotted names select nested
+fields; a bare name of a nested field selects all of its subfields.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Допустимые поля: имя -> None (скаляр) или множество вложенных полей
+FieldSpec = Dict[str, Optional[Set[str]]]
+FieldTree = Dict[str, Optional[Set[str]]]
+
+PROGRESS_FIELDS: FieldSpec = {"user_id": None, "emoji": None, "completions": {"date", "note"}}
+WEEK_FIELDS: FieldSpec = {name: None for name in ("id", "user_id", "week_start_date", "is_completed", "note")}
+USER_PUBLIC_FIELDS: FieldSpec = {name: None for name in ("id", "full_name", "emoji")}
+
+
+def parse_fields(raw: Optional[str], spec: FieldSpec) -> Optional[FieldTree]:
+    """None when no projection was requested; 400 on unknown fields."""
+    if raw is None:
+        return None
+    tree: FieldTree = {}
+    for name in (part.strip() for part in raw.split(",")):
+        if not name:
+            continue
+        head, _, sub = name.partition(".")
+        if head not in spec or (sub and (spec[head] is None or sub not in spec[head])):
+            raise HTTPException(status_code=400, detail=f"Unknown field: {name}")
+        if not sub:
+            tree[head] = set(spec[head]) if spec[head] is not None else None
+        elif head not in tree or tree[head] is not None:
+            tree.setdefault(head, set()).add(sub)
+    if not tree:
+        raise HTTPException(status_code=400, detail="Empty fieldset")
+    return tree
+
+
+def wants(tree: Optional[FieldTree], name: str, sub: Optional[str] = None) -> bool:
+    if tree is None:
+        return True
+    if name not in tree:
+        return False
+    return sub is None or tree[name] is None or sub in tree[name]
+
+
+def cache_suffix(tree: Optional[FieldTree]) -> str:
+    if tree is None:
+        return "*"
+    return ",".join(
+        name if subs is None else f"{name}({'|'.join(sorted(subs))})"
+        for name, subs in sorted(tree.items())
+    )
+
+
+def project_item(item: Dict[str, Any], tree: FieldTree) -> Dict[str, Any]:
+    out = {}
+    for name, subs in tree.items():
+        if name not in item:
+            continue
+        value = item[name]
+        if subs is not None and isinstance(value, list):
+            value = [{k: v for k, v in entry.items() if k in subs} for entry in value]
+        out[name] = value
+    return out
+
+
+def project(items: Iterable[Dict[str, Any]], tree: FieldTree) -> List[Dict[str, Any]]:
+    return [project_item(item, tree) for item in items]
+
+
+def projected_response(content: Any, response: Response) -> JSONResponse:
+    """
+    JSON response for a projected payload, which doesn't match the endpoint's
+    response model. Keeps headers set by dependencies (Cache-Control, ETag).
+    """
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return JSONResponse(jsonable_encoder(content), headers=headers)
@@ -0,0 +1,301 @@
+"""
+Rate limiting and load shedding for CPU-heavy endpoints.
+
+- Token buckets (per IP, per account) in a pluggable store selected by
+  ``RATE_LIMIT_BACKEND``: ``memory`` (per worker, LRU-bounded), ``file``
+  (SQLite file shared by the workers of one host) or ``redis`` (shared by
+  all hosts, atomic via a Lua script).
+- ``ConcurrencyLimiter`` caps how many Argon2 operations run at once in a
+  worker; extra requests wait in a bounded queue up to a deadline and are
+  rejected with 503 instead of piling up on the CPU. The queue is on the
+  event loop: a waiting login holds no thread of the pool that also serves
+  /grid/*, only the hashing itself runs in it (``run_hashing``).
+
+An unavailable bucket store doesn't fail requests: the limits fail open
+(logged), while the Argon2 limiter, local to the worker, still protects the
+CPU.
+"""
+import ipaddress
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.resp import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+# Ошибки хранилища вёдер: лимиты пропускают запрос, а не отвечают 500
+STORE_ERRORS = (OSError, RespError, sqlite3.Error)
+
+
+@dataclass(frozen=True)
+class Limit:
+    # Пополнение: rate токенов в секунду, ёмкость — burst
+    rate: float
+    burst: int
+
+    @classmethod
+    def per_minute(cls, count: float, burst: int) -> "Limit":
+        return cls(rate=count / 60.0, burst=burst)
+
+
+def refill(tokens: float, updated: float, now: float, limit: Limit) -> float:
+    return min(float(limit.burst), tokens + max(0.0, now - updated) * limit.rate)
+
+
+def take(tokens: float, limit: Limit, cost: float) -> Tuple[bool, float, float]:
+    """Returns (allowed, tokens left, seconds until the request would be allowed)."""
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / limit.rate
+
+
+class MemoryBucketStore:
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: Limit, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(limit.burst), now))
+            allowed, tokens, retry_after = take(refill(tokens, updated, now, limit), limit, cost)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Вытесненный ключ начинает с полного ведра — память важнее точности
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class FileBucketStore:
+    """Buckets in a WAL SQLite file; read-modify-write under BEGIN IMMEDIATE."""
+
+    def __init__(self, path: str, maxsize: int = 100_000, prune_every: int = 1000):
+        self.path = path
+        self.maxsize = maxsize
+        self.prune_every = prune_every
+        self._hits = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, limit: Limit, cost: float = 1.0) -> Tuple[bool, float]:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (float(limit.burst), now)
+            allowed, tokens, retry_after = take(refill(tokens, updated, now, limit), limit, cost)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._hits += 1
+        if self._hits % self.prune_every == 0:
+            self._prune(conn, now)
+        return allowed, retry_after
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        # Ведро, не трогавшееся час, всё равно уже полное
+        conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 3600,))
+        conn.execute(
+            "DELETE FROM buckets WHERE key IN (SELECT key FROM buckets ORDER BY updated LIMIT "
+            "max(0, (SELECT count(*) FROM buckets) - ?))",
+            (self.maxsize,),
+        )
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM buckets")
+
+
+# KEYS[1] — ведро; ARGV: rate, burst, cost, now (сек). Возвращает {allowed, retry_after_ms}
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry = math.ceil((cost - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, retry}
+"""
+
+
+class RedisBucketStore:
+    def __init__(self, client: RespClient, prefix: str = "dm:rl:"):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key: str, limit: Limit, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, retry_ms = self.client.execute(
+            "EVAL", TOKEN_BUCKET_LUA, 1, self.prefix + key, limit.rate, limit.burst, cost, time.time()
+        )
+        return bool(allowed), retry_ms / 1000.0
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(self.prefix + "*"))
+        for i in range(0, len(keys), 500):
+            self.client.delete(*keys[i:i + 500])
+
+
+def create_store(kind: str, url: str = ""):
+    if kind == "memory":
+        return MemoryBucketStore()
+    if kind == "file":
+        return FileBucketStore(url or "/tmp/diplom-monitor-ratelimit.sqlite3")
+    if kind == "redis":
+        return RedisBucketStore(RespClient(url or "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {kind}")
+
+
+class ConcurrencyLimiter:
+    """
+    At most ``limit`` concurrent holders; up to ``max_waiting`` callers wait
+    for a slot until ``timeout`` seconds pass. Everyone else is shed at once.
+    Waiting is asynchronous, so queued callers don't occupy pool threads.
+    """
+
+    def __init__(self, limit: int, max_waiting: int, timeout: float):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        # Семафор anyio привязывается к циклу событий при первом использовании — у воркера он один
+        self._slots = anyio.CapacityLimiter(limit)
+
+    @staticmethod
+    def _busy() -> HTTPException:
+        return HTTPException(status_code=503, detail="Server is busy, try again later",
+                             headers={"Retry-After": "1"})
+
+    @asynccontextmanager
+    async def slot(self):
+        if not self._slots.available_tokens and self._slots.statistics().tasks_waiting >= self.max_waiting:
+            raise self._busy()
+        # Слот занимает вход в контекст, а не задача: одна задача может войти дважды
+        borrower = object()
+        acquired = False
+        with anyio.move_on_after(self.timeout):
+            await self._slots.acquire_on_behalf_of(borrower)
+            acquired = True
+        if not acquired:
+            raise self._busy()
+        try:
+            yield
+        finally:
+            self._slots.release_on_behalf_of(borrower)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+AUTH_IP_LIMIT = Limit.per_minute(settings.AUTH_RATE_PER_IP, settings.AUTH_BURST_PER_IP)
+AUTH_ACCOUNT_LIMIT = Limit.per_minute(settings.AUTH_RATE_PER_ACCOUNT, settings.AUTH_BURST_PER_ACCOUNT)
+
+# Argon2 — ограничение на процесс: CPU у каждого воркера свой
+password_hashing = ConcurrencyLimiter(
+    limit=settings.PASSWORD_HASH_CONCURRENCY or (os.cpu_count() or 1),
+    max_waiting=settings.PASSWORD_HASH_MAX_WAITING,
+    timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+)
+
+
+async def run_hashing(func: Callable[..., Any], *args: Any) -> Any:
+    """Run an Argon2 call in the thread pool once a hashing slot is free."""
+    async with password_hashing.slot():
+        return await run_in_threadpool(func, *args)
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store(settings.RATE_LIMIT_BACKEND, settings.RATE_LIMIT_URL)
+    return _store
+
+
+def reset_rate_limits() -> None:
+    if _store is not None:
+        _store.clear()
+
+
+def client_ip(request: Request) -> str:
+    """
+    Peer address; X-Real-IP is trusted only from a loopback/private peer
+    (nginx in front of the backend), so clients can't pick their own bucket.
+    """
+    peer = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-real-ip")
+    if forwarded:
+        try:
+            address = ipaddress.ip_address(peer)
+        except ValueError:
+            return peer
+        if address.is_loopback or address.is_private:
+            return forwarded.strip()
+    return peer
+
+
+def check_rate(request: Request, scope: str, account: Optional[str] = None) -> None:
+    """Spend a token from the IP bucket and, if given, the account bucket; 429 when empty."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    store = get_store()
+    checks = [(f"{scope}:ip:{client_ip(request)}", AUTH_IP_LIMIT)]
+    if account:
+        checks.append((f"{scope}:account:{account.lower()}", AUTH_ACCOUNT_LIMIT))
+    for key, limit in checks:
+        try:
+            allowed, retry_after = store.hit(key, limit)
+        except STORE_ERRORS as error:
+            logger.warning("rate limit store unavailable, request allowed: %s", error)
+            return
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
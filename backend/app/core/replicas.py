@@ -0,0 +1,197 @@
+"""
+Read replicas.
+
+GET endpoints marked with ``deps.read_only`` read through a replica chosen
+here; everything else uses the primary. A replica is used only while it is
+healthy and its replication lag is within ``REPLICA_MAX_LAG``; the state is
+rechecked every ``REPLICA_CHECK_INTERVAL`` seconds and a connection error
+during a query takes the replica out until the next check. With no healthy
+replica reads fall back to the primary.
+
+Read-your-writes: a commit that wrote something pins the author (the JWT
+subject) to the primary for ``READ_PIN_SECONDS``. Pins live in the shared
+cache backend, so they hold across workers.
+
+``read_source`` tells the response cache where the request reads from:
+entries built from a replica are kept no longer than the allowed lag, and
+pinned requests don't read cached entries at all.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core import timeouts
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "primary"
+REPLICA = "replica"
+PINNED = "pinned"
+
+read_source: ContextVar[Optional[str]] = ContextVar("read_source", default=None)
+
+# Лаг по времени последней применённой транзакции; догнавшая реплика — 0,
+# даже если на primary давно не было записей
+POSTGRES_LAG_SQL = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+def measure_lag(engine: Engine) -> float:
+    """Replication lag in seconds; also serves as the health check."""
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            return float(conn.execute(POSTGRES_LAG_SQL).scalar() or 0.0)
+        # Копия SQLite-файла и прочее: лаг не измерить, проверяем только доступность
+        conn.execute(text("SELECT 1"))
+        return 0.0
+
+
+@dataclass
+class Replica:
+    engine: Engine
+    healthy: bool = True
+    lag: float = 0.0
+    checked_at: float = float("-inf")
+
+
+class ReplicaRouter:
+    def __init__(self, primary: Engine, replicas: List[Engine], max_lag: float = 5.0,
+                 check_interval: float = 5.0, pin_seconds: float = 10.0):
+        self.primary = primary
+        self.replicas = [Replica(engine) for engine in replicas]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.pin_seconds = pin_seconds
+        self._next = 0
+        self._lock = threading.Lock()
+        for replica in self.replicas:
+            event.listen(replica.engine, "handle_error", self._on_error(replica))
+        track_writes()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def _on_error(self, replica: Replica):
+        def handle_error(context) -> None:
+            # Запрос, остановленный бюджетом (timeouts), — не сбой реплики
+            if timeouts.is_cancellation(context.original_exception):
+                return
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, exc.OperationalError):
+                self.mark_failed(replica)
+        return handle_error
+
+    def mark_failed(self, replica: Replica) -> None:
+        if replica.healthy:
+            logger.warning("replica %s is unavailable, reading from the primary", replica.engine.url)
+        replica.healthy = False
+        replica.checked_at = time.monotonic()
+
+    def check(self, replica: Replica) -> None:
+        try:
+            replica.lag = measure_lag(replica.engine)
+            replica.healthy = True
+        except exc.SQLAlchemyError as error:
+            logger.warning("replica %s health check failed: %s", replica.engine.url, error)
+            replica.healthy = False
+        replica.checked_at = time.monotonic()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        stale = [r for r in self.replicas if now - r.checked_at >= self.check_interval]
+        # Проверяет один поток, остальные пока читают по прошлому состоянию
+        if stale and self._lock.acquire(blocking=False):
+            try:
+                for replica in stale:
+                    self.check(replica)
+            finally:
+                self._lock.release()
+
+    def pick(self) -> Optional[Replica]:
+        """Next usable replica (round robin), or None to read from the primary."""
+        self._refresh()
+        usable = [r for r in self.replicas if r.healthy and r.lag <= self.max_lag]
+        if not usable:
+            return None
+        self._next = (self._next + 1) % len(usable)
+        return usable[self._next]
+
+    def route(self, subject: Optional[str]) -> Tuple[Engine, str]:
+        """Engine for a read-only request of ``subject`` and where it reads from."""
+        if subject and self.is_pinned(subject):
+            return self.primary, PINNED
+        replica = self.pick()
+        if replica is None:
+            return self.primary, PRIMARY
+        return replica.engine, REPLICA
+
+    # --- read-your-writes ---
+
+    @staticmethod
+    def _pin_key(subject: str) -> str:
+        return f"pin:{subject}"
+
+    def pin(self, subject: str) -> None:
+        from app.core.cache import BACKEND_ERRORS, get_response_cache
+        try:
+            get_response_cache().backend.set(self._pin_key(subject), b"1", self.pin_seconds)
+        except BACKEND_ERRORS as error:
+            logger.warning("replica pin failed: %s", error)
+
+    def is_pinned(self, subject: str) -> bool:
+        from app.core.cache import BACKEND_ERRORS, get_response_cache
+        try:
+            return get_response_cache().backend.get_many([self._pin_key(subject)])[0] is not None
+        except BACKEND_ERRORS:
+            # Не знаем — читаем с primary
+            return True
+
+
+def _remember_flush(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+def _remember_dml(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+def _pin_writer(session: Session) -> None:
+    wrote = session.info.pop("wrote", False)
+    router = session.info.get("replica_router")
+    subject = session.info.get("subject")
+    if wrote and router is not None and subject:
+        router.pin(subject)
+
+
+def _forget_writes(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+def track_writes() -> None:
+    """
+    Sessions remember that their transaction wrote (a flush with changes or
+    an INSERT/UPDATE/DELETE via execute) until it ends; committing such a
+    session pins its author to the primary. ``database.release`` relies on
+    the same flag to tell read-only transactions apart.
+    """
+    for name, listener in (
+        ("after_flush", _remember_flush),
+        ("do_orm_execute", _remember_dml),
+        ("after_commit", _pin_writer),
+        ("after_rollback", _forget_writes),
+    ):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
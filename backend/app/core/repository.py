@@ -0,0 +1,100 @@
+"""
+Prebuilt statements for the hot read paths.
+
+Every statement here is built once at import with named bind parameters, so
+a request only supplies values: no Query/Select objects are constructed per
+call, and the SQL comes from SQLAlchemy's compiled cache. Reads that don't
+need ORM identity (week rows, counts, scope settings, data versions) return
+Core rows instead of entities and skip the identity map.
+
+Prebuilt ``select()`` was measured faster than ``lambda_stmt`` for these
+fixed-shape queries (``python -m benchmarks.statements``), so there are no
+lambdas here.
+"""
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.models.data_version import DataVersion
+from app.models.user import User
+from app.models.week_progress import WeekProgress
+
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email")).limit(1)
+USER_BY_TELEGRAM_ID = select(User).where(User.telegram_id == bindparam("telegram_id")).limit(1)
+
+# Админ (иначе первый пользователь) — источник дат глобальной области
+ADMIN_USER = select(User).where(User.is_superuser == True).limit(1)
+FIRST_USER = select(User).limit(1)
+ADMIN_SCOPE = select(User.id, User.start_date, User.deadline).where(User.is_superuser == True).limit(1)
+FIRST_USER_SCOPE = select(User.id, User.start_date, User.deadline).limit(1)
+
+WEEK_COLUMNS = (
+    WeekProgress.id,
+    WeekProgress.user_id,
+    WeekProgress.week_start_date,
+    WeekProgress.is_completed,
+    WeekProgress.note,
+)
+WEEKS_OF_USER = (
+    select(*WEEK_COLUMNS)
+    .where(WeekProgress.user_id == bindparam("user_id"))
+    .order_by(WeekProgress.week_start_date)
+)
+USER_WEEK = (
+    select(WeekProgress)
+    .where(WeekProgress.user_id == bindparam("user_id"), WeekProgress.week_start_date == bindparam("week"))
+    .limit(1)
+)
+WEEK_NOTE = (
+    select(WeekProgress.note)
+    .where(WeekProgress.user_id == bindparam("user_id"), WeekProgress.week_start_date == bindparam("week"))
+    .limit(1)
+)
+COMPLETED_WEEKS = (
+    select(func.count())
+    .select_from(WeekProgress)
+    .where(WeekProgress.user_id == bindparam("user_id"), WeekProgress.is_completed == True)
+)
+
+DATA_VERSION = select(DataVersion.version).where(DataVersion.key == bindparam("key"))
+
+
+def user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.scalars(USER_BY_EMAIL, {"email": email}).first()
+
+
+def user_by_telegram_id(db: Session, telegram_id: int) -> Optional[User]:
+    return db.scalars(USER_BY_TELEGRAM_ID, {"telegram_id": telegram_id}).first()
+
+
+def admin_user(db: Session) -> Optional[User]:
+    return db.scalars(ADMIN_USER).first() or db.scalars(FIRST_USER).first()
+
+
+def admin_scope_row(db: Session) -> Optional[Row]:
+    """(id, start_date, deadline) of the admin, or of the first user when there is no admin yet."""
+    return db.execute(ADMIN_SCOPE).first() or db.execute(FIRST_USER_SCOPE).first()
+
+
+def week_rows(db: Session, user_id: int) -> List[dict]:
+    """WeekProgressOut-shaped dicts of a user's weeks, oldest first."""
+    return [dict(row) for row in db.execute(WEEKS_OF_USER, {"user_id": user_id}).mappings()]
+
+
+def user_week(db: Session, user_id: int, week: date) -> Optional[WeekProgress]:
+    return db.scalars(USER_WEEK, {"user_id": user_id, "week": week}).first()
+
+
+def week_note(db: Session, user_id: int, week: date) -> Optional[Row]:
+    return db.execute(WEEK_NOTE, {"user_id": user_id, "week": week}).first()
+
+
+def completed_weeks(db: Session, user_id: int) -> int:
+    return db.execute(COMPLETED_WEEKS, {"user_id": user_id}).scalar_one()
+
+
+def data_version(db: Session, key: str) -> int:
+    return db.execute(DATA_VERSION, {"key": key}).scalar() or 0
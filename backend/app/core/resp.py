@@ -0,0 +1,127 @@
+"""
+Minimal Redis protocol (RESP2) client.
+
+Covers the handful of commands the shared cache and rate limiter need,
+without adding a driver dependency. One connection per thread.
+"""
+import socket
+import threading
+from typing import Any, List, Optional
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    pass
+
+
+class RespClient:
+    def __init__(self, url: str = "redis://localhost:6379/0", timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._roundtrip(conn, ("AUTH", self.password))
+            if self.db:
+                self._roundtrip(conn, ("SELECT", self.db))
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, bytes):
+                data = arg
+            else:
+                data = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    def _read(self, reader) -> Any:
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RespError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read(reader) for _ in range(length)]
+        raise RespError(f"Unexpected reply: {line!r}")
+
+    def _roundtrip(self, conn, args):
+        sock, reader = conn
+        sock.sendall(self._encode(args))
+        return self._read(reader)
+
+    def execute(self, *args) -> Any:
+        try:
+            return self._roundtrip(self._connection(), args)
+        except (OSError, ConnectionError):
+            # Соединение могло протухнуть — одна повторная попытка
+            self._drop()
+            return self._roundtrip(self._connection(), args)
+
+    # --- commands ---
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute("GET", key)
+
+    def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self.execute("MGET", *keys) if keys else []
+
+    def set(self, key: str, value: bytes, px: Optional[int] = None) -> None:
+        if px:
+            self.execute("SET", key, value, "PX", px)
+        else:
+            self.execute("SET", key, value)
+
+    def incr(self, key: str) -> int:
+        return self.execute("INCR", key)
+
+    def delete(self, *keys: str) -> int:
+        return self.execute("DEL", *keys) if keys else 0
+
+    def scan_iter(self, match: str):
+        cursor = b"0"
+        while True:
+            cursor, keys = self.execute("SCAN", cursor, "MATCH", match, "COUNT", 500)
+            for key in keys:
+                yield key
+            if cursor in (b"0", 0, "0"):
+                break
+
+    def ping(self) -> bool:
+        return self.execute("PING") == "PONG"
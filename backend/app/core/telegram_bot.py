@@ -0,0 +1,207 @@
+"""
+Telegram bot: the shared client and webhook update processing.
+
+One ``Bot`` (and so one HTTP connection pool) per worker is shared by the
+reminders and the webhook replies; it lives on the application's event loop
+and is closed on shutdown.
+
+The webhook endpoint only verifies the secret token and puts the update
+into ``updates``; a few worker tasks process it afterwards, so Telegram gets
+its 200 at once and a slow database or API call never times the webhook
+out. The inline "done / not done" buttons call the same ``upsert_week`` as
+``POST /grid/weeks``.
+"""
+import asyncio
+import logging
+from datetime import date
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from telegram import Bot, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.request import HTTPXRequest
+
+from app.core import embedded, repository, weeks
+from app.core.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_PREFIX = "week"
+NOT_LINKED = "Аккаунт не привязан: войдите в DiplomMonitor через Telegram, и бот сможет отмечать недели."
+
+_bot: Optional[Bot] = None
+
+
+def bot_enabled() -> bool:
+    return settings.TELEGRAM_BOT_TOKEN != "SET_YOUR_BOT_TOKEN"
+
+
+def get_bot() -> Bot:
+    global _bot
+    if _bot is None:
+        _bot = Bot(
+            token=settings.TELEGRAM_BOT_TOKEN,
+            base_url=settings.TELEGRAM_API_URL,
+            request=HTTPXRequest(connection_pool_size=settings.TELEGRAM_POOL_SIZE),
+        )
+    return _bot
+
+
+async def close_bot() -> None:
+    global _bot
+    bot, _bot = _bot, None
+    if bot is not None:
+        await bot.shutdown()
+
+
+def week_keyboard(week_start: date) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("✅ Сделано", callback_data=f"{CALLBACK_PREFIX}:1:{week_start.isoformat()}"),
+        InlineKeyboardButton("❌ Не сделано", callback_data=f"{CALLBACK_PREFIX}:0:{week_start.isoformat()}"),
+    ]])
+
+
+def week_text(week_start: date, is_completed: bool) -> str:
+    status = "✅ отмечена" if is_completed else "⏳ не отмечена"
+    return f"Неделя с {week_start:%d.%m.%Y}: {status}"
+
+
+def parse_callback(data: Optional[str]) -> Optional[Tuple[bool, date]]:
+    try:
+        prefix, done, day = (data or "").split(":")
+        if prefix != CALLBACK_PREFIX or done not in ("0", "1"):
+            return None
+        return done == "1", date.fromisoformat(day)
+    except ValueError:
+        return None
+
+
+# --- синхронная часть: БД в потоке, чтобы не блокировать цикл событий ---
+
+def load_week_state(telegram_id: int) -> Optional[bool]:
+    """Completion of the current week for a linked account; None when the account isn't linked."""
+    db = SessionLocal()
+    try:
+        user = repository.user_by_telegram_id(db, telegram_id)
+        if user is None or not user.is_active:
+            return None
+        week = repository.user_week(db, user.id, weeks.current_week_start())
+        return bool(week and week.is_completed)
+    finally:
+        db.close()
+
+
+def mark_week(telegram_id: int, week_start: date, is_completed: bool) -> Optional[bool]:
+    """Tick the week for a linked account; None when not linked, HTTPException when not allowed."""
+    db = embedded.for_writes(SessionLocal())
+    try:
+        user = repository.user_by_telegram_id(db, telegram_id)
+        if user is None or not user.is_active:
+            return None
+        return weeks.upsert_week(db, user.id, week_start, is_completed).is_completed
+    finally:
+        db.close()
+
+
+# --- обработка обновлений ---
+
+async def handle_update(data: dict) -> None:
+    bot = get_bot()
+    update = Update.de_json(data, bot)
+    if update is None:
+        return
+    if update.callback_query is not None:
+        await handle_callback(bot, update.callback_query)
+        return
+    message = update.message
+    if message is None or not message.text or message.from_user is None:
+        return
+    if message.text.split()[0].split("@")[0] in ("/start", "/week"):
+        state = await asyncio.to_thread(load_week_state, message.from_user.id)
+        if state is None:
+            await bot.send_message(chat_id=message.chat_id, text=NOT_LINKED)
+            return
+        week_start = weeks.current_week_start()
+        await bot.send_message(
+            chat_id=message.chat_id,
+            text=week_text(week_start, state),
+            reply_markup=week_keyboard(week_start),
+        )
+
+
+async def handle_callback(bot: Bot, query: CallbackQuery) -> None:
+    parsed = parse_callback(query.data)
+    if parsed is None:
+        await bot.answer_callback_query(query.id)
+        return
+    is_completed, week_start = parsed
+    try:
+        state = await asyncio.to_thread(mark_week, query.from_user.id, week_start, is_completed)
+    except HTTPException as exc:
+        await bot.answer_callback_query(query.id, text=str(exc.detail), show_alert=True)
+        return
+    if state is None:
+        await bot.answer_callback_query(query.id, text=NOT_LINKED, show_alert=True)
+        return
+    await bot.answer_callback_query(query.id, text="Отмечено ✅" if state else "Отметка снята")
+    if query.message is not None:
+        await bot.edit_message_text(
+            chat_id=query.message.chat_id,
+            message_id=query.message.message_id,
+            text=week_text(week_start, state),
+            reply_markup=week_keyboard(week_start),
+        )
+
+
+class UpdateQueue:
+    """Bounded queue of raw updates drained by worker tasks on the app's event loop."""
+
+    def __init__(self, workers: int, maxsize: int):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, data: dict) -> bool:
+        """False when the queue is full or not running — Telegram will redeliver."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def join(self) -> None:
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        if self._queue is None:
+            return
+        # Даём дообработать принятое, затем останавливаем воркеров
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("telegram: %d updates dropped on shutdown", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._queue, self._tasks = None, []
+
+    async def _worker(self) -> None:
+        while True:
+            data = await self._queue.get()
+            try:
+                await handle_update(data)
+            except Exception:
+                logger.exception("telegram: failed to process update %s", data.get("update_id"))
+            finally:
+                self._queue.task_done()
+
+
+updates = UpdateQueue(workers=settings.TELEGRAM_WEBHOOK_WORKERS, maxsize=settings.TELEGRAM_WEBHOOK_QUEUE)
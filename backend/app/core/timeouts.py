@@ -0,0 +1,227 @@
+"""
+Latency budgets for the queries of a request.
+
+Every request gets a budget in seconds, ``REQUEST_DB_BUDGET`` or the first
+matching ``REQUEST_DB_BUDGETS`` pattern for its path. The budget counts
+from the moment the request arrives. Each transaction the request begins
+may run only for what is left of it:
+
+- Postgres: ``SET LOCAL statement_timeout`` at BEGIN;
+- SQLite: a progress handler that interrupts the running statement.
+
+For reads, the middleware also watches the connection. When the client goes
+away, the request's in-flight Postgres query is cancelled, and SQLite
+statements are interrupted by the same progress handler. A slow all-progress
+or export then stops holding a pool connection for nobody.
+
+An exceeded or cancelled query surfaces as an ``OperationalError``. It is
+answered with a structured 503 and a ``Retry-After``, instead of a 500 and a
+traceback.
+"""
+import asyncio
+import fnmatch
+import logging
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Postgres query_canceled: и statement_timeout, и pg_cancel_backend
+QUERY_CANCELED = "57014"
+# Инструкций VM SQLite между проверками бюджета
+SQLITE_PROGRESS_STEPS = 1000
+READ_METHODS = ("GET", "HEAD")
+
+
+class Budget:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+        # Клиент отключился
+        self.cancelled = threading.Event()
+        self._running: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def exhausted(self) -> bool:
+        return self.cancelled.is_set() or self.remaining() <= 0
+
+    def attach(self, dbapi_connection) -> None:
+        with self._lock:
+            self._running[id(dbapi_connection)] = dbapi_connection
+
+    def detach(self, dbapi_connection) -> None:
+        # Под той же блокировкой, что cancel: отменить соединение, уже отданное в пул, нельзя
+        with self._lock:
+            self._running.pop(id(dbapi_connection), None)
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        with self._lock:
+            for dbapi_connection in self._running.values():
+                try:
+                    dbapi_connection.cancel()
+                except Exception as error:
+                    logger.warning("query cancel failed: %s", error)
+
+
+current_budget: ContextVar[Optional[Budget]] = ContextVar("current_budget", default=None)
+
+
+def parse_budgets(value: str) -> List[Tuple[str, float]]:
+    """``"pattern=seconds,..."`` into (pattern, seconds) pairs, in order."""
+    budgets = []
+    for item in value.split(","):
+        if "=" in item:
+            pattern, seconds = item.rsplit("=", 1)
+            budgets.append((pattern.strip(), float(seconds)))
+    return budgets
+
+
+def budget_for(path: str) -> float:
+    for pattern, seconds in parse_budgets(settings.REQUEST_DB_BUDGETS):
+        if fnmatch.fnmatchcase(path, pattern):
+            return seconds
+    return settings.REQUEST_DB_BUDGET
+
+
+def configure(engine: Engine) -> None:
+    """Apply the current request's budget to every transaction begun on ``engine``."""
+    dialect = engine.dialect.name
+
+    @event.listens_for(engine, "begin")
+    def begin(conn):
+        budget = current_budget.get()
+        # info живёт вместе с DBAPI-соединением, между выдачами из пула
+        info = conn.connection.info
+        dbapi_connection = conn.connection.dbapi_connection
+        if dialect == "sqlite":
+            if budget is not None:
+                dbapi_connection.set_progress_handler(lambda: budget.exhausted(), SQLITE_PROGRESS_STEPS)
+                info["budget"] = budget
+            elif info.pop("budget", None) is not None:
+                # Соединение из пула после запроса с бюджетом: фоновые задачи без ограничений
+                dbapi_connection.set_progress_handler(None, 0)
+            return
+        if budget is None or dialect != "postgresql":
+            return
+        # Не меньше 1 мс: 0 в Postgres — «без ограничения»
+        milliseconds = max(1, int(budget.remaining() * 1000))
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {milliseconds}")
+        budget.attach(dbapi_connection)
+        info["budget"] = budget
+
+    def finish(conn):
+        if dialect == "postgresql":
+            budget = conn.connection.info.pop("budget", None)
+            if budget is not None:
+                budget.detach(conn.connection.dbapi_connection)
+
+    event.listen(engine, "commit", finish)
+    event.listen(engine, "rollback", finish)
+
+
+def is_cancellation(error: BaseException) -> bool:
+    """A query stopped by a budget: timed out or cancelled after a disconnect."""
+    orig = getattr(error, "orig", error)
+    if getattr(orig, "pgcode", None) == QUERY_CANCELED:
+        return True
+    return isinstance(orig, sqlite3.OperationalError) and str(orig) == "interrupted"
+
+
+async def cancelled_query_handler(request: Request, error: OperationalError):
+    if not is_cancellation(error):
+        raise error
+    budget = current_budget.get()
+    disconnected = budget is not None and budget.cancelled.is_set()
+    logger.warning(
+        "%s %s: query %s", request.method, request.url.path,
+        "cancelled, client disconnected" if disconnected else "exceeded the latency budget",
+    )
+    return JSONResponse(
+        status_code=503,
+        content={
+            "detail": "Request took too long, try again later",
+            "code": "client_disconnected" if disconnected else "statement_timeout",
+            "budget_seconds": budget.seconds if budget is not None else None,
+        },
+        headers={"Retry-After": "1"},
+    )
+
+
+class RequestBudgetMiddleware:
+    """Sets the request's budget and, for reads, cancels its queries when the client disconnects."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        seconds = budget_for(scope["path"])
+        if seconds <= 0:
+            return await self.app(scope, receive, send)
+        budget = Budget(seconds)
+        token = current_budget.set(budget)
+        try:
+            if scope["method"] in READ_METHODS:
+                await self._watched(scope, receive, send, budget)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            current_budget.reset(token)
+
+    async def _watched(self, scope, receive, send, budget: Budget):
+        first = await receive()
+        if first["type"] != "http.request" or first.get("more_body"):
+            # Чтение с телом по частям — не следим, отдаём как есть
+            replay = [first]
+
+            async def passthrough():
+                return replay.pop() if replay else await receive()
+
+            return await self.app(scope, passthrough, send)
+
+        # Тело прочитано целиком: дальше receive вернёт только http.disconnect, его ждём сами
+        disconnected = asyncio.Event()
+        responded = False
+        pending = [first]
+
+        async def watch():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            if not responded:
+                await run_in_threadpool(budget.cancel)
+            disconnected.set()
+
+        async def app_receive():
+            if pending:
+                return pending.pop()
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def app_send(message):
+            nonlocal responded
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                responded = True
+            await send(message)
+
+        watcher = asyncio.create_task(watch())
+        try:
+            await self.app(scope, app_receive, app_send)
+        finally:
+            watcher.cancel()
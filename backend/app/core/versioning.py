@@ -0,0 +1,115 @@
+"""
+Data versions for cache keys.
+
+``bump_data_version`` is called by every write that changes what the grid
+shows. The increment itself runs right after the write commits, as one
+``INSERT … ON CONFLICT DO UPDATE`` in its own short transaction: writers
+don't hold the counter's row lock for the length of their transactions, and
+two first writers can't both insert the missing row. A reader that sees the
+new version also sees the write; one that read the data just before the
+bump caches it under the old version, which nobody asks for again.
+
+The write is already committed by then, so the bump doesn't count against
+the request's latency budget and its failure doesn't fail the request: it
+is logged and retried in the background.
+"""
+import logging
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core import embedded, repository
+from app.core.timeouts import current_budget
+from app.models.data_version import DataVersion
+
+logger = logging.getLogger(__name__)
+
+GRID_VERSION_KEY = "grid"
+# Ключи версий, которые нужно увеличить после коммита транзакции сессии
+PENDING = "pending_versions"
+COMMITTED = "committed_versions"
+# Паузы перед повторами неудавшегося увеличения (с)
+RETRY_DELAYS = (0.5, 2.0, 10.0)
+
+
+def get_data_version(db: Session, key: str = GRID_VERSION_KEY) -> int:
+    return repository.data_version(db, key)
+
+
+def bump_data_version(db: Session, key: str = GRID_VERSION_KEY) -> None:
+    """Increment the version once the caller commits; nothing happens on rollback."""
+    db.info.setdefault(PENDING, set()).add(key)
+
+
+def increment_statement(dialect: str, key: str):
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    stmt = insert(DataVersion).values(key=key, version=1)
+    return stmt.on_conflict_do_update(
+        index_elements=[DataVersion.key],
+        set_={"version": DataVersion.version + 1},
+    )
+
+
+def _committed(session: Session) -> None:
+    # Коммит точки сохранения — ещё не коммит записи
+    if not session.in_nested_transaction() and PENDING in session.info:
+        session.info[COMMITTED] = session.info.pop(PENDING)
+
+
+def _rolled_back(session: Session) -> None:
+    if not session.in_nested_transaction():
+        session.info.pop(PENDING, None)
+
+
+def _increment(bind, keys) -> None:
+    with embedded.writer_engine(bind).begin() as conn:
+        for key in sorted(keys):
+            conn.execute(increment_statement(conn.dialect.name, key))
+
+
+def _retry_later(bind, keys, attempt: int) -> None:
+    timer = threading.Timer(RETRY_DELAYS[attempt], _retry, (bind, keys, attempt))
+    timer.daemon = True
+    timer.start()
+
+
+def _retry(bind, keys, attempt: int) -> None:
+    try:
+        _increment(bind, keys)
+    except SQLAlchemyError as error:
+        if attempt + 1 < len(RETRY_DELAYS):
+            logger.warning("data version bump of %s failed again: %s", sorted(keys), error)
+            _retry_later(bind, keys, attempt + 1)
+        else:
+            logger.error("data version bump of %s failed, version-keyed caches stay stale: %s", sorted(keys), error)
+
+
+def _apply(session: Session, transaction) -> None:
+    # Соединение сессии уже вернулось в пул — увеличение берёт его же, а не второе
+    keys = session.info.pop(COMMITTED, None) if transaction.parent is None else None
+    if not keys:
+        return
+    bind = session.get_bind()
+    # Запись закоммичена: бюджет запроса на увеличение не тратим
+    token = current_budget.set(None)
+    try:
+        _increment(bind, keys)
+    except SQLAlchemyError as error:
+        # Ошибка из commit() вызывающего — 500 на сохранённую запись и пропущенная инвалидация
+        logger.warning("data version bump of %s failed, retrying: %s", sorted(keys), error)
+        _retry_later(bind, keys, 0)
+    finally:
+        current_budget.reset(token)
+
+
+for name, listener in (
+    ("after_commit", _committed),
+    ("after_rollback", _rolled_back),
+    ("after_transaction_end", _apply),
+):
+    if not event.contains(Session, name, listener):
+        event.listen(Session, name, listener)
@@ -0,0 +1,74 @@
+"""
+Week progress writes shared by the API and the Telegram bot.
+
+``upsert_week`` is the only place that ticks a week: it records the history
+event and the delta-sync change, bumps the data version, commits and
+invalidates the cached reads, so every entry point behaves the same.
+``write_week`` is its uncommitted core, also used by the write-behind
+coalescer (``app.core.coalescing``) to apply many toggles in one commit.
+"""
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core import changelog, history, repository
+from app.core.cache import invalidate_tags
+from app.core.versioning import bump_data_version
+from app.models.week_progress import WeekProgress
+
+# Заметка не передана — оставить как есть (бот не знает о заметках)
+KEEP_NOTE = object()
+
+
+def current_week_start(today: Optional[date] = None) -> date:
+    today = today or date.today()
+    return today - timedelta(days=today.weekday())
+
+
+def ensure_current_week(week_start_date: date) -> None:
+    """Only the current week can be modified (403)."""
+    if week_start_date != current_week_start():
+        raise HTTPException(
+            status_code=403,
+            detail="You can only modify the current week."
+        )
+
+
+def write_week(db: Session, user_id: int, week_start_date: date, is_completed: bool,
+               note=KEEP_NOTE, at: Optional[datetime] = None) -> WeekProgress:
+    """Create or update the week with its history event and change-log entry; the caller commits."""
+    at = at or history.utcnow()
+    week = repository.user_week(db, user_id, week_start_date)
+
+    was_completed = bool(week and week.is_completed)
+    if week:
+        week.is_completed = is_completed
+        if note is not KEEP_NOTE:
+            week.note = note
+    else:
+        week = WeekProgress(
+            user_id=user_id,
+            week_start_date=week_start_date,
+            is_completed=is_completed,
+            note=None if note is KEEP_NOTE else note,
+        )
+
+    db.add(week)
+    if week.is_completed != was_completed:
+        history.record_week_event(db, user_id, week.week_start_date, week.is_completed, at=at)
+    changelog.record_week(db, user_id, week.week_start_date, week.is_completed, week.note, at=at)
+    return week
+
+
+def upsert_week(db: Session, user_id: int, week_start_date: date, is_completed: bool,
+                note=KEEP_NOTE) -> WeekProgress:
+    """Create or update the user's week and commit. Only the current week can be modified (403)."""
+    ensure_current_week(week_start_date)
+    week = write_week(db, user_id, week_start_date, is_completed, note)
+    bump_data_version(db)
+    db.commit()
+    invalidate_tags("progress", f"weeks:{user_id}")
+    db.refresh(week)
+    return week
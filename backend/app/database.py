@@ -1,16 +1,87 @@
+from fastapi import Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 import os
 
+from app.core import embedded, timeouts
+from app.core.config import settings
+from app.core.replicas import ReplicaRouter
+from app.core.security import token_subject
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/diplom_monitor")
+# Реплики только для чтения, через запятую; пусто — всё читается с primary
+READ_DATABASE_URLS = [url.strip() for url in os.getenv("READ_DATABASE_URLS", "").split(",") if url.strip()]
+
+
+def pool_options(url: str) -> dict:
+    """Pool settings for a server database or a SQLite file (in-memory SQLite has no queue pool)."""
+    if embedded.is_sqlite(url) and make_url(url).database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def make_engine(url: str):
+    engine = create_engine(url, **embedded.engine_options(url), **pool_options(url))
+    timeouts.configure(engine)
+    return engine
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
+if embedded.is_sqlite(SQLALCHEMY_DATABASE_URL):
+    embedded.configure(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+replica_router = ReplicaRouter(
+    engine,
+    [make_engine(url) for url in READ_DATABASE_URLS],
+    max_lag=settings.REPLICA_MAX_LAG,
+    check_interval=settings.REPLICA_CHECK_INTERVAL,
+    pin_seconds=settings.READ_PIN_SECONDS,
+)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def release(db: Session) -> None:
+    """
+    End a read-only transaction and return its connection to the pool.
+
+    The session stays usable: loaded objects keep their state (nothing was
+    written, so there is nothing to expire) and the next query checks a
+    connection out again. Sessions with unflushed or uncommitted writes are
+    left alone.
+    """
+    if (not db.in_transaction() or db.new or db.dirty or db.deleted or db.info.get("wrote")
+            or db.info.get("pending_versions")):
+        return
+    expire_on_commit, db.expire_on_commit = db.expire_on_commit, False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
+def get_db(request: Request):
+    # Сессия ленивая: соединение берётся из пула первым запросом к БД,
+    # а release() возвращает его, как только чтение закончено
+    # Реплику выбирает deps.read_only; без неё — primary
+    bind = getattr(request.state, "read_bind", None)
+    db = SessionLocal(bind=bind) if bind is not None else SessionLocal()
+    if request.method not in READ_METHODS and not getattr(request.state, "read_only", False):
+        # SQLite: пишущий запрос сразу берёт блокировку записи
+        embedded.for_writes(db)
+    if replica_router.enabled:
+        # Для read-your-writes: коммит с записью закрепит автора за primary
+        db.info["replica_router"] = replica_router
+        db.info["subject"] = token_subject(request.headers.get("authorization"))
     try:
         yield db
     finally:
@@ -1,35 +1,27 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import OperationalError
 from app.api.auth import router as auth_router
 from app.api.user import router as user_router
 from app.api.grid import router as grid_router
+from app.api.cohort import router as cohort_router
+from app.api.batch import router as batch_router
+from app.api.telegram import router as telegram_router
+from app.api.profiling import router as profiling_router
+from app.api import deps
+from app.core.cache import get_response_cache
+from app.core.calendar import get_calendar
 from app.core.config import settings
+from app.core.http_cache import Purger
+from app.core import coalescing, embedded, profiling, telegram_bot, timeouts
 from app.core.notifications import start_scheduler
+from app.core.cohorts import invalidate_scope, resolve_scope
+from app.core.versioning import bump_data_version, get_data_version
 from app.database import engine, SessionLocal
 from app import models
 from app.models import Base
 
-# Создание таблиц при старте (если их нет)
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    openapi_url=f"/openapi.json"
-)
-
-# Set all CORS enabled origins
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], # In production, this should be restricted
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(auth_router, prefix="/auth", tags=["auth"])
-app.include_router(user_router, prefix="/users", tags=["users"])
-app.include_router(grid_router, prefix="/grid", tags=["grid"])
-
 def init_db():
     db = SessionLocal()
     try:
@@ -43,30 +35,126 @@ def init_db():
             if first_user:
                 first_user.is_superuser = True
                 db.add(first_user)
+                bump_data_version(db)
                 db.commit()
+                invalidate_scope(None)
         elif user_count == 1:
             # If there's only one user, they must be admin
             only_user = db.query(models.user.User).first()
             if not only_user.is_superuser:
                 only_user.is_superuser = True
                 db.add(only_user)
+                bump_data_version(db)
                 db.commit()
+                invalidate_scope(None)
     finally:
         db.close()
 
-@app.on_event("startup")
-async def startup_event():
+def prepare_database():
+    """One-time startup tasks: bring the schema up and make sure there is an admin."""
+    # Создание таблиц (если их нет); SQLite — ещё и миграции Alembic
+    if engine.dialect.name == "sqlite":
+        embedded.migrate(engine)
+    else:
+        Base.metadata.create_all(bind=engine)
     init_db()
-    app.state.scheduler = start_scheduler()
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    app.state.scheduler.shutdown()
+def warm_up():
+    """Fill the worker's own caches before it takes traffic: global scope, its calendar, a pooled connection."""
+    db = SessionLocal()
+    try:
+        get_data_version(db)
+        scope = resolve_scope(db)
+        if scope is not None:
+            get_calendar(db, scope)
+    finally:
+        db.close()
+
+def create_app(prepare: bool = True, scheduler: bool = True) -> FastAPI:
+    """
+    Build the ASGI application on the process-wide settings, engine and
+    caches (apps built twice in one process share them). ``prepare`` runs the
+    one-time database tasks on startup and ``scheduler`` starts the periodic
+    jobs; the preforking runner (app.server) does the former once in the
+    master and the latter in one worker.
+    """
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        openapi_url=f"/openapi.json"
+    )
+    app.state.prepare = prepare
+    app.state.run_scheduler = scheduler
+    app.state.scheduler = None
+
+    # Set all CORS enabled origins
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"], # In production, this should be restricted
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Бюджет времени запросов к БД; превышение или отключение клиента — 503, а не 500
+    app.add_middleware(timeouts.RequestBudgetMiddleware)
+    app.add_exception_handler(OperationalError, timeouts.cancelled_query_handler)
+    # Профилирование по запросу администратора; без активной сессии — одна проверка на запрос
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+    app.include_router(auth_router, prefix="/auth", tags=["auth"])
+    app.include_router(user_router, prefix="/users", tags=["users"])
+    app.include_router(grid_router, prefix="/grid", tags=["grid"])
+    app.include_router(cohort_router, prefix="/cohorts", tags=["cohorts"])
+    app.include_router(batch_router, prefix="/batch", tags=["batch"])
+    app.include_router(telegram_router, prefix="/telegram", tags=["telegram"])
+    app.include_router(profiling_router, prefix="/profiling", tags=["profiling"])
+    # Те же эндпоинты сетки в рамках когорты: /cohorts/{cohort_id}/grid/*
+    app.include_router(
+        grid_router,
+        prefix="/cohorts/{cohort_id}/grid",
+        tags=["cohorts"],
+        dependencies=[Depends(deps.bind_cohort)],
+    )
+
+    @app.on_event("startup")
+    async def startup_event():
+        if app.state.prepare:
+            prepare_database()
+        warm_up()
+        # Инвалидация тегов сбрасывает публичные ответы и в кэше прокси.
+        # Здесь, а не при сборке: бэкенд кэша открывает соединения, их нельзя делить между воркерами
+        app.state.purger = None
+        if settings.HTTP_PURGE_URL:
+            app.state.purger = Purger(settings.HTTP_PURGE_URL, settings.HTTP_PURGE_METHOD)
+            get_response_cache().invalidation_hooks.append(app.state.purger)
+        if app.state.run_scheduler:
+            app.state.scheduler = start_scheduler()
+        telegram_bot.updates.start()
+        coalescing.writes.start()
+        # Воркер виден в /profiling/workers, только если принимает сессии по SIGUSR2
+        profiling.register_worker(asyncio.get_running_loop())
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        if app.state.scheduler is not None:
+            app.state.scheduler.shutdown()
+            app.state.scheduler = None
+        # Отложенные отметки недель — в БД до выхода
+        coalescing.writes.stop()
+        await telegram_bot.updates.stop()
+        await telegram_bot.close_bot()
+        if app.state.purger is not None:
+            get_response_cache().invalidation_hooks.remove(app.state.purger)
+        profiling.unregister_worker()
+
+    @app.get("/")
+    async def root():
+        return {"message": "Welcome to Weeks Until Diploma API"}
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy"}
 
-@app.get("/")
-async def root():
-    return {"message": "Welcome to Weeks Until Diploma API"}
+    return app
 
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+# uvicorn app.main:app — один процесс, всё на старте; несколько воркеров — python -m app.server
+app = create_app()
@@ -1,6 +1,13 @@
 from app.database import Base
+from app.models.cohort import Cohort
 from app.models.user import User
 from app.models.week_progress import WeekProgress
 from app.models.special_period import SpecialPeriod
+from app.models.week_progress_archive import WeekProgressArchive
+from app.models.data_version import DataVersion
+from app.models.progress_change import ProgressChange
+from app.models.week_progress_event import WeekProgressEvent
+from app.models.week_progress_snapshot import WeekProgressSnapshot
 
-__all__ = ["Base", "User", "WeekProgress", "SpecialPeriod"]
+__all__ = ["Base", "Cohort", "User", "WeekProgress", "SpecialPeriod", "WeekProgressArchive", "DataVersion", "ProgressChange",
+           "WeekProgressEvent", "WeekProgressSnapshot"]
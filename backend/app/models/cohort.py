@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Date
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class Cohort(Base):
+    __tablename__ = "cohorts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    start_date = Column(Date, nullable=True)
+    deadline = Column(Date, nullable=True)
+
+    users = relationship("User", back_populates="cohort")
+    special_periods = relationship("SpecialPeriod", back_populates="cohort", cascade="all, delete-orphan")
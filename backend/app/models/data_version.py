@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, BigInteger
+from app.database import Base
+
+class DataVersion(Base):
+    """
+    Monotonic counters bumped right after the writes they describe commit,
+    by an upsert in a short transaction of its own (app.core.versioning);
+    caches key their entries by the current value.
+    """
+    __tablename__ = "data_versions"
+
+    key = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, func
+from app.database import Base
+
+class ProgressChange(Base):
+    """
+    Append-only log of changes visible in /grid/all-progress, read by
+    delta sync (?since=<seq>). Old entries are compacted away.
+    """
+    __tablename__ = "progress_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    # 'week' — отметка недели, 'user' — новый пользователь / смена эмоджи,
+    # 'reset' — изменение, которое клиент не может применить точечно
+    kind = Column(String, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    week_start_date = Column(Date, nullable=True)
+    is_completed = Column(Boolean, nullable=True)
+    note = Column(String, nullable=True)
+    emoji = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
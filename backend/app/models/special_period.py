@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -6,10 +6,17 @@ class SpecialPeriod(Base):
     __tablename__ = "special_periods"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     start_date = Column(Date, nullable=False)
     end_date = Column(Date, nullable=False)
     period_type = Column(String, nullable=False) # e.g., 'vacation', 'business_trip', 'other'
     description = Column(String, nullable=True)
+    # NULL — глобальный период админа, иначе период конкретной когорты
+    cohort_id = Column(Integer, ForeignKey("cohorts.id", name="fk_special_periods_cohort_id"), nullable=True)
 
     user = relationship("User", back_populates="special_periods")
+    cohort = relationship("Cohort", back_populates="special_periods")
+
+    __table_args__ = (
+        Index("ix_special_periods_cohort_start", cohort_id, start_date),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Boolean, BigInteger
+from sqlalchemy import Column, Integer, String, Date, Boolean, BigInteger, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -18,6 +18,35 @@ class User(Base):
     deadline = Column(Date, nullable=True)
     emoji = Column(String, default="🎓")
 
+    # Когорта (поток); NULL — глобальная когорта, настроенная админом
+    cohort_id = Column(Integer, ForeignKey("cohorts.id", name="fk_users_cohort_id"), nullable=True)
+
     # Relationships
     week_progressions = relationship("WeekProgress", back_populates="user", cascade="all, delete-orphan")
-    special_periods = relationship("SpecialPeriod", back_populates="user", cascade="all, delete-orphan")
\ No newline at end of file
+    special_periods = relationship("SpecialPeriod", back_populates="user", cascade="all, delete-orphan")
+    cohort = relationship("Cohort", back_populates="users")
+
+    __table_args__ = (
+        # Выборки в рамках когорты: WHERE cohort_id = ? AND is_active
+        Index("ix_users_cohort_active", cohort_id, is_active),
+        # get_admin_user: WHERE is_superuser = true LIMIT 1
+        Index(
+            "ix_users_superuser",
+            id,
+            postgresql_where=is_superuser == True,
+            sqlite_where=is_superuser == True,
+        ),
+        # Списки активных пользователей и проверка занятых эмоджи
+        Index(
+            "ix_users_active_emoji",
+            emoji,
+            postgresql_where=is_active == True,
+            sqlite_where=is_active == True,
+        ),
+        Index(
+            "ix_users_active",
+            id,
+            postgresql_where=is_active == True,
+            sqlite_where=is_active == True,
+        ),
+    )
\ No newline at end of file
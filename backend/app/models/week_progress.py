@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -11,4 +11,16 @@ class WeekProgress(Base):
     is_completed = Column(Boolean, default=False, nullable=False)
     note = Column(String, nullable=True)
 
-    user = relationship("User", back_populates="week_progressions")
\ No newline at end of file
+    user = relationship("User", back_populates="week_progressions")
+
+    __table_args__ = (
+        # Выборка недель пользователя и поиск конкретной недели (upsert, напоминания)
+        Index("ix_week_progress_user_week", user_id, week_start_date),
+        # Отмеченные недели: all-progress и подсчёт completed_weeks в stats
+        Index(
+            "ix_week_progress_user_completed",
+            user_id, week_start_date,
+            postgresql_where=is_completed == True,
+            sqlite_where=is_completed == True,
+        ),
+    )
\ No newline at end of file
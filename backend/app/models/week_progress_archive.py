@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Index, func
+from app.database import Base
+
+class WeekProgressArchive(Base):
+    """
+    Cold storage for week_progress rows of past academic periods and
+    inactive users. Rows are moved here by app.core.archive and are read-only.
+    """
+    __tablename__ = "week_progress_archive"
+
+    id = Column(Integer, primary_key=True)  # id из week_progress сохраняется
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    week_start_date = Column(Date, nullable=False)
+    is_completed = Column(Boolean, default=False, nullable=False)
+    note = Column(String, nullable=True)
+    archived_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_week_progress_archive_user_week", user_id, week_start_date),
+    )
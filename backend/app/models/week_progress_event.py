@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Boolean, Date, DateTime, Index
+from app.database import Base
+
+class WeekProgressEvent(Base):
+    """
+    Append-only history of week completion changes, one row per toggle.
+    Notes aren't kept. Together with WeekProgressSnapshot it answers
+    "what did the grid look like at time X".
+    """
+    __tablename__ = "week_progress_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Без внешнего ключа: история переживает удаление и архивацию строк
+    user_id = Column(Integer, nullable=False)
+    week_start_date = Column(Date, nullable=False)
+    is_completed = Column(Boolean, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_week_progress_events_changed_at", changed_at, id),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, DateTime, LargeBinary
+from app.database import Base
+
+class WeekProgressSnapshot(Base):
+    """
+    Completed weeks of every user as of ``taken_at``, compactly encoded
+    (see app.core.history). Point-in-time queries start from the nearest
+    snapshot and replay only the events after it.
+    """
+    __tablename__ = "week_progress_snapshots"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    taken_at = Column(DateTime, nullable=False, index=True)
+    completed_weeks = Column(Integer, nullable=False, default=0)
+    data = Column(LargeBinary, nullable=False)
@@ -2,10 +2,16 @@ from .user import UserCreate, UserOut, UserUpdate, Token, TelegramAuth
 from .week_progress import WeekProgressCreate, WeekProgressUpdate, WeekProgressOut
 from .special_period import SpecialPeriodCreate, SpecialPeriodUpdate, SpecialPeriodOut
 from .config import ConfigResponse
+from .cohort import CohortCreate, CohortUpdate, CohortOut
+from .batch import BatchRequest, BatchResponse
+from .profiling import ProfilingSessionCreate, ProfilingSessionOut, ProfilingWorkers
 
 __all__ = [
     "UserCreate", "UserOut", "UserUpdate", "Token", "TelegramAuth",
     "WeekProgressCreate", "WeekProgressUpdate", "WeekProgressOut",
     "SpecialPeriodCreate", "SpecialPeriodUpdate", "SpecialPeriodOut",
     "ConfigResponse",
+    "CohortCreate", "CohortUpdate", "CohortOut",
+    "BatchRequest", "BatchResponse",
+    "ProfilingSessionCreate", "ProfilingSessionOut", "ProfilingWorkers",
 ]
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+class BatchOperation(BaseModel):
+    op: str
+    params: Dict[str, Any] = {}
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., max_length=50)
+    # Выполнять grid.* в рамках когорты (как /cohorts/{cohort_id}/grid/*)
+    cohort_id: Optional[int] = None
+
+class BatchResult(BaseModel):
+    status: int
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult]
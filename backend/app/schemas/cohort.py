@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import Optional
+
+class CohortBase(BaseModel):
+    name: str
+    start_date: Optional[date] = None
+    deadline: Optional[date] = None
+
+class CohortCreate(CohortBase):
+    pass
+
+class CohortUpdate(BaseModel):
+    name: Optional[str] = None
+    start_date: Optional[date] = None
+    deadline: Optional[date] = None
+
+class CohortOut(CohortBase):
+    id: int
+
+    class Config:
+        from_attributes = True
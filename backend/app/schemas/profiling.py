@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+class ProfilingSessionCreate(BaseModel):
+    # requests — следующие count запросов по шаблону route; worker — все потоки воркера seconds секунд
+    kind: Literal["requests", "worker"] = "requests"
+    route: str = "*"
+    count: int = Field(10, ge=1, le=1000)
+    profiler: Literal["cprofile", "sample"] = "cprofile"
+    seconds: float = Field(10.0, gt=0, le=300)
+    interval_ms: int = Field(5, ge=1, le=1000)
+    # pid воркеров; не указаны — тот, что принял запрос
+    workers: Optional[List[int]] = None
+
+class ProfilingSessionOut(BaseModel):
+    id: str
+    kind: str
+    route: str
+    count: int
+    profiler: str
+    seconds: float
+    interval_ms: int
+    workers: List[int]
+    created_at: float
+    # Воркеры, закончившие сессию
+    done: List[int] = []
+    files: List[str] = []
+
+class ProfilingWorkers(BaseModel):
+    current: int
+    workers: List[int]
@@ -20,6 +20,7 @@ class SpecialPeriodUpdate(BaseModel):
 class SpecialPeriodOut(SpecialPeriodBase):
     id: int
     user_id: int
+    cohort_id: Optional[int] = None
 
     class Config:
         from_attributes = True
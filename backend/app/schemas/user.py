@@ -39,6 +39,8 @@ class UserUpdate(BaseModel):
 class UserOut(UserBase):
     id: int
     is_active: bool
+    # Назначает только админ: PUT /cohorts/{cohort_id}/members/{user_id}
+    cohort_id: Optional[int] = None
     telegram_id: Optional[int] = None
 
     class Config:
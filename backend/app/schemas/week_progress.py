@@ -2,6 +2,8 @@ from pydantic import BaseModel
 from datetime import date
 from typing import Optional, List
 
+from .special_period import SpecialPeriodOut
+
 class WeekProgressBase(BaseModel):
     week_start_date: date
     is_completed: bool = False
@@ -39,4 +41,121 @@ class WeekCompletionInfo(BaseModel):
 class UserWeekProgress(BaseModel):
     user_id: int
     emoji: str
-    completions: List[WeekCompletionInfo]
\ No newline at end of file
+    completions: List[WeekCompletionInfo]
+
+class WeekNote(BaseModel):
+    user_id: int
+    week_start_date: date
+    note: Optional[str] = None
+
+class WeekSlot(BaseModel):
+    index: int
+    week_start_date: date
+    monday: date
+    is_special: bool
+    period_id: Optional[int] = None
+    period_type: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class GridCalendar(BaseModel):
+    """Ordered week slots of the grid with special-period flags."""
+    start_date: Optional[date] = None
+    deadline: Optional[date] = None
+    total_weeks: int
+    special_weeks: int
+    effective_weeks: int
+    slots: List[WeekSlot]
+
+class BurndownPoint(BaseModel):
+    index: int
+    week_start_date: date
+    completed: int
+    remaining: int
+    ideal: float
+
+class Burndown(BaseModel):
+    start_date: Optional[date] = None
+    deadline: Optional[date] = None
+    members: int
+    effective_weeks: int
+    points: List[BurndownPoint]
+
+class WeekRate(BaseModel):
+    index: int
+    week_start_date: date
+    # Доля участников, отметивших неделю, и её скользящее среднее за window рабочих недель
+    rate: float
+    rolling_rate: float
+
+class UserAnalytics(BaseModel):
+    user_id: int
+    emoji: str
+    completed_weeks: int
+    current_streak: int
+    longest_streak: int
+    # Рабочих недель в неделю по линейному тренду
+    pace: float
+    projected_finish: Optional[date] = None
+    on_track: bool
+
+class CohortForecast(BaseModel):
+    completed_weeks: float
+    mean_current_streak: float
+    pace: float
+    projected_finish: Optional[date] = None
+    on_track: bool
+
+class GridAnalytics(BaseModel):
+    """Streaks, weekly completion rates and finish forecasts of the scope's members."""
+    start_date: Optional[date] = None
+    deadline: Optional[date] = None
+    members: int
+    effective_weeks: int
+    elapsed_weeks: int
+    window: int
+    weeks: List[WeekRate]
+    users: List[UserAnalytics]
+    cohort: CohortForecast
+
+class WeekHistoryEntry(BaseModel):
+    week_start_date: date
+    is_completed: bool
+    note: Optional[str] = None
+    archived: bool = False
+
+
+class GridDashboard(BaseModel):
+    """Everything the grid page needs, in one response."""
+    data_version: int
+    config: GridConfig
+    all_progress: List[UserWeekProgress]
+    weeks: List[WeekProgressOut]
+    stats: GridStats
+    special_periods: List[SpecialPeriodOut]
+    calendar: GridCalendar
+
+
+class ProgressChangeOut(BaseModel):
+    seq: int
+    kind: str
+    user_id: Optional[int] = None
+    week_start_date: Optional[date] = None
+    is_completed: Optional[bool] = None
+    note: Optional[str] = None
+    emoji: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ProgressDelta(BaseModel):
+    """
+    Answer to /grid/all-progress?since=<cursor>: either the changes after the
+    cursor, or (full=True) a complete snapshot when the cursor is too old.
+    """
+    cursor: int
+    full: bool
+    progress: Optional[List[UserWeekProgress]] = None
+    changes: List[ProgressChangeOut] = []
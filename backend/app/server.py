@@ -0,0 +1,143 @@
+"""
+Preforking production runner.
+
+    python -m app.server --workers 2 --host 0.0.0.0 --port 8000
+
+The master process imports the application and runs the one-time tasks
+exactly once: schema migration/creation and the admin bootstrap. It then
+binds the socket and forks the workers. Workers share the preloaded code
+copy-on-write and inherit the listening socket. Each worker opens its own
+connections and warms its caches (data version, global scope, calendar) in
+startup, before uvicorn starts accepting on the socket. The periodic jobs
+run in worker 0 only. A worker that dies is forked again. SIGTERM/SIGINT
+stop the workers gracefully and then the master.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.server")
+
+# Воркер, упавший быстрее этого (с), перезапускаем с паузой — не крутим fork в цикле
+RESPAWN_BACKOFF = 1.0
+
+
+def bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def dispose_pools() -> None:
+    """Close the master's pooled connections: a forked worker must not share them."""
+    from app.database import engine, replica_router
+    engine.dispose()
+    for replica in replica_router.replicas:
+        replica.engine.dispose()
+
+
+def serve(app, sock: socket.socket, index: int, args) -> None:
+    """Worker body: runs in the forked child and never returns."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    app.state.run_scheduler = index == 0
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    code = 0
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException:
+        logger.exception("worker %d crashed", index)
+        code = 1
+    finally:
+        # Мимо atexit и финализаторов, унаследованных от мастера
+        os._exit(code)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with preforked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="seconds to finish requests on shutdown")
+    parser.add_argument("--forwarded-allow-ips", default="127.0.0.1")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(name)s: %(message)s")
+
+    # Весь код приложения загружен до fork — воркеры делят его страницы
+    from app.main import create_app, prepare_database
+
+    prepare_database()
+    app = create_app(prepare=False, scheduler=False)
+    dispose_pools()
+    sock = bind(args.host, args.port)
+    # Объекты мастера не трогает сборщик мусора воркеров — страницы не копируются при записи
+    gc.freeze()
+
+    workers: Dict[int, int] = {}
+    started: Dict[int, float] = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            serve(app, sock, index, args)
+        workers[pid] = index
+        started[index] = time.monotonic()
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(args.workers):
+        spawn(index)
+    logger.info("listening on %s:%d with %d workers", args.host, args.port, args.workers)
+    if settings.WEEK_WRITE_WINDOW > 0 and args.workers > 1:
+        logger.warning("WEEK_WRITE_WINDOW > 0 with %d workers: a toggle is not seen by other workers "
+                       "until it is written", args.workers)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = workers.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning("worker %d (pid %d) exited with status %d, restarting", index, pid, os.waitstatus_to_exitcode(status))
+        if time.monotonic() - started[index] < RESPAWN_BACKOFF:
+            time.sleep(RESPAWN_BACKOFF)
+        if not stopping:
+            spawn(index)
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
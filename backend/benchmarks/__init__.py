@@ -0,0 +1,8 @@
+"""
+Benchmark suite for the backend hot paths.
+
+- ``benchmarks.seed``     — synthetic cohort generator (users × weeks + special periods)
+- ``benchmarks.micro``    — in-process microbenchmarks of the grid/auth handlers
+- ``benchmarks.load``     — HTTP load driver (throughput, p50/p95/p99)
+- ``benchmarks.compare``  — regression check against ``baselines.json``
+"""
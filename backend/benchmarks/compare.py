@@ -0,0 +1,97 @@
+"""
+Regression check against stored baselines.
+
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.compare micro.json            # exit code 1 on regression
+    python -m benchmarks.compare micro.json --update   # accept current numbers
+
+Baselines live in ``baselines.json`` keyed by ``<kind>/<database>``
+(``micro/sqlite``, ``load/postgresql``, ...); each benchmark stores the
+metrics to guard and the allowed slowdown in percent. Results without a
+baseline for their database fail the check instead of passing unchecked.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+GUARDED_METRICS = ("p50_ms", "p95_ms")
+
+
+def load_baselines(path: str = BASELINES_PATH) -> dict:
+    if not os.path.exists(path):
+        return {"default_threshold_pct": 25, "suites": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def suite_key(payload: dict) -> str:
+    return f"{payload['kind']}/{payload['database']}"
+
+
+def compare(payload: dict, baselines: dict) -> List[str]:
+    """Return a list of human-readable regressions (empty when all is fine)."""
+    suite = baselines.get("suites", {}).get(suite_key(payload), {})
+    default_threshold = baselines.get("default_threshold_pct", 25)
+    regressions = []
+    for name, current in payload["results"].items():
+        baseline = suite.get(name)
+        if not baseline:
+            continue
+        threshold = baseline.get("threshold_pct", default_threshold)
+        for metric in GUARDED_METRICS:
+            if metric not in baseline or metric not in current:
+                continue
+            limit = baseline[metric] * (1 + threshold / 100)
+            if current[metric] > limit:
+                regressions.append(
+                    f"{name}.{metric}: {current[metric]:.3f} > {limit:.3f} "
+                    f"(baseline {baseline[metric]:.3f} +{threshold}%)"
+                )
+    return regressions
+
+
+def update(payload: dict, baselines: dict) -> dict:
+    suites = baselines.setdefault("suites", {})
+    suite = suites.setdefault(suite_key(payload), {})
+    for name, current in payload["results"].items():
+        entry: Dict[str, float] = {m: current[m] for m in GUARDED_METRICS if m in current}
+        if "threshold_pct" in suite.get(name, {}):
+            entry["threshold_pct"] = suite[name]["threshold_pct"]
+        suite[name] = entry
+    return baselines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare benchmark results with baselines")
+    parser.add_argument("results", help="JSON produced by benchmarks.micro or benchmarks.load")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--update", action="store_true", help="store current results as the new baseline")
+    args = parser.parse_args(argv)
+
+    with open(args.results) as f:
+        payload = json.load(f)
+    baselines = load_baselines(args.baselines)
+
+    if args.update:
+        with open(args.baselines, "w") as f:
+            json.dump(update(payload, baselines), f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Baseline {suite_key(payload)} updated")
+        return 0
+
+    if suite_key(payload) not in baselines.get("suites", {}):
+        print(f"{suite_key(payload)}: no baseline, record one with --update")
+        return 1
+    regressions = compare(payload, baselines)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"{suite_key(payload)}: no regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+In-process microbenchmarks of the hot handlers.
+
+Handlers are called directly (no HTTP, no JSON), so the numbers isolate the
+query and Python work done by each endpoint.
+
+    python -m benchmarks.micro --database-url sqlite:///./bench.db --users 200 --weeks 104
+    python -m benchmarks.micro --output results.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List
+
+from fastapi.security import OAuth2PasswordRequestForm
+from starlette.requests import Request
+
+from app import schemas
+from app.api import auth, grid
+from app.core.cache import clear_all_caches
+from app.core.cohorts import resolve_scope
+from app.core.config import settings
+from app.models import User
+from benchmarks.seed import BENCH_EMAIL, BENCH_PASSWORD, make_session, seed
+from benchmarks.stats import summarize
+
+
+def measure(fn: Callable[[], object], runs: int, warmup: int = 2) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def run(db, runs: int = 50, auth_runs: int = 10) -> Dict[str, dict]:
+    admin = db.query(User).filter(User.email == BENCH_EMAIL.format(0)).first()
+    target = db.query(User).filter(User.email == BENCH_EMAIL.format(1)).first() or admin
+    scope = resolve_scope(db)
+    # Меряем сами операции: без лимитов и без попаданий в кэш ответов
+    settings.RATE_LIMIT_ENABLED = False
+    request = Request({"type": "http", "headers": [], "client": ("127.0.0.1", 0)})
+
+    def all_progress():
+        clear_all_caches()
+        grid.get_all_progress(response=None, since=None, fields=None, as_of=None, db=db, scope=scope, current_user=admin)
+        db.rollback()
+
+    def user_stats():
+        clear_all_caches()
+        grid.get_user_stats(user_id=target.id, db=db, scope=scope, current_user=admin)
+        db.rollback()
+
+    def login():
+        form = OAuth2PasswordRequestForm(username=admin.email, password=BENCH_PASSWORD)
+        # Обработчики входа и регистрации асинхронные: Argon2 идёт в пуле потоков
+        asyncio.run(auth.login_access_token(request=request, db=db, form_data=form))
+        db.rollback()
+
+    counter = iter(range(10 ** 9))
+
+    def register():
+        user_in = schemas.user.UserCreate(
+            email=f"micro-register-{next(counter)}-{time.time_ns()}@example.com",
+            password=BENCH_PASSWORD,
+        )
+        asyncio.run(auth.register_user(request=request, db=db, user_in=user_in))
+
+    return {
+        "get_all_progress": summarize(measure(all_progress, runs)),
+        "get_user_stats": summarize(measure(user_stats, runs)),
+        "login": summarize(measure(login, auth_runs)),
+        "register": summarize(measure(register, auth_runs)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks of grid/auth handlers")
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--density", type=float, default=0.6)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--auth-runs", type=int, default=10)
+    parser.add_argument("--no-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    db = make_session(args.database_url, reset=not args.no_seed)
+    try:
+        if not args.no_seed:
+            seed(db, users=args.users, weeks=args.weeks, density=args.density)
+        results = run(db, runs=args.runs, auth_runs=args.auth_runs)
+    finally:
+        db.close()
+
+    payload = {
+        "kind": "micro",
+        "database": args.database_url.split(":", 1)[0],
+        "users": args.users,
+        "weeks": args.weeks,
+        "results": results,
+    }
+    text = json.dumps(payload, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
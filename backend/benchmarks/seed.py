@@ -0,0 +1,164 @@
+"""
+Synthetic cohort generator.
+
+Creates N users × M weeks of WeekProgress plus global SpecialPeriods owned by
+the admin (first user). Deterministic for a given ``--seed``.
+
+    python -m benchmarks.seed --database-url sqlite:///./bench.db --users 200 --weeks 104
+"""
+import argparse
+import random
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import security
+from app.models import Base, User, WeekProgress, SpecialPeriod
+
+BENCH_PASSWORD = "benchpassword"
+BENCH_EMAIL = "bench{}@example.com"
+
+PERIOD_TYPES = ["vacation", "business_trip", "other"]
+
+
+def monday(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def seed(
+    db: Session,
+    users: int = 100,
+    weeks: int = 52,
+    density: float = 0.6,
+    periods: int = 4,
+    start_date: Optional[date] = None,
+    random_seed: int = 42,
+    batch_size: int = 5000,
+) -> dict:
+    """
+    Fill the database with a synthetic cohort.
+
+    ``density`` is the probability that a given week is completed; rows are
+    only written for weeks the user touched (completed or not), which mirrors
+    how ``update_or_create_week`` fills the table in production.
+    """
+    rng = random.Random(random_seed)
+    start = monday(start_date or date.today() - timedelta(weeks=weeks // 2))
+    deadline = start + timedelta(weeks=weeks - 1)
+
+    # Хэш считаем один раз — Argon2 слишком дорогой, чтобы платить его N раз
+    hashed_password = security.get_password_hash(BENCH_PASSWORD)
+
+    user_rows = [
+        {
+            "email": BENCH_EMAIL.format(i),
+            "hashed_password": hashed_password,
+            "full_name": f"Bench User {i}",
+            "is_active": True,
+            "is_superuser": i == 0,
+            "start_date": start,
+            "deadline": deadline,
+            "emoji": f"🎓{i}",
+        }
+        for i in range(users)
+    ]
+    db.execute(insert(User), user_rows)
+    db.flush()
+
+    user_ids = [
+        row[0] for row in
+        db.query(User.id).filter(User.email.like("bench%@example.com")).order_by(User.id).all()
+    ]
+    admin_id = user_ids[0]
+
+    progress_rows = []
+    progress_count = 0
+    for user_id in user_ids:
+        for w in range(weeks):
+            roll = rng.random()
+            if roll < density:
+                completed = True
+            elif roll < density + (1 - density) / 4:
+                # Иногда пользователь снимает отметку — строка есть, но не выполнена
+                completed = False
+            else:
+                continue
+            progress_rows.append({
+                "user_id": user_id,
+                "week_start_date": start + timedelta(weeks=w),
+                "is_completed": completed,
+                "note": f"note {w}" if completed and rng.random() < 0.3 else None,
+            })
+            if len(progress_rows) >= batch_size:
+                db.execute(insert(WeekProgress), progress_rows)
+                progress_count += len(progress_rows)
+                progress_rows = []
+    if progress_rows:
+        db.execute(insert(WeekProgress), progress_rows)
+        progress_count += len(progress_rows)
+
+    period_rows = []
+    for _ in range(periods):
+        offset = rng.randrange(0, max(1, weeks - 2))
+        length = rng.randint(7, 21)
+        period_start = start + timedelta(weeks=offset)
+        period_rows.append({
+            "user_id": admin_id,
+            "start_date": period_start,
+            "end_date": period_start + timedelta(days=length - 1),
+            "period_type": rng.choice(PERIOD_TYPES),
+            "description": None,
+        })
+    if period_rows:
+        db.execute(insert(SpecialPeriod), period_rows)
+
+    db.commit()
+    return {
+        "users": len(user_ids),
+        "week_progress": progress_count,
+        "special_periods": len(period_rows),
+        "admin_id": admin_id,
+        "start_date": start,
+        "deadline": deadline,
+    }
+
+
+def make_session(database_url: str, reset: bool = False) -> Session:
+    connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args)
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic cohort")
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--density", type=float, default=0.6)
+    parser.add_argument("--periods", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    args = parser.parse_args(argv)
+
+    db = make_session(args.database_url, reset=args.reset)
+    try:
+        summary = seed(
+            db,
+            users=args.users,
+            weeks=args.weeks,
+            density=args.density,
+            periods=args.periods,
+            random_seed=args.seed,
+        )
+    finally:
+        db.close()
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
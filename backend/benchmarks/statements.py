@@ -0,0 +1,126 @@
+"""
+CPU cost of the hot-path queries: per-call ``db.query(...)`` construction
+(the code before ``app.core.repository``) against the prebuilt statements,
+and a ``lambda_stmt`` variant for reference.
+
+Each query runs ``--calls`` times per sample on a warm session; the report
+gives wall and process CPU time per call and the CPU saved on a typical
+authenticated grid read (user lookup, data version, scope, completed weeks).
+
+    python -m benchmarks.statements --database-url sqlite:///./bench.db --users 200 --weeks 104
+    python -m benchmarks.statements --no-seed --output statements.json
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict
+
+from sqlalchemy import func, lambda_stmt, select
+
+from app.core import repository
+from app.models import DataVersion, User, WeekProgress
+from benchmarks.seed import BENCH_EMAIL, make_session, seed
+from benchmarks.stats import summarize
+
+
+def sample(fn: Callable[[], object], calls: int, samples: int) -> Dict[str, float]:
+    for _ in range(calls):
+        fn()
+    wall_ms, cpu_total = [], 0.0
+    for _ in range(samples):
+        t0, c0 = time.perf_counter(), time.process_time()
+        for _ in range(calls):
+            fn()
+        cpu_total += time.process_time() - c0
+        wall_ms.append((time.perf_counter() - t0) * 1000 / calls)
+    summary = summarize(wall_ms)
+    summary["cpu_us_per_call"] = round(cpu_total / (calls * samples) * 1e6, 2)
+    return summary
+
+
+def run(db, calls: int = 200, samples: int = 20) -> Dict[str, dict]:
+    email = BENCH_EMAIL.format(1)
+    user = db.query(User).filter(User.email == email).first()
+    user_id = user.id
+
+    # Как было до репозитория
+    legacy = {
+        "user_by_email": lambda: db.query(User).filter(User.email == email).first(),
+        "admin_user": lambda: db.query(User).filter(User.is_superuser == True).first(),
+        "data_version": lambda: db.scalar(select(DataVersion.version).where(DataVersion.key == "grid")),
+        "completed_weeks": lambda: db.query(WeekProgress).filter(
+            WeekProgress.user_id == user_id, WeekProgress.is_completed == True
+        ).count(),
+        "week_rows": lambda: db.query(WeekProgress).filter(WeekProgress.user_id == user_id).all(),
+    }
+    prebuilt = {
+        "user_by_email": lambda: repository.user_by_email(db, email),
+        "admin_user": lambda: repository.admin_scope_row(db),
+        "data_version": lambda: repository.data_version(db, "grid"),
+        "completed_weeks": lambda: repository.completed_weeks(db, user_id),
+        "week_rows": lambda: repository.week_rows(db, user_id),
+    }
+    lambdas = {
+        "user_by_email": lambda: db.scalars(
+            lambda_stmt(lambda: select(User).where(User.email == email).limit(1))
+        ).first(),
+        "completed_weeks": lambda: db.execute(lambda_stmt(
+            lambda: select(func.count()).select_from(WeekProgress)
+            .where(WeekProgress.user_id == user_id, WeekProgress.is_completed == True)
+        )).scalar_one(),
+    }
+
+    results = {}
+    for variant, queries in (("query", legacy), ("prebuilt", prebuilt), ("lambda_stmt", lambdas)):
+        for name, fn in queries.items():
+            results[f"{name}.{variant}"] = sample(fn, calls, samples)
+            # Без identity map с прошлых вызовов — как в новом запросе
+            db.expunge_all()
+
+    request_queries = ("user_by_email", "data_version", "admin_user", "completed_weeks")
+    before = sum(results[f"{q}.query"]["cpu_us_per_call"] for q in request_queries)
+    after = sum(results[f"{q}.prebuilt"]["cpu_us_per_call"] for q in request_queries)
+    results["grid_read_request"] = {
+        "cpu_us_before": round(before, 2),
+        "cpu_us_after": round(after, 2),
+        "cpu_us_saved": round(before - after, 2),
+    }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prebuilt statements vs per-call query construction")
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--density", type=float, default=0.6)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--no-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    db = make_session(args.database_url, reset=not args.no_seed)
+    try:
+        if not args.no_seed:
+            seed(db, users=args.users, weeks=args.weeks, density=args.density)
+        results = run(db, calls=args.calls, samples=args.samples)
+    finally:
+        db.close()
+
+    payload = {
+        "kind": "statements",
+        "database": args.database_url.split(":", 1)[0],
+        "users": args.users,
+        "weeks": args.weeks,
+        "results": results,
+    }
+    text = json.dumps(payload, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Latency summaries shared by the micro and load benchmarks."""
+import math
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples_ms: List[float], elapsed_s: float = None) -> Dict[str, float]:
+    values = sorted(samples_ms)
+    summary = {
+        "runs": len(values),
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+    }
+    if elapsed_s:
+        summary["throughput_rps"] = round(len(values) / elapsed_s, 2)
+    return summary
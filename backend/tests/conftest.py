@@ -1,3 +1,9 @@
+import fnmatch
+import math
+import socketserver
+import threading
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -6,6 +12,10 @@ from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.database import Base, get_db
+from app.core import coalescing, timeouts
+from app.core.cache import clear_all_caches
+from app.core.cohorts import invalidate_scope
+from app.core.ratelimit import TOKEN_BUCKET_LUA, reset_rate_limits
 
 # Use in-memory SQLite for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -15,8 +25,13 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+# Бюджеты запросов — как у движков database.make_engine
+timeouts.configure(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Отметки недель пишутся сразу; отложенную запись проверяет test_coalescing.py
+coalescing.writes.window = 0
+
 
 @pytest.fixture(scope="function")
 def db():
@@ -38,6 +53,134 @@ def client(db):
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    # Кэш областей видимости переживает пересоздание таблиц между тестами
+    invalidate_scope()
+    clear_all_caches()
+    reset_rate_limits()
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+
+class FakeRedis:
+    """
+    Just enough of a Redis server for the cache and the rate limits:
+    GET/MGET/SET PX/INCR/DEL/SCAN/PING, HMGET/HSET/PEXPIRE and EVAL of the
+    token bucket script (run as its Python port through the same commands).
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _get(self, key):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def command(self, args):
+        name = args[0].decode().upper()
+        with self.lock:
+            if name == "PING":
+                return "+PONG"
+            if name == "GET":
+                return self._get(args[1])
+            if name == "MGET":
+                return [self._get(k) for k in args[1:]]
+            if name == "SET":
+                expires = None
+                if len(args) == 5 and args[3].upper() == b"PX":
+                    expires = time.monotonic() + int(args[4]) / 1000
+                self.data[args[1]] = (args[2], expires)
+                return "+OK"
+            if name == "INCR":
+                value = int(self._get(args[1]) or 0) + 1
+                self.data[args[1]] = (str(value).encode(), None)
+                return value
+            if name == "DEL":
+                return sum(1 for k in args[1:] if self.data.pop(k, None) is not None)
+            if name == "HMGET":
+                fields = self._get(args[1]) or {}
+                return [fields.get(f) for f in args[2:]]
+            if name == "HSET":
+                fields = self._get(args[1]) or {}
+                fields.update(zip(args[2::2], args[3::2]))
+                self.data[args[1]] = (fields, self.data.get(args[1], (None, None))[1])
+                return len(args[2:]) // 2
+            if name == "PEXPIRE":
+                if self._get(args[1]) is None:
+                    return 0
+                self.data[args[1]] = (self.data[args[1]][0], time.monotonic() + int(args[2]) / 1000)
+                return 1
+            if name == "SCAN":
+                pattern = args[args.index(b"MATCH") + 1].decode()
+                keys = [k for k in self.data if fnmatch.fnmatchcase(k.decode(), pattern)]
+                return [b"0", keys]
+        if name == "EVAL":
+            if args[1].decode() != TOKEN_BUCKET_LUA:
+                return "-ERR unknown script"
+            return self.token_bucket(args[3], *(float(a) for a in args[4:8]))
+        return "-ERR unknown command"
+
+    def token_bucket(self, key, rate, burst, cost, now):
+        """TOKEN_BUCKET_LUA line by line; numbers cross redis.call as Lua formats them (%.14g)."""
+        def call(*args):
+            return self.command([a if isinstance(a, bytes) else (a if isinstance(a, str) else f"{a:.14g}").encode()
+                                 for a in args])
+
+        state = call("HMGET", key, "tokens", "updated")
+        tokens = float(state[0]) if state[0] is not None else burst
+        updated = float(state[1]) if state[1] is not None else now
+        tokens = min(burst, tokens + max(0, now - updated) * rate)
+        allowed, retry = 0, 0
+        if tokens >= cost:
+            tokens -= cost
+            allowed = 1
+        else:
+            retry = math.ceil((cost - tokens) / rate * 1000)
+        call("HSET", key, "tokens", tokens, "updated", now)
+        call("PEXPIRE", key, math.ceil(burst / rate * 1000))
+        # Числа Lua в ответе Redis — целые
+        return [int(allowed), int(retry)]
+
+
+def encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return reply.encode() + b"\r\n"
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode(r) for r in reply)
+
+
+@pytest.fixture
+def fake_redis():
+    store = FakeRedis()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int(self.rfile.readline()[1:-2])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                self.wfile.write(encode(store.command(args)))
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
@@ -28,6 +28,18 @@ def test_auth_flow(client):
     assert response.status_code == 200
     assert response.json()["email"] == register_data["email"]
 
+def test_register_race_on_same_email_is_400(client, monkeypatch):
+    from app.api import auth
+
+    client.post("/auth/register", json={"email": "race@example.com", "password": "password"})
+    # Вторая регистрация прошла проверку дубликата до того, как первая вставила строку
+    monkeypatch.setattr(auth, "check_registration", lambda request, db, user_in: db.rollback())
+    response = client.post("/auth/register", json={"email": "race@example.com", "password": "password"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Пользователь с таким email уже существует"
+    assert client.post("/auth/register", json={"email": "race2@example.com", "password": "password"}).status_code == 200
+
+
 def test_user_update(client):
     # Register and login
     register_data = {"email": "update@example.com", "password": "password"}
@@ -105,3 +117,499 @@ def test_special_periods(client):
     response = client.get("/grid/special-periods", headers=headers)
     assert response.status_code == 200
     assert len(response.json()) == 0
+
+def test_export_progress(client):
+    # Первый зарегистрированный — админ
+    client.post("/auth/register", json={"email": "admin@example.com", "password": "password"})
+    client.post("/auth/register", json={"email": "student@example.com", "password": "password"})
+    admin_token = client.post("/auth/login", data={"username": "admin@example.com", "password": "password"}).json()["access_token"]
+    student_token = client.post("/auth/login", data={"username": "student@example.com", "password": "password"}).json()["access_token"]
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    student_headers = {"Authorization": f"Bearer {student_token}"}
+
+    week_start = date.today() - timedelta(days=date.today().weekday())
+    client.post("/grid/weeks", json={"week_start_date": str(week_start), "is_completed": True, "note": "done, finally"}, headers=student_headers)
+
+    response = client.get("/grid/export?format=csv", headers=student_headers)
+    assert response.status_code == 403
+
+    response = client.get("/grid/export?format=csv", headers=admin_headers)
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("user_id,email,full_name")
+    # Админ без недель (1 строка) + студент с одной неделей (1 строка)
+    assert len(lines) == 3
+    assert '"done, finally"' in response.text
+
+    response = client.get("/grid/export?format=xml", headers=admin_headers)
+    assert response.status_code == 422
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    import io
+    response = client.get("/grid/export?format=parquet", headers=admin_headers)
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 2
+    assert table.column("completed_weeks").to_pylist() == [0, 1]
+
+def test_archive_and_history(client, db):
+    from app import models
+    from app.core.archive import archive_criteria, archive_week_progress
+
+    client.post("/auth/register", json={"email": "archive@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "archive@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user = db.query(models.User).filter(models.User.email == "archive@example.com").first()
+
+    week_start = date.today() - timedelta(days=date.today().weekday())
+    old_week = week_start - timedelta(weeks=60)
+    db.add(models.WeekProgress(user_id=user.id, week_start_date=old_week, is_completed=True, note="old"))
+    db.commit()
+    client.post("/grid/weeks", json={"week_start_date": str(week_start), "is_completed": True}, headers=headers)
+
+    moved = archive_week_progress(db, archive_criteria(before=week_start - timedelta(weeks=52)))
+    assert moved == 1
+
+    # Горячая таблица содержит только текущую неделю
+    weeks = client.get(f"/grid/weeks/{user.id}", headers=headers).json()
+    assert [w["week_start_date"] for w in weeks] == [str(week_start)]
+
+    history = client.get(f"/grid/history/{user.id}", headers=headers).json()
+    assert [(h["week_start_date"], h["archived"]) for h in history] == [
+        (str(old_week), True),
+        (str(week_start), False),
+    ]
+
+def test_cohort_scoped_grid(client):
+    client.post("/auth/register", json={"email": "admin@example.com", "password": "password"})
+    admin_token = client.post("/auth/login", data={"username": "admin@example.com", "password": "password"}).json()["access_token"]
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+
+    start = date.today() - timedelta(days=date.today().weekday())
+    response = client.post("/cohorts/", json={
+        "name": "ИВТ-2026",
+        "start_date": str(start),
+        "deadline": str(start + timedelta(weeks=9)),
+    }, headers=admin_headers)
+    assert response.status_code == 200
+    cohort_id = response.json()["id"]
+
+    # Когорту при регистрации не выбрать — поле игнорируется, назначает админ
+    member_id = client.post(
+        "/auth/register", json={"email": "member@example.com", "password": "password", "cohort_id": cohort_id},
+    ).json()["id"]
+    client.post("/auth/register", json={"email": "outsider@example.com", "password": "password"})
+    member_token = client.post("/auth/login", data={"username": "member@example.com", "password": "password"}).json()["access_token"]
+    outsider_token = client.post("/auth/login", data={"username": "outsider@example.com", "password": "password"}).json()["access_token"]
+    member_headers = {"Authorization": f"Bearer {member_token}"}
+    outsider_headers = {"Authorization": f"Bearer {outsider_token}"}
+    assert client.get("/auth/me", headers=member_headers).json()["cohort_id"] is None
+    client.put("/users/me", json={"cohort_id": cohort_id}, headers=member_headers)
+    assert client.get("/auth/me", headers=member_headers).json()["cohort_id"] is None
+    assert client.put(f"/cohorts/{cohort_id}/members/{member_id}", headers=member_headers).status_code == 403
+    assert client.put(f"/cohorts/{cohort_id}/members/{member_id}", headers=admin_headers).json()["cohort_id"] == cohort_id
+
+    base = f"/cohorts/{cohort_id}/grid"
+    config = client.get(f"{base}/config", headers=member_headers).json()
+    assert config == {"start_date": str(start), "deadline": str(start + timedelta(weeks=9))}
+
+    # Периоды когорты не смешиваются с глобальными
+    client.post(f"{base}/special-periods", json={
+        "start_date": str(start), "end_date": str(start + timedelta(days=6)), "period_type": "vacation",
+    }, headers=admin_headers)
+    assert len(client.get(f"{base}/special-periods", headers=member_headers).json()) == 1
+    assert client.get("/grid/special-periods", headers=member_headers).json() == []
+
+    client.post(f"{base}/weeks", json={"week_start_date": str(start), "is_completed": True}, headers=member_headers)
+    progress = client.get(f"{base}/all-progress", headers=member_headers).json()
+    assert len(progress) == 1
+    assert progress[0]["user_id"] == member_id
+    assert len(progress[0]["completions"]) == 1
+    # Глобальная область — только пользователи вне когорт
+    assert member_id not in [p["user_id"] for p in client.get("/grid/all-progress", headers=admin_headers).json()]
+    assert client.get(f"/grid/stats/{member_id}", headers=admin_headers).status_code == 404
+    assert client.post("/grid/weeks", json={"week_start_date": str(start), "is_completed": True}, headers=member_headers).status_code == 403
+
+    stats = client.get(f"{base}/stats/{member_id}", headers=member_headers).json()
+    assert stats["total_weeks"] == 10
+    assert stats["special_weeks"] == 1
+    assert stats["completed_weeks"] == 1
+
+    assert client.get(f"{base}/config", headers=outsider_headers).status_code == 403
+    assert client.get("/cohorts/999/grid/config", headers=admin_headers).status_code == 404
+
+def test_scope_change_from_another_worker_is_seen(client, db):
+    from app.core.versioning import bump_data_version
+    from app.models import Cohort
+
+    client.post("/auth/register", json={"email": "admin@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "admin@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    start = date.today() - timedelta(days=date.today().weekday())
+    cohort_id = client.post("/cohorts/", json={
+        "name": "ИВТ-2027", "start_date": str(start), "deadline": str(start + timedelta(weeks=9)),
+    }, headers=headers).json()["id"]
+    assert client.get(f"/cohorts/{cohort_id}/grid/config", headers=headers).json()["deadline"] == str(start + timedelta(weeks=9))
+
+    # Даты поменял другой воркер: версия данных выросла, область в этом процессе не сброшена
+    db.get(Cohort, cohort_id).deadline = start + timedelta(weeks=12)
+    bump_data_version(db)
+    db.commit()
+    assert client.get(f"/cohorts/{cohort_id}/grid/config", headers=headers).json()["deadline"] == str(start + timedelta(weeks=12))
+
+
+def test_dashboard_matches_individual_endpoints(client):
+    client.post("/auth/register", json={"email": "dash@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "dash@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    week_start = date.today() - timedelta(days=date.today().weekday())
+    client.put("/users/me", json={"start_date": str(week_start), "deadline": str(week_start + timedelta(weeks=4))}, headers=headers)
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+
+    first = client.get("/grid/dashboard", headers=headers).json()
+    assert first["all_progress"][0]["completions"] == []
+
+    client.post("/grid/weeks", json={"week_start_date": str(week_start), "is_completed": True, "note": "ok"}, headers=headers)
+    dashboard = client.get("/grid/dashboard", headers=headers).json()
+    assert dashboard["data_version"] > first["data_version"]
+    assert dashboard["config"] == client.get("/grid/config", headers=headers).json()
+    assert dashboard["all_progress"] == client.get("/grid/all-progress", headers=headers).json()
+    assert dashboard["weeks"] == client.get(f"/grid/weeks/{user_id}", headers=headers).json()
+    assert dashboard["stats"] == client.get(f"/grid/stats/{user_id}", headers=headers).json()
+    assert dashboard["special_periods"] == client.get("/grid/special-periods", headers=headers).json()
+    assert dashboard["stats"]["completed_weeks"] == 1
+
+def test_all_progress_delta_sync(client, db):
+    from app.core.changelog import DELTA_OVERLAP, compact_change_log
+
+    client.post("/auth/register", json={"email": "delta@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "delta@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    week_start = date.today() - timedelta(days=date.today().weekday())
+
+    full = client.get("/grid/all-progress?since=0", headers=headers).json()
+    assert full["full"] is True
+    assert len(full["progress"]) == 1
+    cursor = full["cursor"]
+
+    client.post("/grid/weeks", json={"week_start_date": str(week_start), "is_completed": True, "note": "n"}, headers=headers)
+    delta = client.get(f"/grid/all-progress?since={cursor}", headers=headers).json()
+    assert delta["full"] is False
+    week_changes = [c for c in delta["changes"] if c["kind"] == "week"]
+    assert week_changes[-1]["week_start_date"] == str(week_start)
+    assert week_changes[-1]["is_completed"] is True
+    assert delta["cursor"] > cursor
+
+    # Без параметра — прежний формат
+    assert isinstance(client.get("/grid/all-progress", headers=headers).json(), list)
+
+    # После компакции старый курсор обслуживается полным снимком
+    for _ in range(DELTA_OVERLAP + 5):
+        client.post("/grid/weeks", json={"week_start_date": str(week_start), "is_completed": True}, headers=headers)
+    compact_change_log(db, keep=1)
+    stale = client.get(f"/grid/all-progress?since={delta['cursor']}", headers=headers).json()
+    assert stale["full"] is True
+
+def test_batch_reads(client):
+    client.post("/auth/register", json={"email": "batch@example.com", "password": "password", "full_name": "Batch"})
+    token = client.post("/auth/login", data={"username": "batch@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+
+    response = client.post("/batch", json={"operations": [
+        {"op": "users.get", "params": {"user_id": user_id}},
+        {"op": "grid.weeks", "params": {"user_id": user_id}},
+        {"op": "grid.stats", "params": {"user_id": 999}},
+        {"op": "grid.weeks", "params": {}},
+        {"op": "users.delete", "params": {"user_id": user_id}},
+        {"op": "grid.config"},
+        {"op": "grid.all_progress", "params": {"since": 1}},
+    ]}, headers=headers)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [200, 200, 404, 422, 400, 200, 200]
+    assert results[6]["body"]["changes"][0]["kind"] == "user"
+    assert results[0]["body"] == client.get(f"/users/{user_id}").json()
+    assert results[1]["body"] == []
+    assert results[5]["body"] == client.get("/grid/config", headers=headers).json()
+
+    assert client.post("/batch", json={"operations": []}).status_code == 401
+
+
+def test_grid_calendar(client):
+    client.post("/auth/register", json={"email": "cal@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "cal@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    # Начало не в понедельник — слоты идут от start_date, как в сетке
+    start = date(2026, 9, 2)
+    client.put("/users/me", json={"start_date": str(start), "deadline": str(start + timedelta(days=30))}, headers=headers)
+    client.post("/grid/special-periods", json={
+        "start_date": str(start + timedelta(days=5)),
+        "end_date": str(start + timedelta(days=16)),
+        "period_type": "vacation",
+    }, headers=headers)
+
+    calendar = client.get("/grid/calendar", headers=headers).json()
+    assert calendar["total_weeks"] == 5
+    assert [s["week_start_date"] for s in calendar["slots"]][:2] == ["2026-09-02", "2026-09-09"]
+    assert calendar["slots"][0]["monday"] == "2026-08-31"
+    # Особые — слоты, чьё начало внутри периода: 09.09 и 16.09
+    assert [s["is_special"] for s in calendar["slots"]] == [False, True, True, False, False]
+    assert calendar["slots"][1]["period_type"] == "vacation"
+
+    me = client.get("/users/me", headers=headers).json()
+    stats = client.get(f"/grid/stats/{me['id']}", headers=headers).json()
+    assert (stats["total_weeks"], stats["special_weeks"], stats["effective_weeks"]) == (5, 2, 3)
+    assert client.get("/grid/dashboard", headers=headers).json()["calendar"] == calendar
+
+
+def test_sparse_fieldsets_and_notes(client):
+    client.post("/auth/register", json={"email": "fields@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "fields@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    week = date.today() - timedelta(days=date.today().weekday())
+    client.post("/grid/weeks", json={"week_start_date": str(week), "is_completed": True, "note": "длинная заметка"}, headers=headers)
+    me = client.get("/users/me", headers=headers).json()
+
+    progress = client.get("/grid/all-progress?fields=user_id,completions.date", headers=headers)
+    assert progress.status_code == 200
+    assert progress.json() == [{"user_id": me["id"], "completions": [{"date": str(week)}]}]
+    assert progress.headers["etag"]
+
+    delta = client.get("/grid/all-progress?since=0&fields=user_id,completions.date", headers=headers).json()
+    assert delta["full"] is True
+    assert delta["progress"] == [{"user_id": me["id"], "completions": [{"date": str(week)}]}]
+    assert all("note" not in c for c in delta["changes"])
+
+    weeks = client.get(f"/grid/weeks/{me['id']}?fields=week_start_date,is_completed", headers=headers).json()
+    assert weeks == [{"week_start_date": str(week), "is_completed": True}]
+    assert client.get("/grid/weeks?fields=note", headers=headers).json() == [{"note": "длинная заметка"}]
+    assert client.get("/users/?fields=id,emoji").json() == [{"id": me["id"], "emoji": me["emoji"]}]
+    assert client.get("/grid/all-progress?fields=password", headers=headers).status_code == 400
+
+    note = client.get(f"/grid/notes/{me['id']}/{week}", headers=headers).json()
+    assert note == {"user_id": me["id"], "week_start_date": str(week), "note": "длинная заметка"}
+    assert client.get(f"/grid/notes/{me['id']}/{week - timedelta(weeks=1)}", headers=headers).status_code == 404
+
+    # Все заметки недели — одним запросом
+    other = client.post("/auth/register", json={"email": "fields2@example.com", "password": "password"}).json()
+    other_token = client.post("/auth/login", data={"username": "fields2@example.com", "password": "password"}).json()["access_token"]
+    client.post("/grid/weeks", json={"week_start_date": str(week), "is_completed": True, "note": "вторая"},
+                headers={"Authorization": f"Bearer {other_token}"})
+    notes = client.get(f"/grid/notes/{week}", headers=headers).json()
+    assert notes == [
+        {"user_id": me["id"], "week_start_date": str(week), "note": "длинная заметка"},
+        {"user_id": other["id"], "week_start_date": str(week), "note": "вторая"},
+    ]
+    assert client.get(f"/grid/notes/{week - timedelta(weeks=1)}", headers=headers).json() == []
+
+
+def test_progress_history_as_of_and_burndown(client, db):
+    from datetime import datetime
+    from app.core import history
+
+    client.post("/auth/register", json={"email": "hist@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "hist@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    monday = date.today() - timedelta(days=date.today().weekday())
+    start = monday - timedelta(weeks=3)
+    client.put("/users/me", json={"start_date": str(start), "deadline": str(start + timedelta(weeks=9))}, headers=headers)
+    me = client.get("/users/me", headers=headers).json()
+
+    def at(week, day):
+        return datetime.combine(start + timedelta(weeks=week, days=day), datetime.min.time())
+
+    history.record_week_event(db, me["id"], start, True, at=at(0, 1))
+    history.record_week_event(db, me["id"], start + timedelta(weeks=1), True, at=at(1, 1))
+    history.record_week_event(db, me["id"], start, False, at=at(2, 1))
+    db.commit()
+    # Снимок посередине: дальше реконструкция идёт от него
+    history.take_snapshot(db, at=at(1, 3))
+
+    def completed(as_of):
+        r = client.get("/grid/all-progress", params={"as_of": as_of.isoformat()}, headers=headers)
+        assert r.status_code == 200
+        return [c["date"] for c in r.json()[0]["completions"]]
+
+    assert completed(at(0, 0)) == []
+    assert completed(at(0, 2)) == [str(start)]
+    assert completed(at(1, 2)) == [str(start), str(start + timedelta(weeks=1))]
+    assert completed(at(2, 2)) == [str(start + timedelta(weeks=1))]
+    assert client.get("/grid/all-progress?as_of=2026-01-01T00:00:00&since=0", headers=headers).status_code == 400
+
+    # Отметка через API тоже пишет историю
+    client.post("/grid/weeks", json={"week_start_date": str(monday), "is_completed": True}, headers=headers)
+    assert str(monday) in completed(history.utcnow() + timedelta(minutes=1))
+
+    burndown = client.get("/grid/burndown", headers=headers).json()
+    assert burndown["members"] == 1
+    assert burndown["effective_weeks"] == 10
+    assert [p["completed"] for p in burndown["points"]] == [1, 2, 1, 2]
+    assert [p["remaining"] for p in burndown["points"]] == [9, 8, 9, 8]
+    assert burndown["points"][0]["ideal"] == 9.0
+
+
+def test_burndown_counts_working_slots_only(client, db):
+    from datetime import datetime
+    from app.core import history
+
+    client.post("/auth/register", json={"email": "burn@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "burn@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    monday = date.today() - timedelta(days=date.today().weekday())
+    start = monday - timedelta(weeks=3)
+    client.put("/users/me", json={"start_date": str(start), "deadline": str(start + timedelta(weeks=9))}, headers=headers)
+    # Слот 1 — каникулы
+    client.post("/grid/special-periods", json={
+        "start_date": str(start + timedelta(weeks=1)),
+        "end_date": str(start + timedelta(weeks=1, days=6)),
+        "period_type": "vacation",
+    }, headers=headers)
+    me = client.get("/users/me", headers=headers).json()
+
+    def at(week, day):
+        return datetime.combine(start + timedelta(weeks=week, days=day), datetime.min.time())
+
+    history.record_week_event(db, me["id"], start, True, at=at(0, 1))
+    # Неделя до начала сетки и неделя каникул в факт не входят
+    history.record_week_event(db, me["id"], start - timedelta(weeks=1), True, at=at(0, 2))
+    history.record_week_event(db, me["id"], start + timedelta(weeks=1), True, at=at(1, 1))
+    history.record_week_event(db, me["id"], start + timedelta(weeks=2), True, at=at(2, 1))
+    db.commit()
+
+    burndown = client.get("/grid/burndown", headers=headers).json()
+    assert burndown["effective_weeks"] == 9
+    assert [p["completed"] for p in burndown["points"]] == [1, 1, 2, 2]
+    assert [p["remaining"] for p in burndown["points"]] == [8, 8, 7, 7]
+    # Идеальная линия стоит в неделю каникул
+    assert [p["ideal"] for p in burndown["points"]] == [8.0, 8.0, 7.0, 6.0]
+
+
+def test_grid_analytics_streaks_and_forecast(client, db):
+    from app.models import WeekProgress
+
+    headers = {}
+    for email in ("lead@example.com", "idle@example.com"):
+        client.post("/auth/register", json={"email": email, "password": "password"})
+        token = client.post("/auth/login", data={"username": email, "password": "password"}).json()["access_token"]
+        headers[email] = {"Authorization": f"Bearer {token}"}
+    lead = headers["lead@example.com"]
+    monday = date.today() - timedelta(days=date.today().weekday())
+    start = monday - timedelta(weeks=5)
+    client.put("/users/me", json={"start_date": str(start), "deadline": str(start + timedelta(weeks=9))}, headers=lead)
+    # Слот 2 — каникулы: серию не прерывает и в план не входит
+    client.post("/grid/special-periods", json={
+        "start_date": str(start + timedelta(weeks=2)),
+        "end_date": str(start + timedelta(weeks=2, days=6)),
+        "period_type": "vacation",
+    }, headers=lead)
+    me = client.get("/users/me", headers=lead).json()
+    for week in (0, 1, 3, 4):
+        db.add(WeekProgress(user_id=me["id"], week_start_date=start + timedelta(weeks=week), is_completed=True))
+    db.commit()
+    client.post("/grid/weeks", json={"week_start_date": str(monday), "is_completed": False}, headers=lead)
+
+    result = client.get("/grid/analytics?window=2", headers=lead).json()
+    assert (result["members"], result["effective_weeks"], result["elapsed_weeks"]) == (2, 9, 4)
+    assert [w["index"] for w in result["weeks"]] == [0, 1, 3, 4, 5]
+    assert [w["rate"] for w in result["weeks"]] == [0.5, 0.5, 0.5, 0.5, 0.0]
+    assert [w["rolling_rate"] for w in result["weeks"]] == [0.5, 0.5, 0.5, 0.5, 0.25]
+
+    active, idle = result["users"]
+    # Текущая неделя ещё идёт — серия из 4 недель не прервана
+    assert (active["current_streak"], active["longest_streak"], active["pace"]) == (4, 4, 1.0)
+    # 5 оставшихся недель по одной в неделю — ровно к последнему слоту
+    assert active["projected_finish"] == str(start + timedelta(weeks=9))
+    assert active["on_track"] is True
+    assert (idle["current_streak"], idle["pace"], idle["projected_finish"], idle["on_track"]) == (0, 0.0, None, False)
+    assert result["cohort"]["completed_weeks"] == 2.0
+    assert result["cohort"]["on_track"] is False
+
+    # Новая отметка меняет версию данных — ответ пересчитывается
+    client.post("/grid/weeks", json={"week_start_date": str(monday), "is_completed": True}, headers=lead)
+    active = client.get("/grid/analytics?window=2", headers=lead).json()["users"][0]
+    assert (active["completed_weeks"], active["current_streak"], active["longest_streak"]) == (5, 5, 5)
+    assert client.get("/grid/analytics?window=0", headers=lead).status_code == 422
+
+
+def test_history_state_encoding():
+    from app.core.history import decode_state, encode_state
+
+    state = {1: {738000, 738007, 738014}, 2: set(), 5: {739000}}
+    assert decode_state(encode_state(state)) == {1: {738000, 738007, 738014}, 5: {739000}}
+
+
+def test_grid_images_cached_by_content(client, monkeypatch):
+    from app.core import grid_image
+
+    client.post("/auth/register", json={"email": "img@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "img@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    monday = date.today() - timedelta(days=date.today().weekday())
+    start = monday - timedelta(weeks=2)
+    client.put("/users/me", json={"start_date": str(start), "deadline": str(start + timedelta(weeks=5))}, headers=headers)
+    me = client.get("/users/me", headers=headers).json()
+
+    renders = []
+    for name, render in list(grid_image.RENDERERS.items()):
+        monkeypatch.setitem(grid_image.RENDERERS, name, lambda p, render=render, name=name: renders.append(name) or render(p))
+
+    svg = client.get(f"/grid/image/{me['id']}", headers=headers)
+    assert svg.status_code == 200
+    assert svg.headers["content-type"] == "image/svg+xml"
+    assert svg.content.startswith(b"<svg") and svg.content.count(b"<rect") >= 7
+    assert client.get(f"/grid/image/{me['id']}", headers=headers).content == svg.content
+    assert renders == ["svg"]
+
+    etag = svg.headers["etag"]
+    assert client.get(f"/grid/image/{me['id']}", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    png = client.get(f"/grid/image/{me['id']}?format=png", headers=headers)
+    assert png.headers["content-type"] == "image/png"
+    assert png.content.startswith(b"\x89PNG\r\n\x1a\n")
+    assert png.headers["etag"] == etag
+
+    client.post("/grid/weeks", json={"week_start_date": str(monday), "is_completed": True}, headers=headers)
+    changed = client.get(f"/grid/image/{me['id']}", headers=headers)
+    assert changed.headers["etag"] != etag
+    assert grid_image.DONE[0].encode() in changed.content
+
+    cohort = client.get("/grid/image?format=png", headers=headers)
+    assert cohort.status_code == 200 and cohort.content.startswith(b"\x89PNG")
+    assert client.get("/grid/image/9999", headers=headers).status_code == 404
+    assert client.get("/grid/image/1?format=gif", headers=headers).status_code == 422
+
+
+def test_grid_image_render_timeout_is_503(client, monkeypatch):
+    import threading
+
+    from app.core import grid_image
+    from app.core.config import settings
+
+    client.post("/auth/register", json={"email": "slow@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "slow@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    start = date.today() - timedelta(weeks=2)
+    client.put("/users/me", json={"start_date": str(start), "deadline": str(start + timedelta(weeks=5))}, headers=headers)
+
+    # Пул картинок занят: рендер не успевает за GRID_IMAGE_TIMEOUT
+    unblock = threading.Event()
+    monkeypatch.setitem(grid_image.RENDERERS, "svg", lambda p: unblock.wait(5) and b"<svg/>")
+    monkeypatch.setattr(settings, "GRID_IMAGE_TIMEOUT", 0.05)
+    try:
+        response = client.get("/grid/image", headers=headers)
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+    finally:
+        unblock.set()
+
+
+def test_grid_picture_colors():
+    from app.core.grid_image import DONE, MISSED, Cell, GridPicture, cell_colors, render_png
+
+    assert cell_colors(Cell(share=1.0, is_past=True)) == DONE
+    assert cell_colors(Cell(share=0.0, is_past=True)) == MISSED
+    half = cell_colors(Cell(share=0.5, is_past=True))
+    assert half not in (DONE, MISSED)
+    picture = GridPicture(title="t", subtitle="s", cells=(Cell(share=1.0),) * 13)
+    assert render_png(picture, scale=1).startswith(b"\x89PNG")
@@ -0,0 +1,43 @@
+from app.models import User, WeekProgress, SpecialPeriod
+from app.core import repository
+from benchmarks.compare import compare, update
+from benchmarks import statements
+from benchmarks.seed import seed
+
+
+def test_seed_generates_cohort(db):
+    summary = seed(db, users=5, weeks=10, density=1.0, periods=2)
+    assert summary["users"] == 5
+    assert db.query(User).count() == 5
+    assert db.query(User).filter(User.is_superuser == True).count() == 1
+    # density=1.0 — каждая неделя каждого пользователя выполнена
+    assert db.query(WeekProgress).filter(WeekProgress.is_completed == True).count() == 50
+    assert db.query(SpecialPeriod).count() == 2
+
+
+def test_compare_detects_regression():
+    payload = {"kind": "micro", "database": "sqlite", "results": {"op": {"p50_ms": 10.0, "p95_ms": 12.0}}}
+    baselines = update(payload, {"default_threshold_pct": 25, "suites": {}})
+    assert compare(payload, baselines) == []
+
+    slower = {**payload, "results": {"op": {"p50_ms": 20.0, "p95_ms": 12.0}}}
+    regressions = compare(slower, baselines)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("op.p50_ms")
+
+
+def test_prebuilt_statements_match_query(db):
+    seed(db, users=3, weeks=8, density=0.5)
+    user = db.query(User).filter(User.is_superuser == False).first()
+    assert repository.user_by_email(db, user.email).id == user.id
+    assert repository.admin_scope_row(db).id == db.query(User).filter(User.is_superuser == True).first().id
+    assert repository.completed_weeks(db, user.id) == db.query(WeekProgress).filter(
+        WeekProgress.user_id == user.id, WeekProgress.is_completed == True
+    ).count()
+    assert [w["week_start_date"] for w in repository.week_rows(db, user.id)] == sorted(
+        w.week_start_date for w in user.week_progressions
+    )
+
+    results = statements.run(db, calls=2, samples=1)
+    assert results["grid_read_request"]["cpu_us_before"] > 0
+    assert "user_by_email.lambda_stmt" in results
@@ -0,0 +1,204 @@
+import json
+import time
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import database
+from app.core.cache import (
+    MISS,
+    CacheBackend,
+    FileBackend,
+    MemoryBackend,
+    RedisBackend,
+    TaggedCache,
+    get_response_cache,
+    set_response_cache,
+)
+from app.core.resp import RespClient
+
+
+@pytest.fixture(params=["memory", "file", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "file":
+        return FileBackend(str(tmp_path / "cache.sqlite3"))
+    return RedisBackend(RespClient(request.getfixturevalue("fake_redis")))
+
+
+def test_backend_roundtrip(backend):
+    assert backend.get_many(["a", "b"]) == [None, None]
+    backend.set("a", b"1")
+    backend.set("b", b"2", ttl=0.05)
+    assert backend.get_many(["a", "b"]) == [b"1", b"2"]
+    time.sleep(0.1)
+    assert backend.get_many(["a", "b"]) == [b"1", None]
+
+    assert backend.incr("n") == 1
+    assert backend.incr("n") == 2
+
+    backend.delete("a")
+    assert backend.get_many(["a"]) == [None]
+    backend.clear()
+    assert backend.get_many(["n"]) == [None]
+
+
+def test_tag_invalidation_is_shared(backend):
+    # Два «воркера» поверх одного хранилища
+    first, second = TaggedCache(backend), TaggedCache(backend)
+    value, versions = first.lookup("k", ["t"])
+    first.store("k", {"x": 1}, versions)
+    assert second.lookup("k", ["t"])[0] == {"x": 1}
+
+    second.invalidate(["t"])
+    assert first.lookup("k", ["t"])[0] != {"x": 1}
+
+
+def test_late_store_after_invalidation_is_stale(backend):
+    cache = TaggedCache(backend)
+    _, versions = cache.lookup("k", ["t"])
+    # Запись изменилась, пока значение считалось
+    cache.invalidate(["t"])
+    cache.store("k", "old", versions)
+    assert cache.lookup("k", ["t"])[0] != "old"
+
+
+def register(client, email, **extra):
+    payload = {
+        "email": email,
+        "password": "secret",
+        "full_name": email.split("@")[0],
+        "start_date": str(date.today() - timedelta(weeks=4)),
+        "deadline": str(date.today() + timedelta(weeks=20)),
+    }
+    payload.update(extra)
+    assert client.post("/auth/register", json=payload).status_code == 200
+    login = client.post("/auth/login", data={"username": email, "password": "secret"})
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+
+@pytest.mark.parametrize("kind", ["file", "redis"])
+def test_api_cache_invalidation(client, request, tmp_path, kind):
+    if kind == "file":
+        backend = FileBackend(str(tmp_path / "cache.sqlite3"))
+    else:
+        backend = RedisBackend(RespClient(request.getfixturevalue("fake_redis")))
+    previous = get_response_cache()
+    set_response_cache(TaggedCache(backend))
+    try:
+        admin = register(client, "admin@example.com")
+        user = register(client, "user@example.com")
+        me = client.get("/users/me", headers=user).json()
+
+        assert len(client.get("/users/").json()) == 2
+        before = client.get("/grid/all-progress", headers=user).json()
+        assert all(not p["completions"] for p in before)
+        assert client.get(f"/grid/stats/{me['id']}", headers=user).json()["completed_weeks"] == 0
+
+        week = date.today() - timedelta(days=date.today().weekday())
+        r = client.post("/grid/weeks", headers=user,
+                        json={"week_start_date": str(week), "is_completed": True})
+        assert r.status_code == 200
+
+        after = client.get("/grid/all-progress", headers=user).json()
+        assert [p for p in after if p["user_id"] == me["id"]][0]["completions"]
+        assert client.get(f"/grid/stats/{me['id']}", headers=user).json()["completed_weeks"] == 1
+        assert len(client.get(f"/grid/weeks/{me['id']}", headers=user).json()) == 1
+
+        r = client.post("/grid/special-periods", headers=admin, json={
+            "period_type": "vacation", "start_date": str(week), "end_date": str(week + timedelta(days=13)),
+        })
+        assert r.status_code == 200
+        assert len(client.get("/grid/special-periods", headers=user).json()) == 1
+
+        client.put("/users/me", headers=user, json={"full_name": "Renamed"})
+        assert client.get(f"/users/{me['id']}").json()["full_name"] == "Renamed"
+        assert "Renamed" in [u["full_name"] for u in client.get("/users/").json()]
+    finally:
+        set_response_cache(previous)
+
+
+def test_public_cache_headers(client):
+    register(client, "admin@example.com")
+    r = client.get("/users/")
+    assert r.headers["cache-control"].startswith("public, max-age=")
+    assert "stale-while-revalidate=" in r.headers["cache-control"]
+    assert r.headers["surrogate-key"] == "users"
+    # Варианты с параметрами очистка прокси не достанет — их прокси не хранит
+    r = client.get("/users/?fields=id,emoji")
+    assert r.headers["cache-control"] == "private, no-cache"
+    assert "surrogate-key" not in r.headers
+
+    user_id = r.json()[0]["id"]
+    r = client.get(f"/users/{user_id}")
+    assert r.headers["surrogate-key"] == f"user:{user_id}"
+    assert r.headers["cache-tag"] == f"user:{user_id}"
+    assert client.get("/auth/config").headers["cache-control"].startswith("public")
+
+
+def test_private_grid_revalidation(client, db):
+    headers = register(client, "admin@example.com")
+    me = client.get("/users/me", headers=headers).json()
+
+    r = client.get(f"/grid/weeks/{me['id']}", headers=headers)
+    assert r.headers["cache-control"] == "private, no-cache"
+    assert r.headers["surrogate-key"] == f"weeks:{me['id']}"
+    etag = r.headers["etag"]
+
+    # Пользователь, область и версия читаются в одной транзакции
+    begins = []
+    listener = lambda *args: begins.append(1)
+    database.release(db)
+    event.listen(db, "after_begin", listener)
+    try:
+        r = client.get(f"/grid/weeks/{me['id']}", headers={**headers, "If-None-Match": etag})
+    finally:
+        event.remove(db, "after_begin", listener)
+    assert r.status_code == 304
+    assert r.content == b""
+    assert len(begins) == 1
+
+    week = date.today() - timedelta(days=date.today().weekday())
+    client.post("/grid/weeks", headers=headers, json={"week_start_date": str(week), "is_completed": True})
+    r = client.get(f"/grid/weeks/{me['id']}", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_purger_sends_public_paths():
+    import httpx
+
+    from app.core.http_cache import Purger
+
+    sent = []
+    transport = httpx.MockTransport(
+        lambda request: sent.append((request.method, str(request.url), request.headers["surrogate-key"]))
+        or httpx.Response(200)
+    )
+    purger = Purger("http://proxy/purge/api", client=httpx.Client(transport=transport))
+    cache = TaggedCache(MemoryBackend())
+    cache.invalidation_hooks.append(purger)
+
+    cache.invalidate(["progress"])
+    cache.invalidate(["users", "user:7", "progress"])
+    purger.join()
+    assert sent == [
+        ("PURGE", "http://proxy/purge/api/users/", "users user:7 progress"),
+        ("PURGE", "http://proxy/purge/api/users/7", "users user:7 progress"),
+    ]
+
+
+def test_memory_backend_never_evicts_tag_counters():
+    cache = TaggedCache(MemoryBackend(maxsize=2))
+    cache.invalidate(["progress"])
+    # Записи вытесняют друг друга, а счётчик тега остаётся
+    for i in range(5):
+        cache.store(f"k{i}", i, [])
+    # Запись, собранная до первой инвалидации, не оживает
+    cache.backend.set("v:old", json.dumps({"v": "stale", "t": [0]}).encode())
+    assert cache.lookup("old", ["progress"]) == (MISS, [1])
+    # Базовый класс — только интерфейс
+    with pytest.raises(TypeError):
+        CacheBackend()
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core import coalescing, history
+from app.core.coalescing import WeekCoalescer
+from app.core.weeks import current_week_start
+from app.models import ProgressChange, WeekProgress, WeekProgressEvent
+
+
+def login(client, email):
+    client.post("/auth/register", json={"email": email, "password": "password", "full_name": email.split("@")[0]})
+    token = client.post("/auth/login", data={"username": email, "password": "password"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def coalescer(db, monkeypatch):
+    writes = WeekCoalescer(window=60, session_factory=sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(coalescing, "writes", writes)
+    yield writes
+    writes.stop()
+
+
+def test_toggles_are_coalesced_into_one_write(client, db, coalescer):
+    headers = login(client, "alice@example.com")
+    week = current_week_start().isoformat()
+
+    # Строки ещё нет — первая отметка пишется сразу
+    first = client.post("/grid/weeks", json={"week_start_date": week, "is_completed": True}, headers=headers)
+    assert first.status_code == 200
+    changes = db.query(ProgressChange).count()
+
+    for i in range(5):
+        done = i % 2 == 1
+        ack = client.post("/grid/weeks", json={"week_start_date": week, "is_completed": done}, headers=headers)
+        assert ack.json() == {**first.json(), "is_completed": done}
+    # Ответ — последнее состояние, в БД пока ничего не изменилось
+    assert db.query(ProgressChange).count() == changes
+    assert client.get("/grid/weeks", headers=headers).json()[0]["is_completed"] is False
+
+    assert coalescer.flush() == 1
+    db.expire_all()
+    assert db.query(WeekProgress).one().is_completed is False
+    assert db.query(ProgressChange).count() == changes + 1
+    # В истории — итоговое переключение, а не каждый клик
+    assert [e.is_completed for e in db.query(WeekProgressEvent).order_by(WeekProgressEvent.id)] == [True, False]
+    assert coalescer.flush() == 0
+
+    # Не текущая неделя по-прежнему запрещена
+    past = (current_week_start() - timedelta(weeks=1)).isoformat()
+    assert client.post("/grid/weeks", json={"week_start_date": past, "is_completed": True}, headers=headers).status_code == 403
+
+
+def test_journal_replayed_after_crash_and_stale_toggles_dropped(client, db, tmp_path):
+    headers = login(client, "bob@example.com")
+    week = current_week_start()
+    client.post("/grid/weeks", json={"week_start_date": week.isoformat(), "is_completed": True}, headers=headers)
+    user_id = db.query(WeekProgress).one().user_id
+    factory = sessionmaker(bind=db.get_bind())
+
+    crashed = WeekCoalescer(window=60, journal_dir=str(tmp_path), session_factory=factory)
+    crashed.start()
+    assert crashed.submit(db, user_id, week, False, "черновик")["note"] == "черновик"
+    # Процесс упал: окно не записано, журнал остался без блокировки
+    crashed._stop.set()
+    crashed._journal._file.close()
+
+    restarted = WeekCoalescer(window=60, journal_dir=str(tmp_path), session_factory=factory)
+    restarted.start()
+    db.expire_all()
+    row = db.query(WeekProgress).one()
+    assert (row.is_completed, row.note) == (False, "черновик")
+    assert len(list(tmp_path.glob("*.jsonl"))) == 1  # только журнал нового процесса
+
+    # Отметка, принятая раньше уже записанной (например, ботом), не перетирает её
+    restarted.submit(db, user_id, week, True)
+    later = history.utcnow() + timedelta(seconds=1)
+    db.add(ProgressChange(kind="week", user_id=user_id, week_start_date=week, is_completed=False, created_at=later))
+    db.commit()
+    assert restarted.flush() == 0
+    db.expire_all()
+    assert db.query(WeekProgress).one().is_completed is False
+    restarted.stop()
+    assert list(tmp_path.glob("*.jsonl")) == []
+
+
+def test_unwritten_toggles_change_etag_and_every_view_of_the_user(client, db, coalescer):
+    headers = login(client, "carol@example.com")
+    week = current_week_start()
+    client.put("/users/me", json={
+        "start_date": str(week - timedelta(weeks=1)), "deadline": str(week + timedelta(weeks=10)),
+    }, headers=headers)
+    me = client.get("/users/me", headers=headers).json()
+    client.post("/grid/weeks", json={"week_start_date": week.isoformat(), "is_completed": True}, headers=headers)
+
+    # Ответы закэшированы до отметки
+    etag = client.get("/grid/weeks", headers=headers).headers["etag"]
+    assert client.get(f"/grid/weeks/{me['id']}", headers=headers).json()[0]["is_completed"] is True
+    assert client.get(f"/grid/stats/{me['id']}", headers=headers).json()["completed_weeks"] == 1
+    assert client.get("/grid/dashboard", headers=headers).json()["stats"]["completed_weeks"] == 1
+
+    client.post("/grid/weeks", json={"week_start_date": week.isoformat(), "is_completed": False}, headers=headers)
+    assert db.query(WeekProgress).one().is_completed is True
+    # Версия данных не менялась, но 304 со старым состоянием не отдаём
+    r = client.get("/grid/weeks", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+    assert r.json()[0]["is_completed"] is False
+    assert client.get(f"/grid/weeks/{me['id']}", headers=headers).json()[0]["is_completed"] is False
+    assert client.get(f"/grid/weeks/{me['id']}?fields=is_completed", headers=headers).json() == [{"is_completed": False}]
+    assert client.get(f"/grid/stats/{me['id']}", headers=headers).json()["completed_weeks"] == 0
+    dashboard = client.get("/grid/dashboard", headers=headers).json()
+    assert dashboard["weeks"][0]["is_completed"] is False and dashboard["stats"]["completed_weeks"] == 0
+
+    assert coalescer.flush() == 1
+    assert coalescer.pending_tag() == ""
+    assert client.get(f"/grid/stats/{me['id']}", headers=headers).json()["completed_weeks"] == 0
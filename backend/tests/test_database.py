@@ -0,0 +1,129 @@
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, release
+from app.models import User
+
+
+def pooled_engine(path):
+    # Пул из одного соединения: второе ждать не дольше полсекунды
+    return create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=1, max_overflow=0, pool_timeout=0.5,
+    )
+
+
+def test_release_returns_connection_and_keeps_objects(tmp_path):
+    engine = pooled_engine(tmp_path / "app.db")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    setup = Session()
+    setup.add(User(email="a@example.com", full_name="A", is_active=True, is_superuser=False))
+    setup.commit()
+    setup.close()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    first, second = Session(), Session()
+    user = first.query(User).filter(User.email == "a@example.com").one()
+    assert engine.pool.checkedout() == 1
+    release(first)
+    assert engine.pool.checkedout() == 0
+
+    # Единственное соединение свободно для другой сессии, пока первая ещё жива
+    assert second.query(User).count() == 1
+    release(second)
+
+    # Объект не истёк: атрибуты читаются без запросов к БД
+    executed = len(statements)
+    assert user.full_name == "A"
+    assert len(statements) == executed
+    first.close()
+    second.close()
+    engine.dispose()
+
+
+def test_release_keeps_uncommitted_writes(tmp_path):
+    engine = pooled_engine(tmp_path / "app.db")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    db.add(User(email="b@example.com", full_name="B", is_active=True, is_superuser=False))
+    release(db)
+    db.flush()
+    release(db)
+    # Запись не закоммичена и соединение не отдано
+    assert engine.pool.checkedout() == 1
+    db.rollback()
+    assert db.query(User).count() == 0
+    release(db)
+    assert engine.pool.checkedout() == 0
+    db.close()
+    engine.dispose()
+
+
+def test_data_version_bumped_after_commit_on_one_connection(tmp_path):
+    from app.core.versioning import bump_data_version, get_data_version
+
+    engine = pooled_engine(tmp_path / "app.db")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    assert get_data_version(db) == 0
+
+    # Откат — версия не меняется
+    bump_data_version(db)
+    db.rollback()
+    assert get_data_version(db) == 0
+
+    # Строки ещё нет: вставка; дальше — увеличение той же строки.
+    # Пул из одного соединения: увеличение идёт после возврата соединения сессии
+    for expected in (1, 2):
+        db.add(User(email=f"u{expected}@example.com", full_name="U", is_active=True, is_superuser=False))
+        bump_data_version(db)
+        bump_data_version(db, "periods")
+        db.commit()
+        assert get_data_version(db) == expected
+        assert get_data_version(db, "periods") == expected
+    db.close()
+
+
+def test_failed_version_bump_doesnt_fail_the_commit(tmp_path, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    from app.core import versioning
+
+    engine = pooled_engine(tmp_path / "app.db")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    increment = versioning.increment_statement
+    failures = []
+
+    def busy_once(dialect, key):
+        if not failures:
+            failures.append(key)
+            raise OperationalError("UPDATE data_versions", {}, Exception("database is locked"))
+        return increment(dialect, key)
+
+    monkeypatch.setattr(versioning, "increment_statement", busy_once)
+    monkeypatch.setattr(versioning, "RETRY_DELAYS", (0.05,))
+    db.add(User(email="c@example.com", full_name="C", is_active=True, is_superuser=False))
+    versioning.bump_data_version(db)
+    # Запись сохранена, ошибка увеличения до вызывающего не доходит
+    db.commit()
+    assert failures == ["grid"]
+    assert db.query(User).count() == 1
+
+    # Повтор в фоне
+    for _ in range(50):
+        if versioning.get_data_version(db) == 1:
+            break
+        release(db)
+        time.sleep(0.05)
+    assert versioning.get_data_version(db) == 1
+    db.close()
+    engine.dispose()
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.core import embedded
+from app.main import app
+from app.models import DataVersion
+
+
+def sqlite_engine(path):
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, **embedded.engine_options(url))
+    embedded.configure(engine)
+    return engine
+
+
+def test_migrate_creates_stamps_and_tunes(tmp_path):
+    engine = sqlite_engine(tmp_path / "app.db")
+    embedded.migrate(engine)
+    # Повторный старт — upgrade до той же головы
+    embedded.migrate(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("SELECT version_num FROM alembic_version")).scalar() == "e6b2d9c4f153"
+        assert "week_progress_events" in inspect(conn).get_table_names()
+    engine.dispose()
+
+
+def test_writers_are_serialized(tmp_path):
+    engine = sqlite_engine(tmp_path / "app.db")
+    embedded.migrate(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    db.add(DataVersion(key="counter", version=0))
+    db.commit()
+    db.close()
+
+    errors = []
+
+    def increment(times):
+        for _ in range(times):
+            # Чтение, затем запись в одной транзакции: отложенный BEGIN здесь падал бы с SQLITE_BUSY
+            db = embedded.for_writes(Session())
+            try:
+                row = db.get(DataVersion, "counter")
+                row.version += 1
+                db.commit()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=increment, args=(25,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    db = Session()
+    assert errors == []
+    assert db.get(DataVersion, "counter").version == 100
+    db.close()
+    engine.dispose()
+
+
+def test_batch_reads_dont_wait_for_the_writer(tmp_path, monkeypatch):
+    engine = sqlite_engine(tmp_path / "app.db")
+    embedded.migrate(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", Session)
+
+    with TestClient(app) as client:
+        client.post("/auth/register", json={"email": "batch@example.com", "password": "password", "full_name": "Batch"})
+        token = client.post("/auth/login", data={"username": "batch@example.com", "password": "password"}).json()["access_token"]
+
+        # Другой запрос пишет и держит блокировку записи
+        writer = embedded.for_writes(Session())
+        writer.execute(text("SELECT 1"))
+        try:
+            started = time.monotonic()
+            response = client.post(
+                "/batch", json={"operations": [{"op": "users.me"}, {"op": "grid.config"}]},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            elapsed = time.monotonic() - started
+        finally:
+            writer.rollback()
+            writer.close()
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == [200, 200]
+    assert elapsed < 1
+    engine.dispose()
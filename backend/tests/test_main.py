@@ -12,3 +12,18 @@ def test_health_check():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
+
+def test_create_app_without_one_time_tasks(monkeypatch):
+    import app.main as main
+
+    calls = []
+    monkeypatch.setattr(main, "prepare_database", lambda: calls.append("prepare"))
+    monkeypatch.setattr(main, "warm_up", lambda: calls.append("warm_up"))
+    monkeypatch.setattr(main, "start_scheduler", lambda: calls.append("scheduler"))
+
+    # Как в воркере app.server: подготовка базы и планировщик — не здесь
+    worker = main.create_app(prepare=False, scheduler=False)
+    assert worker is not app
+    with TestClient(worker) as c:
+        assert c.get("/health").json() == {"status": "healthy"}
+    assert calls == ["warm_up"]
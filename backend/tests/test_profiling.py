@@ -0,0 +1,133 @@
+import asyncio
+import os
+import pstats
+import time
+
+import anyio.to_thread
+import pytest
+
+from app.core import profiling
+from app.core.config import settings
+
+
+def login(client, email):
+    client.post("/auth/register", json={"email": email, "password": "password", "full_name": email.split("@")[0]})
+    token = client.post("/auth/login", data={"username": email, "password": "password"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    yield tmp_path
+    if profiling.armed is not None:
+        profiling.disarm(profiling.armed)
+
+
+def wait_done(client, headers, session_id):
+    for _ in range(100):
+        session = client.get(f"/profiling/sessions/{session_id}", headers=headers).json()
+        if session["done"]:
+            return session
+        time.sleep(0.05)
+    raise AssertionError("profiling session did not finish")
+
+
+def test_profile_next_requests(profile_dir, client):
+    admin = login(client, "admin@example.com")
+    user = login(client, "user@example.com")
+    assert client.get("/profiling/workers", headers=user).status_code == 403
+    # Старт приложения в TestClient идёт не в главном потоке: SIGUSR2 не слушаем — в реестре никого
+    assert client.get("/profiling/workers", headers=admin).json() == {"current": os.getpid(), "workers": []}
+
+    run_sync = anyio.to_thread.run_sync
+    created = client.post(
+        "/profiling/sessions", json={"route": "*/grid/config", "count": 2}, headers=admin,
+    ).json()
+    assert created["workers"] == [os.getpid()] and created["files"] == []
+    assert anyio.to_thread.run_sync is not run_sync
+
+    for _ in range(3):
+        assert client.get("/grid/config", headers=user).status_code == 200
+    # Не подходит под шаблон — не профилируется
+    client.get("/users/me", headers=user)
+
+    session = wait_done(client, admin, created["id"])
+    assert len(session["files"]) == 2
+    assert all("GET-grid_config" in name for name in session["files"])
+    # Сессия закончилась — подмена пула снята
+    assert profiling.armed is None and anyio.to_thread.run_sync is run_sync
+
+    downloaded = client.get(f"/profiling/sessions/{created['id']}/files/{session['files'][0]}", headers=admin)
+    path = profile_dir / "download.pstats"
+    path.write_bytes(downloaded.content)
+    assert pstats.Stats(str(path)).total_calls > 0
+    assert client.get(f"/profiling/sessions/{created['id']}/files/session.json", headers=admin).status_code == 404
+
+    assert client.delete(f"/profiling/sessions/{created['id']}", headers=admin).json() == {"status": "ok"}
+    assert client.get("/profiling/sessions", headers=admin).json() == []
+
+
+def test_sample_whole_worker(profile_dir, client):
+    admin = login(client, "admin@example.com")
+    rejected = client.post("/profiling/sessions", json={"kind": "worker", "profiler": "cprofile"}, headers=admin)
+    assert rejected.status_code == 400
+
+    created = client.post(
+        "/profiling/sessions",
+        json={"kind": "worker", "profiler": "sample", "seconds": 0.3, "interval_ms": 2},
+        headers=admin,
+    ).json()
+    session = wait_done(client, admin, created["id"])
+    assert session["files"] == [f"worker-{os.getpid()}.collapsed"]
+    stacks = (profile_dir / created["id"] / session["files"][0]).read_text().splitlines()
+    assert stacks and all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+
+
+def test_session_from_inbox(profile_dir, client):
+    # Как сессия для другого воркера: файл во входящих и SIGUSR2, здесь — вызов обработчика
+    session_id = profiling.start_session(
+        {"kind": "requests", "route": "/health", "count": 1, "profiler": "sample",
+         "seconds": 10.0, "interval_ms": 1},
+        targets=[],
+    )
+    inbox = profile_dir / "inbox" / str(os.getpid())
+    inbox.mkdir(parents=True)
+    (inbox / session_id).touch()
+    profiling.check_inbox()
+    assert profiling.armed is not None and profiling.armed.id == session_id
+    client.get("/health")
+    assert profiling.armed is None
+    assert profiling.describe(session_id)["done"] == [os.getpid()]
+
+
+@pytest.mark.skipif(profiling.identity(os.getpid()) is None, reason="needs /proc")
+def test_registry_checks_process_identity(profile_dir, monkeypatch):
+    assert not profiling.register_worker(None)
+    loop = asyncio.new_event_loop()
+    try:
+        assert profiling.register_worker(loop)
+        assert profiling.workers() == [os.getpid()]
+
+        # pid освободился и достался другому процессу: запись в реестре от прежнего владельца
+        other = os.getppid()
+        (profile_dir / "workers" / str(other)).write_text("previous-boot:1")
+        (profile_dir / "inbox" / str(other)).mkdir()
+        signalled = []
+        monkeypatch.setattr(profiling.os, "kill", lambda pid, sig: signalled.append(pid))
+        profiling.start_session(
+            {"kind": "worker", "profiler": "sample", "seconds": 0.1, "interval_ms": 1}, targets=[other],
+        )
+        assert signalled == []
+        assert profiling.workers() == [os.getpid()]
+        assert not (profile_dir / "workers" / str(other)).exists()
+    finally:
+        loop.remove_signal_handler(profiling.WAKE_SIGNAL)
+        loop.close()
+        profiling.unregister_worker()
+
+
+def test_default_dir_is_not_shared_tmp(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILE_DIR", "")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert profiling.profile_dir() == str(tmp_path / "diplom-monitor" / "profiles")
@@ -0,0 +1,115 @@
+import anyio
+import anyio.to_thread
+import pytest
+from fastapi import HTTPException
+
+from app.core import ratelimit
+from app.core.ratelimit import (
+    ConcurrencyLimiter,
+    FileBucketStore,
+    Limit,
+    MemoryBucketStore,
+    RedisBucketStore,
+)
+from app.core.resp import RespClient
+
+
+@pytest.fixture(params=["memory", "file", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBucketStore()
+    if request.param == "file":
+        return FileBucketStore(str(tmp_path / "buckets.sqlite3"))
+    return RedisBucketStore(RespClient(request.getfixturevalue("fake_redis")))
+
+
+def test_token_bucket(store):
+    limit = Limit(rate=0.5, burst=3)
+    assert [store.hit("k", limit)[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = store.hit("k", limit)
+    assert not allowed
+    assert 0 < retry_after <= 2.0
+    # Другой ключ — своё ведро
+    assert store.hit("other", limit)[0]
+
+
+def test_memory_store_is_bounded():
+    store = MemoryBucketStore(maxsize=10)
+    for i in range(100):
+        store.hit(f"ip:{i}", Limit(rate=1, burst=1))
+    assert len(store._buckets) == 10
+
+
+def test_concurrency_limiter_sheds_load():
+    limiter = ConcurrencyLimiter(limit=1, max_waiting=1, timeout=0.05)
+
+    async def busy():
+        async with limiter.slot():
+            pass
+
+    async def scenario():
+        release = anyio.Event()
+        codes = []
+
+        async def hold(started):
+            async with limiter.slot():
+                started.set()
+                await release.wait()
+
+        async def attempt():
+            try:
+                await busy()
+                codes.append(200)
+            except HTTPException as exc:
+                codes.append(exc.status_code)
+
+        async with anyio.create_task_group() as tg:
+            started = anyio.Event()
+            tg.start_soon(hold, started)
+            await started.wait()
+            # Слот занят: один ждёт до дедлайна, второму места в очереди нет — оба 503
+            tg.start_soon(attempt)
+            await anyio.sleep(0.01)
+            # Ожидающий в очереди не занимает поток пула, который обслуживает остальные запросы
+            assert anyio.to_thread.current_default_thread_limiter().borrowed_tokens == 0
+            await attempt()
+            await anyio.sleep(0.1)
+            release.set()
+        assert codes == [503, 503]
+        await busy()
+
+    anyio.run(scenario)
+
+
+def test_rate_limits_fail_open_when_store_is_down(client, monkeypatch):
+    # Хранилище вёдер недоступно — вход работает, а не отвечает 500
+    monkeypatch.setattr(ratelimit, "_store", RedisBucketStore(RespClient("redis://127.0.0.1:1/0")))
+    client.post("/auth/register", json={"email": "down@example.com", "password": "password"})
+    assert client.post("/auth/login", data={"username": "down@example.com", "password": "password"}).status_code == 200
+
+
+def test_login_rate_limited_per_account(client, monkeypatch):
+    client.post("/auth/register", json={"email": "victim@example.com", "password": "password", "full_name": "V"})
+    monkeypatch.setattr(ratelimit, "AUTH_ACCOUNT_LIMIT", Limit.per_minute(1, 3))
+
+    codes = [
+        client.post("/auth/login", data={"username": "victim@example.com", "password": "wrong"}).status_code
+        for _ in range(4)
+    ]
+    assert codes == [400, 400, 400, 429]
+    r = client.post("/auth/login", data={"username": "victim@example.com", "password": "password"})
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) >= 1
+
+    # Другой аккаунт с того же адреса не затронут
+    client.post("/auth/register", json={"email": "other@example.com", "password": "password", "full_name": "O"})
+    assert client.post("/auth/login", data={"username": "other@example.com", "password": "password"}).status_code == 200
+
+
+def test_register_rate_limited_per_ip(client, monkeypatch):
+    monkeypatch.setattr(ratelimit, "AUTH_IP_LIMIT", Limit.per_minute(1, 2))
+    codes = [
+        client.post("/auth/register", json={"email": f"u{i}@example.com", "password": "password"}).status_code
+        for i in range(3)
+    ]
+    assert codes == [200, 200, 429]
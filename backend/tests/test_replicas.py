@@ -0,0 +1,113 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.core import replicas
+from app.core.cache import cached
+from app.core.config import settings
+from app.core.replicas import PINNED, PRIMARY, REPLICA, ReplicaRouter, read_source
+from app.database import Base, get_db
+from app.main import app
+
+
+def sqlite_engine(path):
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+
+@pytest.fixture
+def replicated(client, monkeypatch, tmp_path):
+    """Primary and replica as two SQLite files; ``replicate()`` copies the primary over the replica."""
+    primary_path, replica_path = tmp_path / "primary.db", tmp_path / "replica.db"
+    primary, replica = sqlite_engine(primary_path), sqlite_engine(replica_path)
+    Base.metadata.create_all(bind=primary)
+    Base.metadata.create_all(bind=replica)
+    router = ReplicaRouter(primary, [replica], max_lag=5, check_interval=0, pin_seconds=30)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=primary))
+    monkeypatch.setattr(database, "replica_router", router)
+    # Настоящий get_db с маршрутизацией вместо тестовой сессии
+    monkeypatch.delitem(app.dependency_overrides, get_db)
+
+    def replicate():
+        source, target = sqlite3.connect(primary_path), sqlite3.connect(replica_path)
+        source.backup(target)
+        source.close()
+        target.close()
+
+    yield SimpleNamespace(router=router, replicate=replicate)
+    primary.dispose()
+    replica.dispose()
+
+
+def login(client, email):
+    client.post("/auth/register", json={"email": email, "password": "password", "full_name": email.split("@")[0]})
+    token = client.post("/auth/login", data={"username": email, "password": "password"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_reads_go_to_replica_and_writers_are_pinned(client, replicated):
+    alice = login(client, "alice@example.com")
+    bob = login(client, "bob@example.com")
+
+    # Реплика ещё пустая: чтение ушло на неё
+    assert client.get("/users/me", headers=alice).status_code == 404
+    replicated.replicate()
+    me = client.get("/users/me", headers=alice).json()
+    assert me["full_name"] == "alice"
+
+    # Своя запись видна сразу, хотя реплика отстаёт
+    assert client.put("/users/me", json={"full_name": "Alice"}, headers=alice).status_code == 200
+    assert client.get("/users/me", headers=alice).json()["full_name"] == "Alice"
+    assert client.get("/grid/weeks", headers=alice).status_code == 200
+    # Остальные пока читают реплику
+    assert client.get(f"/users/{me['id']}", headers=bob).json()["full_name"] == "alice"
+
+    replicated.replicate()
+    assert client.get("/users/me", headers=bob).json()["full_name"] == "bob"
+
+
+def test_lagging_or_failed_replica_falls_back_to_primary(replicated, monkeypatch, tmp_path):
+    router = replicated.router
+    assert router.route(None)[1] == REPLICA
+
+    broken = ReplicaRouter(router.primary, [sqlite_engine(tmp_path / "missing" / "replica.db")], check_interval=60)
+    assert broken.route(None) == (router.primary, PRIMARY)
+    assert broken.replicas[0].healthy is False
+
+    monkeypatch.setattr(replicas, "measure_lag", lambda engine: 60.0)
+    assert router.route(None) == (router.primary, PRIMARY)
+
+    monkeypatch.setattr(replicas, "measure_lag", lambda engine: 0.0)
+    assert router.route(None)[1] == REPLICA
+
+    router.pin("alice@example.com")
+    assert router.route("alice@example.com") == (router.primary, PINNED)
+
+
+def test_cache_respects_read_source(client, monkeypatch):
+    monkeypatch.setattr(settings, "REPLICA_MAX_LAG", 0)
+    calls = []
+
+    def produce():
+        calls.append(1)
+        return len(calls)
+
+    token = read_source.set(REPLICA)
+    try:
+        # С реплики при нулевом допустимом лаге не кэшируем
+        assert cached("replica-key", ["users"], produce) == 1
+        assert cached("replica-key", ["users"], produce) == 2
+    finally:
+        read_source.reset(token)
+
+    assert cached("pinned-key", ["users"], produce) == 3
+    token = read_source.set(PINNED)
+    try:
+        # Закреплённый за primary запрос пересобирает значение и обновляет кэш
+        assert cached("pinned-key", ["users"], produce) == 4
+    finally:
+        read_source.reset(token)
+    assert cached("pinned-key", ["users"], produce) == 4
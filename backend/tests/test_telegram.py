@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.core import telegram_bot
+from app.core.config import settings
+
+SECRET = "webhook-secret"
+
+
+class FakeTelegram:
+    """Bot API stand-in: records every call and answers like Telegram does."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def reply(self, method, params):
+        with self.lock:
+            self.calls.append((method, params))
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method in ("sendMessage", "editMessageText"):
+            return {
+                "message_id": int(params.get("message_id", 100)),
+                "date": int(time.time()),
+                "chat": {"id": int(params["chat_id"]), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+    def wait_for(self, method, count=1, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                found = [p for m, p in self.calls if m == method]
+            if len(found) >= count:
+                return found
+            time.sleep(0.02)
+        raise AssertionError(f"{method} was not called {count} time(s): {self.calls}")
+
+
+@pytest.fixture
+def fake_telegram(monkeypatch, db):
+    api = FakeTelegram()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("content-length") or 0)).decode()
+            method = self.path.rsplit("/", 1)[-1]
+            result = api.reply(method, dict(parse_qsl(body)))
+            payload = json.dumps({"ok": True, "result": result}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "TELEGRAM_BOT_TOKEN", "123:TEST")
+    monkeypatch.setattr(settings, "TELEGRAM_API_URL", f"http://127.0.0.1:{server.server_port}/bot")
+    monkeypatch.setattr(settings, "TELEGRAM_WEBHOOK_SECRET", SECRET)
+    # Воркеры вебхука открывают свои сессии — к той же тестовой БД
+    monkeypatch.setattr(telegram_bot, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    yield api
+    server.shutdown()
+    server.server_close()
+
+
+def post_update(client, update, secret=SECRET):
+    return client.post("/telegram/webhook", json=update, headers={"X-Telegram-Bot-Api-Secret-Token": secret})
+
+
+def callback_update(update_id, telegram_id, data):
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": f"cb{update_id}",
+            "from": {"id": telegram_id, "is_bot": False, "first_name": "Student"},
+            "chat_instance": "1",
+            "data": data,
+            "message": {"message_id": 55, "date": 0, "chat": {"id": telegram_id, "type": "private"}, "text": "..."},
+        },
+    }
+
+
+def test_webhook_marks_week_from_inline_buttons(client, db, fake_telegram):
+    user = models.user.User(telegram_id=4242, full_name="Student", emoji="🦊", is_active=True)
+    db.add(user)
+    db.commit()
+    monday = date.today() - timedelta(days=date.today().weekday())
+
+    assert post_update(client, {"update_id": 1}, secret="wrong").status_code == 403
+    assert client.post("/telegram/webhook", json={"update_id": 1}).status_code == 403
+
+    start = {
+        "update_id": 1,
+        "message": {
+            "message_id": 1, "date": 0, "text": "/start",
+            "chat": {"id": 4242, "type": "private"},
+            "from": {"id": 4242, "is_bot": False, "first_name": "Student"},
+        },
+    }
+    assert post_update(client, start).json() == {"ok": True}
+    prompt = fake_telegram.wait_for("sendMessage")[0]
+    assert prompt["chat_id"] == "4242"
+    assert f"week:1:{monday}" in prompt["reply_markup"]
+
+    assert post_update(client, callback_update(2, 4242, f"week:1:{monday}")).status_code == 200
+    edited = fake_telegram.wait_for("editMessageText")[0]
+    assert "✅" in edited["text"] and edited["message_id"] == "55"
+    answer = fake_telegram.wait_for("answerCallbackQuery")[0]
+    assert answer["callback_query_id"] == "cb2"
+
+    # Та же запись, что и через POST /grid/weeks: неделя, история, лог изменений
+    db.expire_all()
+    week = db.query(models.week_progress.WeekProgress).filter_by(user_id=user.id).one()
+    assert week.week_start_date == monday and week.is_completed
+    assert db.query(models.week_progress_event.WeekProgressEvent).filter_by(user_id=user.id).count() == 1
+    assert db.query(models.progress_change.ProgressChange).filter_by(user_id=user.id).count() == 1
+
+    # Прошлую неделю менять нельзя — ответ всплывающим сообщением
+    post_update(client, callback_update(3, 4242, f"week:0:{monday - timedelta(weeks=1)}"))
+    denied = fake_telegram.wait_for("answerCallbackQuery", count=2)[1]
+    assert denied["show_alert"] == "true" and "current week" in denied["text"]
+
+    # Непривязанный аккаунт
+    post_update(client, callback_update(4, 777, f"week:1:{monday}"))
+    unlinked = fake_telegram.wait_for("answerCallbackQuery", count=3)[2]
+    assert unlinked["text"] == telegram_bot.NOT_LINKED
+
+
+def test_webhook_disabled_without_secret(client, monkeypatch):
+    monkeypatch.setattr(settings, "TELEGRAM_WEBHOOK_SECRET", "")
+    assert client.post("/telegram/webhook", json={"update_id": 1}).status_code == 404
@@ -0,0 +1,84 @@
+import os
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core import timeouts
+from app.core.config import settings
+from app.core.timeouts import Budget, current_budget
+from app.database import make_engine
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+# Считает до миллиарда — без прерывания идёт минуты
+ENDLESS = text("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000000) SELECT count(*) FROM n")
+
+
+def run_with(engine, budget, statement):
+    token = current_budget.set(budget)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(statement).scalar()
+    finally:
+        current_budget.reset(token)
+
+
+def test_sqlite_budget_interrupts_and_disconnect_cancels(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'app.db'}")
+
+    with pytest.raises(OperationalError) as timed_out:
+        run_with(engine, Budget(0.05), ENDLESS)
+    assert timeouts.is_cancellation(timed_out.value)
+
+    budget = Budget(60)
+    threading.Timer(0.05, budget.cancel).start()
+    with pytest.raises(OperationalError) as cancelled:
+        run_with(engine, budget, ENDLESS)
+    assert timeouts.is_cancellation(cancelled.value)
+
+    # Без бюджета (фоновые задачи) то же соединение из пула не ограничено
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    engine.dispose()
+
+
+def test_route_budget_exceeded_is_503(client, db, monkeypatch):
+    client.post("/auth/register", json={"email": "slow@example.com", "password": "password"})
+    token = client.post("/auth/login", data={"username": "slow@example.com", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert timeouts.budget_for("/cohorts/3/grid/export") == 300
+    assert timeouts.budget_for("/grid/all-progress") == settings.REQUEST_DB_BUDGET
+    monkeypatch.setattr(settings, "REQUEST_DB_BUDGETS", "*/grid/all-progress=0.000001")
+    monkeypatch.setattr(timeouts, "SQLITE_PROGRESS_STEPS", 1)
+
+    response = client.get("/grid/all-progress", headers=headers)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.json()["code"] == "statement_timeout"
+    # Сессия в тестах общая на все запросы; в приложении get_db закрывает её после каждого
+    db.rollback()
+    # Остальные маршруты — с обычным бюджетом
+    assert client.get("/grid/config", headers=headers).status_code == 200
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+def test_postgres_statement_timeout_and_cancel():
+    engine = make_engine(TEST_POSTGRES_URL)
+    try:
+        with pytest.raises(OperationalError) as timed_out:
+            run_with(engine, Budget(0.1), text("SELECT pg_sleep(5)"))
+        assert timeouts.is_cancellation(timed_out.value)
+
+        budget = Budget(60)
+        threading.Timer(0.1, budget.cancel).start()
+        with pytest.raises(OperationalError) as cancelled:
+            run_with(engine, budget, text("SELECT pg_sleep(5)"))
+        assert timeouts.is_cancellation(cancelled.value)
+
+        with engine.connect() as conn:
+            assert conn.execute(text("SHOW statement_timeout")).scalar() == "0"
+    finally:
+        engine.dispose()
@@ -2,13 +2,23 @@ import { defineStore } from 'pinia'
 import axios from 'axios'
 import { API_URL } from '../config'
 
+// Задержка курсора на клетке перед загрузкой заметок недели, мс
+const NOTES_HOVER_DELAY = 150
+let notesTimer = null
+
 export const useGridStore = defineStore('grid', {
   state: () => ({
     weeks: [],
     config: null,
     stats: null,
     specialPeriods: [],
+    // Слоты недель с сервера: индекс, дата начала, особый период
+    calendar: null,
     allProgress: [],
+    // Курсор журнала изменений для дельта-синхронизации allProgress
+    progressCursor: 0,
+    // Заметки, подгруженные по наведению: ключ `${userId}:${date}`
+    notes: {},
     loading: false,
     saving: false,
     error: null,
@@ -29,7 +39,7 @@ export const useGridStore = defineStore('grid', {
           full_name: user.full_name || 'Без имени',
           emoji: userProgress?.emoji || user.emoji || '🎓',
           is_completed: !!completion,
-          note: completion?.note || null,
+          note: completion?.note || state.notes[`${user.id}:${weekStartDate}`] || null,
         }
       })
     },
@@ -44,19 +54,33 @@ export const useGridStore = defineStore('grid', {
           full_name: user.full_name || 'Без имени',
           emoji: userProgress?.emoji || user.emoji || '🎓',
           is_completed: !!completion,
-          note: completion?.note || null,
+          note: completion?.note || state.notes[`${user.id}:${weekStartDate}`] || null,
         }
       })
     },
 
-    isSpecialPeriod: (state) => (weekStartDate) => {
-      if (!state.specialPeriods.length) return null
-      const weekDate = new Date(weekStartDate)
-      return state.specialPeriods.find(period => {
-        const start = new Date(period.start_date)
-        const end = new Date(period.end_date)
-        return weekDate >= start && weekDate <= end
-      }) || null
+    // Индексы строятся один раз при загрузке календаря/периодов (геттеры кэшируются),
+    // а не перебором на каждую клетку
+    slotsByDate: (state) => new Map((state.calendar?.slots || []).map(s => [s.week_start_date, s])),
+    periodsById: (state) => new Map(state.specialPeriods.map(p => [p.id, p])),
+
+    isSpecialPeriod(state) {
+      const slots = this.slotsByDate
+      const periods = this.periodsById
+      return (weekStartDate) => {
+        if (state.calendar) {
+          const slot = slots.get(weekStartDate)
+          if (!slot?.is_special) return null
+          return periods.get(slot.period_id) || { period_type: slot.period_type }
+        }
+        if (!state.specialPeriods.length) return null
+        const weekDate = new Date(weekStartDate)
+        return state.specialPeriods.find(period => {
+          const start = new Date(period.start_date)
+          const end = new Date(period.end_date)
+          return weekDate >= start && weekDate <= end
+        }) || null
+      }
     },
     getWeekStatus: (state) => (weekStartDate) => {
       const week = state.weeks.find(w => w.week_start_date === weekStartDate)
@@ -72,15 +96,13 @@ export const useGridStore = defineStore('grid', {
       this.loading = true
       this.error = null
       try {
-        await Promise.all([
-          this.fetchConfig(),
-          this.fetchAllProgress(),
-        ])
         if (userId) {
+          // Конфиг, общий прогресс, недели, статистика и периоды — одним запросом
+          await this.fetchDashboard(userId)
+        } else {
           await Promise.all([
-            this.fetchWeeks(userId),
-            this.fetchStats(userId),
-            this.fetchSpecialPeriods(userId),
+            this.fetchConfig(),
+            this.fetchAllProgress(),
           ])
         }
       } catch (err) {
@@ -90,10 +112,31 @@ export const useGridStore = defineStore('grid', {
         this.loading = false
       }
     },
+    async fetchDashboard(userId) {
+      const response = await axios.get(`${API_URL}/grid/dashboard`, { params: { user_id: userId } })
+      const data = response.data
+      this.config = data.config
+      this.allProgress = data.all_progress
+      this.progressCursor = 0
+      this.weeks = data.weeks
+      this.stats = data.stats
+      this.specialPeriods = data.special_periods
+      this.calendar = data.calendar
+    },
+    async fetchCalendar() {
+      try {
+        const response = await axios.get(`${API_URL}/grid/calendar`)
+        this.calendar = response.data
+      } catch (err) {
+        console.error(err)
+      }
+    },
     async fetchConfig() {
       try {
         const response = await axios.get(`${API_URL}/grid/config`)
         this.config = response.data
+        // Слоты зависят от дат конфигурации
+        await this.fetchCalendar()
       } catch (err) {
         this.error = 'Не удалось загрузить конфигурацию'
         console.error(err)
@@ -120,18 +163,66 @@ export const useGridStore = defineStore('grid', {
       try {
         const response = await axios.get(`${API_URL}/grid/special-periods/${userId}`)
         this.specialPeriods = response.data
+        await this.fetchCalendar()
       } catch (err) {
         console.error('Failed to load special periods', err)
       }
     },
     async fetchAllProgress() {
       try {
-        const response = await axios.get(`${API_URL}/grid/all-progress`)
-        this.allProgress = response.data
+        const response = await axios.get(`${API_URL}/grid/all-progress`, {
+          // Заметки не грузим — они подтягиваются по наведению (loadNotes)
+          params: { since: this.progressCursor, fields: 'user_id,emoji,completions.date' },
+        })
+        const delta = response.data
+        if (delta.full) {
+          this.allProgress = delta.progress
+        } else {
+          delta.changes.forEach(change => this.applyProgressChange(change))
+        }
+        this.progressCursor = delta.cursor
       } catch (err) {
         console.error('Failed to load all progress', err)
       }
     },
+    // Наведение мышью: запрос уходит, когда курсор задержался на клетке
+    loadNotes(weekStartDate) {
+      clearTimeout(notesTimer)
+      notesTimer = setTimeout(() => this.fetchWeekNotes(weekStartDate), NOTES_HOVER_DELAY)
+    },
+    async fetchWeekNotes(weekStartDate) {
+      const pending = this.allProgress.filter(p =>
+        p.completions.some(c => c.date === weekStartDate && c.note === undefined) &&
+        !(`${p.user_id}:${weekStartDate}` in this.notes)
+      )
+      if (!pending.length) return
+      const keys = pending.map(p => `${p.user_id}:${weekStartDate}`)
+      keys.forEach(key => { this.notes[key] = null })
+      try {
+        // Все заметки недели — одним запросом, а не по запросу на пользователя
+        const response = await axios.get(`${API_URL}/grid/notes/${weekStartDate}`)
+        response.data.forEach(n => { this.notes[`${n.user_id}:${weekStartDate}`] = n.note })
+      } catch (err) {
+        keys.forEach(key => { delete this.notes[key] })
+      }
+    },
+    applyProgressChange(change) {
+      let userProgress = this.allProgress.find(p => p.user_id === change.user_id)
+      if (!userProgress) {
+        userProgress = { user_id: change.user_id, emoji: change.emoji || '🎓', completions: [] }
+        this.allProgress.push(userProgress)
+      }
+      if (change.kind === 'user') {
+        userProgress.emoji = change.emoji || '🎓'
+        return
+      }
+      delete this.notes[`${change.user_id}:${change.week_start_date}`]
+      const completions = userProgress.completions.filter(c => c.date !== change.week_start_date)
+      if (change.is_completed) {
+        completions.push({ date: change.week_start_date, note: change.note })
+      }
+      userProgress.completions = completions
+    },
     async updateWeek(weekStartDate, isCompleted, note) {
       this.saving = true
       try {